@@ -0,0 +1,56 @@
+"""Deterministic synthetic config modules for the benchmarks, in a few sizes."""
+
+import random
+from types import SimpleNamespace
+
+CONSONANTS = 'bcdfghjklmnprstvwz'
+VOWELS = 'aeiou'
+
+SIZES = {
+    'small': dict(words=1_000, tlds=20, biases=50, filters=2),
+    'medium': dict(words=20_000, tlds=200, biases=500, filters=10),
+    'large': dict(words=100_000, tlds=1_000, biases=5_000, filters=50),
+}
+
+
+def _syllables(rng: random.Random, count: int) -> str:
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(count))
+
+
+def make_config(words: int, tlds: int, biases: int, filters: int, seed: int = 0) -> SimpleNamespace:
+    """Build an object that `load_config` accepts, with the same contents for the same arguments every time."""
+    rng = random.Random(seed)
+
+    word_list = set()
+    while len(word_list) < words:
+        word_list.add(_syllables(rng, rng.randint(1, 4)))
+    tld_list = set()
+    while len(tld_list) < tlds:
+        tld_list.add(_syllables(rng, rng.randint(1, 2))[:rng.randint(2, 4)])
+
+    def bias() -> str:
+        return f'{_syllables(rng, 1)[:rng.randint(1, 2)]}{rng.choice(VOWELS)},{rng.uniform(-1, 1):.3f}'
+
+    # One length filter like the defaults, plus filters that each reject strings containing some letter pair.
+    word_filters = [r'\w{1,32}'] + [
+        fr'(?!.*{rng.choice(CONSONANTS)}{rng.choice(CONSONANTS)})' for _ in range(filters - 1)
+    ]
+
+    return SimpleNamespace(
+        word_source_lists=(sorted(word_list),),
+        tld_source_lists=(sorted(tld_list),),
+        word_filter_lists=(word_filters,),
+        tld_filter_lists=((r'\w{1,5}',),),
+        domain_filter_lists=((r'.{1,32}',),),
+        word_bias_lists=([bias() for _ in range(biases)],),
+        tld_bias_lists=([bias() for _ in range(max(1, biases // 10))],),
+        domain_bias_lists=([bias() for _ in range(biases)],),
+        use_nameguppy=False,
+        nameguppy_cache='~/.domain-hunter/cache/nameguppy',
+        use_namecheap=False,
+        namecheap_cache='~/.domain-hunter/cache/namecheap',
+    )
+
+
+def sized_config(size: str, seed: int = 0) -> SimpleNamespace:
+    return make_config(seed=seed, **SIZES[size])
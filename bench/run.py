@@ -0,0 +1,131 @@
+"""
+Time each pipeline stage against the synthetic configs and compare the results to a stored baseline.
+
+    python -m bench.run --sizes small medium --output bench_output.json
+    python -m bench.run --write-baseline
+"""
+
+import argparse
+import gc
+import json
+import os.path
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+import hunterlib.steps as s
+from bench.configs import SIZES, sized_config
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+WORD_RESULTS = 10_000
+DOMAIN_RESULTS = 10_000
+
+
+def _stages(config_module):
+    """Yield (stage name, callable) pairs in pipeline order. Each callable runs one stage from a loaded config."""
+    conf = s.load_config(config_module)
+    yield 'load_config', lambda: s.load_config(config_module)
+    yield 'generate_word_chain', lambda: sum(1 for _ in islice(s.generate_word_chain(conf), WORD_RESULTS))
+    yield 'generate_tld_chain', lambda: sum(1 for _ in s.generate_tld_chain(conf))
+    yield 'generate_domains', lambda: sum(1 for _ in islice(
+        s.generate_domains(conf, s.generate_word_chain(conf), s.generate_tld_chain(conf)), DOMAIN_RESULTS))
+    yield 'first_result', lambda: next(iter(
+        s.generate_domains(conf, s.generate_word_chain(conf), s.generate_tld_chain(conf))))
+
+
+def _time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(fn) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, repeat: int = 3) -> dict:
+    results = {}
+    for size in sizes:
+        config_module = sized_config(size)
+        stages = {}
+        for (name, fn) in _stages(config_module):
+            # Timing and memory are measured in separate runs, since tracemalloc slows everything down.
+            stages[name] = {'seconds': _time(fn, repeat), 'peak_bytes': _peak_memory(fn)}
+        results[size] = {'parameters': SIZES[size], 'stages': stages}
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'word_results': WORD_RESULTS,
+        'domain_results': DOMAIN_RESULTS,
+        'sizes': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every stage that got more than `tolerance` times slower or bigger than the baseline."""
+    regressions = []
+    for (size, result) in current['sizes'].items():
+        base_stages = baseline['sizes'].get(size, {}).get('stages', {})
+        for (stage, metrics) in result['stages'].items():
+            for (metric, value) in metrics.items():
+                base = base_stages.get(stage, {}).get(metric)
+                if base and value > base * tolerance:
+                    regressions.append(f'{size}/{stage}/{metric}: {value:.6g} vs baseline {base:.6g} '
+                                       f'({value / base:.2f}x)')
+    return regressions
+
+
+def summary(current: dict) -> str:
+    lines = []
+    for (size, result) in current['sizes'].items():
+        for (stage, metrics) in result['stages'].items():
+            peak = metrics['peak_bytes'] / 2 ** 20
+            lines.append(f'{size:8s} {stage:22s} {metrics["seconds"]: 10.4f}s {peak: 10.2f}MiB')
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark each domain-hunter pipeline stage.')
+    parser.add_argument('--sizes', nargs='+', choices=tuple(SIZES), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help='Report the best of this many timing runs.')
+    parser.add_argument('--output', default='bench_output.json', help='Where to write the results as JSON.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Fail when a stage is more than this many times slower or bigger than the baseline.')
+    parser.add_argument('--write-baseline', action='store_true', help='Store these results as the new baseline.')
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.repeat)
+    print(summary(current))
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+
+    if args.write_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; skipping comparison.')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(current, json.load(f), args.tolerance)
+    for r in regressions:
+        print(f'REGRESSION {r}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,134 @@
+import importlib
+import sys
+from contextlib import nullcontext
 from importlib import import_module
 from itertools import islice
+from typing import Optional
 
 import hunterlib.steps as s
+import hunterlib.trace
 from hunterlib.args import arg_parser
+from hunterlib.availability import namecheap_stage
+from hunterlib.cache import AvailabilityCache, attach_cached
+from hunterlib.output import WRITERS
+from hunterlib.profiling import Profiler, profiled
+from hunterlib.scoring import score_domains
+from hunterlib.shards import write_shard
+from hunterlib.steps.scores import ScoreTable, score_table_path
+from hunterlib.watch import FileWatcher, config_paths
+from hunterlib.zones import RegisteredIndex
 
 
 def main():
     args = arg_parser.parse_args()
+    hunterlib.trace.SAMPLE_EVERY = args.log_sample
+    profiler = Profiler(args.profile_memory).start() if args.profile else None
+    # Opened once for every output --watch makes.
+    registered = RegisteredIndex(args.registered) if args.registered else None
+    try:
+        if args.watch:
+            watch(args, registered)
+        else:
+            scores = ScoreTable.load(score_table_path(args.config_file)) if args.score_cache else None
+            run(args, import_module(args.config_file), scores, registered)
+    finally:
+        if registered is not None:
+            registered.close()
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+            print(profiler.summary(), file=sys.stderr)
+
+
+def watch(args, registered: Optional[RegisteredIndex] = None):
+    """Output, then output again each time the config module or one of its files changes, until interrupted."""
+    if args.resume or args.checkpoint:
+        arg_parser.error("--resume and --checkpoint can't be used with --watch.")
+    if not args.count:
+        arg_parser.error('--watch needs a --count to stop each output at.')
+    scores = ScoreTable.load(score_table_path(args.config_file)) if args.score_cache else ScoreTable()
     conf_mod = import_module(args.config_file)
-    conf = s.load_config(conf_mod)
-    words_chain = s.generate_word_chain(conf)
-    tld_chain = s.generate_tld_chain(conf)
-    domain_chain = s.generate_domains(conf, words_chain, tld_chain)
-    for d in islice(domain_chain, 0, 250):
-        print("{0:32s} {1: 11.9g}".format(d.domain, d.score))
+    loaded = True
+    paths = config_paths(conf_mod)
+    try:
+        while True:
+            watcher = FileWatcher(paths, args.watch_interval)
+            if loaded:
+                try:
+                    run(args, conf_mod, scores, registered)
+                except Exception as e:
+                    # Most likely a half-edited file. Wait for the next change rather than stopping.
+                    print(f'{e.__class__.__name__}: {e}', file=sys.stderr)
+            print(f'Waiting for changes to {len(paths)} files', file=sys.stderr)
+            changed = watcher.wait()
+            print(f'Changed: {", ".join(changed)}', file=sys.stderr)
+            try:
+                conf_mod = importlib.reload(conf_mod)
+                loaded = True
+                paths = config_paths(conf_mod)
+            except Exception as e:
+                print(f'{e.__class__.__name__}: {e}', file=sys.stderr)
+                loaded = False
+    except KeyboardInterrupt:
+        pass
+
+
+def run(args, conf_mod, scores: Optional[ScoreTable] = None, registered: Optional[RegisteredIndex] = None):
+    conf = s.load_config(conf_mod, args.config_snapshot)
+    if (args.resume or args.checkpoint) and conf.scorer_conf.names:
+        # Re-ranking reads ahead of what's output, so the cursor's position wouldn't match it.
+        arg_parser.error("--resume and --checkpoint can't be used with scorers.")
+    if args.shard:
+        if args.workers or args.resume or args.checkpoint or args.offset or args.check or scores is not None:
+            arg_parser.error('--shard runs on its own, without --workers, --resume, --checkpoint, --offset, --check, '
+                             '--score-cache or --watch.')
+        if conf.scorer_conf.names:
+            # Re-ranking moves domains away from their keys, so the shards couldn't be merged on them.
+            arg_parser.error("--shard can't be used with scorers.")
+        if not args.output:
+            arg_parser.error('--shard needs an --output file to write the shard to.')
+        with open(args.output, 'wb') as f:
+            write_shard(conf, f, *args.shard, args.count, args.limit, args.min_score, registered)
+        return
+    if args.workers:
+        if args.resume or args.checkpoint:
+            arg_parser.error('--resume and --checkpoint need a serial run, without --workers.')
+        if scores is not None:
+            arg_parser.error('--score-cache and --watch need a serial run, without --workers.')
+        cursor = None
+        domain_chain = s.generate_domains_parallel(conf, args.workers, args.chunk_size, args.limit, args.min_score,
+                                                   registered=registered)
+        domain_chain = islice(domain_chain, args.offset, None)
+    elif args.resume:
+        cursor = domain_chain = s.DomainCursor.load(conf, args.resume, registered)
+        cursor.skip(args.offset)
+    elif conf.scorer_conf.names:
+        cursor = None
+        cursor_chain = s.DomainCursor(conf, args.limit, args.min_score, registered, scores=scores)
+        domain_chain = profiled('scoring', score_domains(cursor_chain, conf),
+                                'drop_registered' if registered else 'domain_filters')
+        domain_chain = islice(domain_chain, args.offset, None)
+    else:
+        cursor = domain_chain = s.DomainCursor(conf, args.limit, args.min_score, registered, scores=scores)
+        cursor.skip(args.offset)
+    # Cut the stream off before checking availability, so no lookups are spent on domains that won't be output.
+    domain_chain = islice(domain_chain, 0, args.count or None)
+    # Only opened to check with, since opening it reads every cached domain.
+    checking = args.check and conf.namecheap_conf.enable
+    cache = AvailabilityCache.for_config('namecheap', conf.namecheap_conf) if checking else None
+    with cache or nullcontext():
+        if cache is not None:
+            domain_chain = profiled('attach_cached', attach_cached(domain_chain, cache))
+            domain_chain = profiled('availability', namecheap_stage(domain_chain, conf.namecheap_conf, cache))
+        # Standard output is left open for the next output with --watch.
+        stream = open(args.output, 'wb') if args.output else nullcontext(sys.stdout.buffer)
+        with stream as f, WRITERS[args.format](f) as writer:
+            for d in domain_chain:
+                writer.write(d)
+    if args.checkpoint:
+        cursor.save(args.checkpoint)
+    if args.score_cache and scores is not None:
+        scores.save(score_table_path(args.config_file))
 
 
 if __name__ == '__main__':
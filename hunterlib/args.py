@@ -1,10 +1,47 @@
 import argparse
 
+
+def shard_spec(value: str) -> tuple[int, int]:
+    """`I/N`, shard I (counting from 0) of N."""
+    try:
+        shard, shards = map(int, value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected I/N, like 0/4, not {value!r}')
+    if not 0 <= shard < shards:
+        raise argparse.ArgumentTypeError(f'shard {shard} is out of range for {shards} shards')
+    return shard, shards
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected a whole number, not {value!r}')
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {number}')
+    return number
+
+
 arg_parser = argparse.ArgumentParser(description="Use one or more lists of words to generate possible domain names.")
 
 # General
 arg_parser.add_argument('--config-file', action='store', dest='config_file', type=str)
 
+arg_parser.add_argument('--config-snapshot', action='store_true', dest='config_snapshot',
+                        help='Reuse the config built by an earlier run, while the config module and its files are '
+                             'unchanged.')
+
+arg_parser.add_argument('--score-cache', action='store_true', dest='score_cache',
+                        help='Keep word scores between runs, and only rescore the words that changes to the word list '
+                             'or word biases affect.')
+
+arg_parser.add_argument('--watch', action='store_true', dest='watch',
+                        help='After output, wait for the config module or any of its files to change, then output '
+                             'again. Word scores are kept between outputs.')
+
+arg_parser.add_argument('--watch-interval', action='store', dest='watch_interval', type=float, default=0.2,
+                        help='Seconds between checks for changes with --watch.')
+
 # Adding sources
 arg_parser.add_argument('--words-from-kind', nargs=1, action='append', dest='category_words', type=str,
                         help='Category used to derive words, specified as a WordNet synset.')
@@ -12,6 +49,66 @@ arg_parser.add_argument('--words-from-kind', nargs=1, action='append', dest='cat
 arg_parser.add_argument('--words-from-part', nargs=1, action='append', dest='pos_words', type=str,
                         help='Part of speech used to derive words, via WordNet.')
 
+# Bounding the search
+arg_parser.add_argument('--limit', action='store', dest='limit', type=int,
+                        help='Stop the word combination search after this many combinations pass the word filters '
+                             'and deduplication.')
+
+arg_parser.add_argument('--min-score', action='store', dest='min_score', type=float,
+                        help='Stop the word combination search once combinations score below this.')
+
+# Paging
+arg_parser.add_argument('--offset', action='store', dest='offset', type=int, default=0,
+                        help='Skip this many domains before output starts.')
+
+arg_parser.add_argument('--resume', action='store', dest='resume', type=str,
+                        help='Continue from a checkpoint written by --checkpoint, instead of from the start.')
+
+arg_parser.add_argument('--checkpoint', action='store', dest='checkpoint', type=str,
+                        help='After output, save the position in the domain stream to this file.')
+
+# Parallelism
+arg_parser.add_argument('--workers', action='store', dest='workers', type=int,
+                        help='Enumerate domains across this many worker processes. Runs serially when not given.')
+
+arg_parser.add_argument('--chunk-size', action='store', dest='chunk_size', type=int, default=256,
+                        help='Number of domains each worker sends back at a time.')
+
+arg_parser.add_argument('--shard', action='store', dest='shard', type=shard_spec,
+                        help='Only enumerate shard I/N of the run, split by TLD, and write it to --output as a shard '
+                             'file (whatever --format is), to merge with `python -m hunterlib.shards`. --count '
+                             'applies to each shard.')
+
+# Availability
+arg_parser.add_argument('--check', action='store_true', dest='check',
+                        help='Check whether each domain is available with the registrars enabled in the config.')
+
+arg_parser.add_argument('--registered', action='store', dest='registered', type=str,
+                        help='Directory of registered domain indexes (built with `python -m hunterlib.zones`). '
+                             'Domains found there are dropped before any availability lookups.')
+
+# Output
+arg_parser.add_argument('--count', action='store', dest='count', type=int, default=250,
+                        help='Number of domains to output. 0 means no limit.')
+
+arg_parser.add_argument('--format', action='store', dest='format', default='text',
+                        choices=('text', 'jsonl', 'csv', 'binary'), help='Output format.')
+
+arg_parser.add_argument('--output', action='store', dest='output', type=str,
+                        help='File to write results to. Defaults to standard output.')
+
+# Profiling
+arg_parser.add_argument('--profile', action='store', dest='profile', type=str,
+                        help='Time each pipeline stage and count what goes through it. Writes a JSON report to this '
+                             'file and prints a summary to standard error at exit.')
+
+arg_parser.add_argument('--profile-memory', action='store_true', dest='profile_memory',
+                        help='With --profile, also trace allocations for each stage. Slows the run down a lot.')
+
+# Logging
+arg_parser.add_argument('--log-sample', action='store', dest='log_sample', type=positive_int, default=1,
+                        help='Only log one in this many debug events from each hot loop.')
+
 # Adding filters
 
 
@@ -0,0 +1,262 @@
+"""Checking whether generated domains can actually be registered."""
+
+import asyncio
+import http.client
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from collections.abc import AsyncIterator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from urllib.parse import urlencode, urlsplit
+
+from hunterlib.cache import AvailabilityCache
+from hunterlib.conf import NamecheapConfig
+from hunterlib.steps.data import Domain
+
+logger = logging.getLogger('domain-hunter.availability')
+
+
+class TransientError(Exception):
+    """A failed check that is worth retrying: a network error, timeout, rate limit or server error."""
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HttpPool:
+    """
+    Keep-alive HTTP(S) connections to a single host, one per worker thread, driven from asyncio.
+
+    `http.client` does the protocol work; requests run on a small thread pool so they don't block the event loop.
+    """
+
+    def __init__(self, base_url: str, size: int, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='domain-hunter-http')
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _get(self, query: str) -> tuple[int, bytes]:
+        conn = self._connection()
+        try:
+            conn.request('GET', f'{self.path}?{query}')
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # The connection is in an unknown state, so start the next request on a fresh one.
+            conn.close()
+            self._local.conn = None
+            raise TransientError(f'{type(e).__name__}: {e}') from e
+
+    async def get(self, params: dict[str, str]) -> tuple[int, bytes]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._get, urlencode(params))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class NamecheapChecker:
+    """
+    Checks domains with the Namecheap `namecheap.domains.check` API command, up to `batch_size` per request.
+    """
+    name = 'namecheap'
+
+    def __init__(self, config: NamecheapConfig, pool: Optional[HttpPool] = None):
+        self.config = config
+        self.batch_size = config.batch_size
+        self.pool = pool or HttpPool(config.endpoint, config.concurrency)
+
+    async def check(self, domains: list[str]) -> dict[str, dict[str, Any]]:
+        status, body = await self.pool.get({
+            'ApiUser': self.config.api_user,
+            'ApiKey': self.config.api_key,
+            'UserName': self.config.username or self.config.api_user,
+            'ClientIp': self.config.client_ip,
+            'Command': 'namecheap.domains.check',
+            'DomainList': ','.join(domains),
+        })
+        if status == 429 or status >= 500:
+            raise TransientError(f'HTTP {status}')
+        if status != 200:
+            return {d: {'error': f'HTTP {status}'} for d in domains}
+        return self.parse(domains, body)
+
+    @staticmethod
+    def parse(domains: list[str], body: bytes) -> dict[str, dict[str, Any]]:
+        try:
+            root = ElementTree.fromstring(body)
+        except ElementTree.ParseError as e:
+            # A cut off or non-XML (say, a proxy's HTML error page) response; most likely fine on a retry.
+            raise TransientError(f'Unreadable API response: {e}') from e
+        if root.get('Status') == 'ERROR':
+            errors = [e.text for e in root.iter() if e.tag.endswith('Error')]
+            error = '; '.join(filter(None, errors)) or 'Unknown API error'
+            return {d: {'error': error} for d in domains}
+        found = {}
+        for result in root.iter():
+            if result.tag.endswith('DomainCheckResult'):
+                found[result.get('Domain', '').lower()] = {
+                    'available': result.get('Available', '').lower() == 'true',
+                    'premium': result.get('IsPremiumName', '').lower() == 'true',
+                }
+        return {d: found.get(d.lower(), {'error': 'Domain missing from API response'}) for d in domains}
+
+    def close(self):
+        self.pool.close()
+
+
+class _Batch:
+    """Domains looked up in one request, and the task doing it once it has been started."""
+
+    def __init__(self):
+        self.domains: list[Domain] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+async def check_availability(domains: Iterable[Domain], checker, concurrency: int = 4, rate: Optional[float] = None,
+                             burst: int = 1, retries: int = 3, backoff: float = 1.0,
+                             max_ahead: int = 64, cache: Optional[AvailabilityCache] = None) -> AsyncIterator[Domain]:
+    """
+    Check domains concurrently and yield them, in their original order, with results in `plugin_data[checker.name]`.
+
+    `checker.check` takes a list of up to `checker.batch_size` domains and returns a result for each. Domains are
+    gathered into full batches as they come in, and a partial batch is only sent once the first domain still waiting
+    to be yielded is in it, or there are no more domains.
+
+    At most `concurrency` checks run at once, started no faster than `rate` per second. Transient failures are retried
+    up to `retries` times with exponential backoff, after which the error is recorded instead. Domains are only pulled
+    from `domains` while fewer than `max_ahead` are waiting to be yielded, so a slow consumer holds everything back.
+
+    Domains that already carry a result (from `attach_cached`) are passed through without a lookup. Successful lookups
+    are written to `cache`, if given, a batch at a time from a worker thread, so the writes don't hold up the loop.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate, burst) if rate else None
+    batch_size = max(1, min(getattr(checker, 'batch_size', 1), max_ahead))
+    loop = asyncio.get_running_loop()
+    # A single thread, so the writes are made in order.
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='domain-hunter-cache') if cache else None
+
+    async def check(batch: list[Domain]):
+        names = [d.domain for d in batch]
+        async with semaphore:
+            for attempt in range(retries + 1):
+                if bucket is not None:
+                    await bucket.acquire()
+                try:
+                    results = await checker.check(names)
+                    break
+                except TransientError as e:
+                    logger.debug('Availability check failed', extra={'word': ','.join(names), 'attempt': attempt,
+                                                                     'error': str(e)})
+                    if attempt == retries:
+                        results = {n: {'error': str(e)} for n in names}
+                    else:
+                        await asyncio.sleep(backoff * 2 ** attempt)
+        for d in batch:
+            d.plugin_data[checker.name] = results[d.domain]
+        found = {n: r for (n, r) in results.items() if 'error' not in r}
+        if writer is not None and found:
+            await loop.run_in_executor(writer, cache.put_many, found)
+
+    source = iter(domains)
+    pending: deque[tuple[Domain, Optional[_Batch]]] = deque()
+    gathering = _Batch()
+    exhausted = False
+
+    def start():
+        nonlocal gathering
+        gathering.task = asyncio.ensure_future(check(gathering.domains))
+        gathering = _Batch()
+
+    try:
+        while True:
+            while not exhausted and len(pending) < max_ahead:
+                d = next(source, None)
+                if d is None:
+                    exhausted = True
+                elif checker.name in d.plugin_data:
+                    pending.append((d, None))
+                else:
+                    gathering.domains.append(d)
+                    pending.append((d, gathering))
+                    if len(gathering.domains) == batch_size:
+                        start()
+            if exhausted and gathering.domains:
+                start()
+            if not pending:
+                return
+            (d, batch) = pending[0]
+            if batch is not None:
+                if batch.task is None:
+                    start()
+                await batch.task
+            pending.popleft()
+            yield d
+    finally:
+        for (_, batch) in pending:
+            if batch is not None and batch.task is not None:
+                batch.task.cancel()
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+
+def check_domains(domains: Iterable[Domain], checker, **kwargs) -> Iterator[Domain]:
+    """Run `check_availability` on its own event loop, for synchronous callers."""
+    loop = asyncio.new_event_loop()
+    checked = check_availability(domains, checker, **kwargs)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(checked.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(checked.aclose())
+        loop.close()
+
+
+def namecheap_stage(domains: Iterable[Domain], config: NamecheapConfig,
+                    cache: Optional[AvailabilityCache] = None) -> Iterator[Domain]:
+    """Wrap a domain stream with Namecheap availability checks, using the limits from `config`."""
+    checker = NamecheapChecker(config)
+    try:
+        yield from check_domains(domains, checker, concurrency=config.concurrency, rate=config.rate,
+                                 burst=config.burst, retries=config.retries, backoff=config.backoff,
+                                 max_ahead=config.max_ahead, cache=cache)
+    finally:
+        checker.close()
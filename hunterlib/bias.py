@@ -0,0 +1,99 @@
+"""Scoring adjustments from biases, matched against many strings at once."""
+
+from collections import deque
+from collections.abc import Iterable
+
+from hunterlib.models import Bias
+
+
+class BiasMatcher:
+    """
+    Aho-Corasick automaton over the patterns of a set of biases.
+
+    Finds every bias whose pattern occurs in a string with a single pass over that string, no matter how many biases
+    there are. Each bias counts at most once per string, the same as `match_biases_naive`.
+    """
+
+    def __init__(self, biases: Iterable[Bias]):
+        # Adjustments are summed in the order the biases were given, so results are bit-for-bit identical to the
+        # naive loop over the same collection.
+        self.biases: tuple[Bias] = tuple(biases)
+        self._adjusts = tuple(b.adjust for b in self.biases)
+
+        goto: list[dict[str, int]] = [{}]
+        out: list[set[int]] = [set()]
+        for (i, bias) in enumerate(self.biases):
+            state = 0
+            for ch in bias.pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(set())
+                state = nxt
+            out[state].add(i)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for (ch, nxt) in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def __len__(self):
+        return len(self.biases)
+
+    def match_indexes(self, text: str) -> list[int]:
+        """Positions in `self.biases` of every bias whose pattern occurs in `text`, in ascending order."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return sorted(found)
+
+    def matches(self, text: str) -> list[Bias]:
+        return [self.biases[i] for i in self.match_indexes(text)]
+
+    def adjustment(self, text: str, start: float = 0) -> float:
+        """Add the adjustment of every bias matching `text` to `start`."""
+        if not self.biases:
+            return start
+        return self.sum_adjusts(self.match_indexes(text), start)
+
+    def sum_adjusts(self, indexes: Iterable[int], start: float = 0) -> float:
+        """Add the adjustments of the biases at `indexes`, from `match_indexes`, to `start` in that order."""
+        total = start
+        adjusts = self._adjusts
+        for i in indexes:
+            total += adjusts[i]
+        return total
+
+
+def match_biases_naive(biases: Iterable[Bias], text: str) -> list[Bias]:
+    """Reference implementation of `BiasMatcher.matches`: test every pattern against the string."""
+    return [b for b in biases if b.pattern in text]
+
+
+def ordered_biases(biases: Iterable[Bias]) -> tuple[Bias, ...]:
+    """
+    `biases` in a fixed order. A set's order depends on the per-process string hash seed, and adjustments summed in a
+    different order can differ in the last bit.
+    """
+    return tuple(sorted(biases, key=lambda b: (b.pattern, b.adjust)))
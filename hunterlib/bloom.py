@@ -0,0 +1,71 @@
+"""Bloom filters that hash the same way in every process, so they can be written to disk."""
+
+import hashlib
+import math
+import struct
+from collections.abc import Iterable
+
+_HEADER = struct.Struct('<QI')
+
+
+class BloomFilter:
+    """
+    A set that can say "definitely not present" or "probably present", in a fixed amount of memory.
+
+    Sized for `capacity` items at a false positive rate of `error_rate`. Bit positions come from BLAKE2b rather than
+    `hash()`, which is salted per process.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        bit_count = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        self._init(bit_count, hash_count, bytearray((bit_count + 7) // 8))
+
+    def _init(self, bit_count: int, hash_count: int, bits):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: two 64 bit halves of one digest stand in for `hash_count` independent hashes.
+        digest = int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest(), 'little')
+        h1 = digest & 0xFFFFFFFFFFFFFFFF
+        h2 = (digest >> 64) | 1
+        m = self.bit_count
+        return [(h1 + i * h2) % m for i in range(self.hash_count)]
+
+    def add(self, item: str) -> bool:
+        """Add `item`. Returns False if it was probably present already (every one of its bits was set)."""
+        bits = self.bits
+        added = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        self.count += 1
+        return added
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for p in self._positions(item):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.bit_count, self.hash_count) + bytes(self.bits)
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'BloomFilter':
+        """Load a filter written by `to_bytes`. `buffer` may be a read-only memoryview of a mapped file."""
+        bit_count, hash_count = _HEADER.unpack_from(buffer)
+        bloom = cls.__new__(cls)
+        bloom._init(bit_count, hash_count, memoryview(buffer)[_HEADER.size:])
+        return bloom
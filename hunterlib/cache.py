@@ -0,0 +1,124 @@
+"""Persistent cache of availability lookups."""
+
+import json
+import logging
+import os
+import os.path
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from hunterlib.bloom import BloomFilter
+from hunterlib.conf import NamecheapConfig, NameGuppyConfig
+
+if TYPE_CHECKING:
+    # hunterlib.steps imports this module, so only import from it for type checkers.
+    from hunterlib.steps.data import Domain
+
+logger = logging.getLogger('domain-hunter.cache')
+
+_SQL_CHUNK = 500
+
+
+class AvailabilityCache:
+    """
+    Per-domain lookup results stored in SQLite under `directory`, each with the time it was looked up.
+
+    Results older than `ttl` seconds are treated as missing, and deleted the next time the cache is opened. The database
+    runs in WAL mode with a busy timeout, so any number of processes can read and write it at once.
+
+    On open, every unexpired domain is loaded into an in-memory Bloom filter. Most candidates have never been looked
+    up, and the filter answers those without touching disk. (Most cached domains are taken ones, but available ones are
+    included too, so a negative answer is always safe.)
+
+    A handle can be used from any thread, one call at a time, so writes can be moved off an event loop.
+    """
+
+    def __init__(self, name: str, directory: str, ttl: float, error_rate: float = 0.001):
+        self.name = name
+        self.ttl = ttl
+        directory = os.path.expanduser(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'results.sqlite3')
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(domain TEXT PRIMARY KEY, checked_at REAL NOT NULL, result TEXT NOT NULL)')
+
+        cutoff = self._cutoff()
+        expired = self._db.execute('DELETE FROM results WHERE checked_at < ?', (cutoff,)).rowcount
+        fresh = [row[0] for row in self._db.execute('SELECT domain FROM results WHERE checked_at >= ?', (cutoff,))]
+        # Leave room for the lookups this run will add.
+        self.bloom = BloomFilter(max(1024, 2 * len(fresh)), error_rate)
+        self.bloom.update(fresh)
+        logger.debug('Loaded availability cache', extra={'path': self.path, 'domains': len(fresh), 'expired': expired})
+
+    @classmethod
+    def for_config(cls, name: str, config: Union[NamecheapConfig, NameGuppyConfig]) -> 'AvailabilityCache':
+        return cls(name, config.cache_loc, config.cache_ttl)
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl
+
+    def get_many(self, domains: Iterable[str]) -> dict[str, dict[str, Any]]:
+        found = {}
+        cutoff = self._cutoff()
+        with self._lock:
+            candidates = [d for d in domains if d in self.bloom]
+            for i in range(0, len(candidates), _SQL_CHUNK):
+                chunk = candidates[i:i + _SQL_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._db.execute(f'SELECT domain, result FROM results WHERE checked_at >= ? '
+                                        f'AND domain IN ({placeholders})', (cutoff, *chunk))
+                for (domain, result) in rows:
+                    found[domain] = json.loads(result)
+        return found
+
+    def get(self, domain: str) -> Optional[dict[str, Any]]:
+        return self.get_many((domain,)).get(domain)
+
+    def put_many(self, results: dict[str, dict[str, Any]]):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany('INSERT OR REPLACE INTO results (domain, checked_at, result) VALUES (?, ?, ?)',
+                                 ((d, now, json.dumps(r)) for (d, r) in results.items()))
+            self.bloom.update(results)
+
+    def put(self, domain: str, result: dict[str, Any]):
+        self.put_many({domain: result})
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_cached(domains: Iterable['Domain'], cache: AvailabilityCache,
+                  max_batch: int = 256) -> Iterator['Domain']:
+    """
+    Put cached results for each domain in `plugin_data[cache.name]`, looking them up in batches.
+
+    Batches start at one domain and double up to `max_batch`, so the first result is not held back.
+    """
+    source = iter(domains)
+    batch_size = 1
+    while True:
+        batch = [d for (_, d) in zip(range(batch_size), source)]
+        if not batch:
+            return
+        found = cache.get_many(d.domain for d in batch)
+        for d in batch:
+            result = found.get(d.domain)
+            if result is not None:
+                d.plugin_data[cache.name] = dict(result, cached=True)
+            yield d
+        batch_size = min(max_batch, batch_size * 2)
@@ -1,7 +1,8 @@
 import logging
 import re
 
-from pydantic import BaseModel, conset, constr
+from pydantic import BaseModel, ValidationError, conset, constr, conint, confloat
+from pydantic.error_wrappers import ErrorWrapper
 
 from hunterlib.models import Bias, ScoreWeight
 
@@ -9,11 +10,51 @@ from hunterlib.models import Bias, ScoreWeight
 class NameGuppyConfig(BaseModel):
     enable: bool = False
     cache_loc: str = '~/.domain-hunter/cache/nameguppy'
+    cache_ttl: confloat(gt=0) = 24 * 60 * 60
 
 
 class NamecheapConfig(BaseModel):
     enable: bool = True
     cache_loc: str = '~/.domain-hunter/cache/namecheap'
+    # Seconds before a cached lookup is checked again.
+    cache_ttl: confloat(gt=0) = 24 * 60 * 60
+
+    endpoint: str = 'https://api.namecheap.com/xml.response'
+    api_user: str = ''
+    api_key: str = ''
+    username: str = ''
+    client_ip: str = ''
+
+    # Namecheap allows 20 requests a minute.
+    concurrency: conint(ge=1) = 4
+    rate: confloat(gt=0) = 20 / 60
+    burst: conint(ge=1) = 1
+    retries: conint(ge=0) = 3
+    backoff: confloat(ge=0) = 1.0
+    max_ahead: conint(ge=1) = 64
+    # Domains looked up per request; the API takes at most 50.
+    batch_size: conint(ge=1, le=50) = 50
+
+
+class DedupeConfig(BaseModel):
+    # Drop word combinations that spell the same as a better one, like "ab" + "c" after "a" + "bc".
+    enable: bool = True
+    # Combinations remembered exactly, before switching to a Bloom filter.
+    exact_limit: conint(ge=0) = 1_000_000
+    capacity: conint(ge=1) = 10_000_000
+    error_rate: confloat(gt=0, lt=1) = 0.001
+
+
+class ScorerConfig(BaseModel):
+    # Scorers (see `hunterlib.scoring`), as `package.module:attribute`.
+    names: list[str] = []
+    # Processes to run scorers on. 0 runs them in this one.
+    workers: conint(ge=0) = 0
+    batch_size: conint(ge=1) = 256
+    # Batches sent to the workers ahead of the one being ranked.
+    prefetch: conint(ge=1) = 4
+    # Domains held back to re-rank by adjusted score.
+    window: conint(ge=1) = 1024
 
 
 class RunConfig(BaseModel):
@@ -32,10 +73,35 @@ class RunConfig(BaseModel):
 
     name_guppy_conf: NameGuppyConfig
     namecheap_conf: NamecheapConfig
+    dedupe_conf: DedupeConfig = DedupeConfig()
+    scorer_conf: ScorerConfig = ScorerConfig()
 
     class Config:
         arbitrary_types_allowed = True
 
+    @classmethod
+    def from_bulk(cls, word_list, tld_list, **values) -> 'RunConfig':
+        """
+        Build a config, validating `word_list` and `tld_list` with set-wide operations instead of one pydantic call
+        per item. The result is the same as calling the constructor, including the errors raised.
+        """
+        try:
+            # str.lower type checks and lowercases every item in C.
+            lists = {'word_list': set(map(str.lower, word_list)), 'tld_list': set(map(str.lower, tld_list))}
+        except TypeError:
+            # Something other than a string, which pydantic may or may not coerce. Let it decide, item by item.
+            return cls(word_list=word_list, tld_list=tld_list, **values)
+        errors = []
+        for (name, items) in lists.items():
+            if not items:
+                errors.append(ErrorWrapper(ValueError('ensure this value has at least 1 items'), loc=(name,)))
+            elif '' in items:
+                errors.append(ErrorWrapper(ValueError('ensure this value has at least 1 characters'), loc=(name,)))
+        if errors:
+            raise ValidationError(errors, cls)
+        # Everything else is small, so validate it normally against placeholder lists, then swap the real ones in.
+        return cls(word_list={'a'}, tld_list={'com'}, **values).copy(update=lists)
+
 
 class WordFilter(logging.Filter):
     def __init__(self, word=None, words=None):
@@ -47,4 +113,7 @@ class WordFilter(logging.Filter):
             self.words.update(words)
 
     def filter(self, record: logging.LogRecord) -> bool:
-        return getattr(record, 'word', None) in self.words or self.words.intersection(getattr(record, 'words', ()))
+        return self.matches(getattr(record, 'word', None), getattr(record, 'words', ()))
+
+    def matches(self, word, words) -> bool:
+        return word in self.words or not self.words.isdisjoint(words)
@@ -0,0 +1,93 @@
+"""Dropping repeats from a best-first stream, in bounded memory."""
+
+import logging
+from collections.abc import Callable, Iterable, Iterator
+from typing import Optional, TypeVar
+
+from hunterlib.bloom import BloomFilter
+
+logger = logging.getLogger('domain-hunter.dedup')
+
+T = TypeVar('T')
+
+
+class Deduplicator:
+    """
+    Remembers the keys it has seen, to tell first occurrences from repeats.
+
+    The first `exact_limit` keys are kept in a set. Past that, they move into a Bloom filter sized for `capacity` keys
+    at `error_rate`, and memory stops growing. A Bloom filter never misses a repeat, but a new key can be mistaken for
+    one at about `error_rate`, and dropped.
+    """
+
+    def __init__(self, exact_limit: int = 1_000_000, capacity: int = 10_000_000, error_rate: float = 0.001):
+        self.exact_limit = exact_limit
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.exact: Optional[set[str]] = set()
+        self.bloom: Optional[BloomFilter] = None
+        self.suppressed = 0
+
+    def add(self, key: str) -> bool:
+        """Remember `key`. Returns False, and counts it as suppressed, if it has (probably) been seen before."""
+        exact = self.exact
+        if exact is not None:
+            if key in exact:
+                self.suppressed += 1
+                return False
+            if len(exact) < self.exact_limit:
+                exact.add(key)
+                return True
+            self._overflow()
+        if self.bloom.add(key):
+            return True
+        self.suppressed += 1
+        return False
+
+    def __contains__(self, key: str) -> bool:
+        """Whether `add` would call `key` a repeat, without remembering it."""
+        if self.exact is not None:
+            return key in self.exact
+        return key in self.bloom
+
+    def _overflow(self):
+        logger.debug('Deduplication switching to a Bloom filter',
+                     extra={'exact': len(self.exact), 'capacity': self.capacity, 'error_rate': self.error_rate})
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self.bloom.update(self.exact)
+        self.exact = None
+
+    def to_bytes(self) -> bytes:
+        """The keys seen so far: newline separated while they fit in the set, then the Bloom filter's bits."""
+        if self.exact is not None:
+            return b'E' + '\n'.join(self.exact).encode('utf-8')
+        return b'B' + self.bloom.to_bytes()
+
+    def load(self, data: bytes, suppressed: int = 0):
+        """Replace what this has seen with `data` from `to_bytes`."""
+        data = bytes(data)
+        if data[:1] == b'E':
+            self.exact = set(data[1:].decode('utf-8').split('\n')) if len(data) > 1 else set()
+            self.bloom = None
+        elif data[:1] == b'B':
+            # Copied into a bytearray, so the loaded filter can still be added to.
+            self.bloom = BloomFilter.from_buffer(bytearray(data[1:]))
+            self.exact = None
+        else:
+            raise ValueError('Not deduplication state.')
+        self.suppressed = suppressed
+
+
+def dedupe(chain: Iterable[T], key: Callable[[T], str], seen: Deduplicator) -> Iterator[T]:
+    """
+    Yield each item of `chain` whose key hasn't come up before.
+
+    For a chain sorted best first, that keeps the best copy of each key.
+    """
+    add = seen.add
+    try:
+        for item in chain:
+            if add(key(item)):
+                yield item
+    finally:
+        logger.debug('Deduplicated chain', extra={'suppressed': seen.suppressed})
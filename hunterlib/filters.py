@@ -0,0 +1,152 @@
+"""Compiled sets of filter patterns."""
+
+import re
+from collections.abc import Callable, Iterable
+from functools import cached_property, lru_cache
+from typing import NamedTuple, Optional
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    # Before Python 3.11.
+    import sre_constants
+    import sre_parse
+
+_ENDS = ((sre_constants.AT, sre_constants.AT_END), (sre_constants.AT, sre_constants.AT_END_STRING))
+_BEGINNINGS = ((sre_constants.AT, sre_constants.AT_BEGINNING), (sre_constants.AT, sre_constants.AT_BEGINNING_STRING))
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+_SINGLE_CHARACTERS = (sre_constants.IN, sre_constants.ANY, sre_constants.LITERAL, sre_constants.NOT_LITERAL)
+
+
+class PatternBounds(NamedTuple):
+    """
+    What a pattern says about every string it accepts, for strings without newlines.
+
+    `max_length` is the longest string it can accept. With `repeat` set, the pattern is a single character class
+    repeated, and a character is allowed if the pattern accepts it repeated `repeat` times. Either is None when the
+    pattern doesn't bound it.
+    """
+    max_length: Optional[int]
+    repeat: Optional[int]
+
+
+def pattern_bounds(pattern: re.Pattern) -> PatternBounds:
+    """
+    Work out the bounds `pattern` implies, from its parse tree.
+
+    Filters use `match`, which is only anchored at the start, so a pattern only bounds the whole string if it ends in
+    `$` or `\\Z`. (`$` also matches before a trailing newline, so the bounds don't hold for strings that end in one.)
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except (re.error, TypeError, ValueError):
+        return PatternBounds(None, None)
+    items = list(parsed)
+    if not items or items[-1] not in _ENDS:
+        return PatternBounds(None, None)
+    longest = parsed.getwidth()[1]
+    max_length = longest if longest < sre_constants.MAXREPEAT else None
+
+    body = items[:-1]
+    if body and body[0] in _BEGINNINGS:
+        body = body[1:]
+    repeat = None
+    if len(body) == 1 and body[0][0] in _REPEATS:
+        (low, high, item) = body[0][1]
+        if len(item) == 1 and item[0][0] in _SINGLE_CHARACTERS and high >= max(low, 1):
+            repeat = max(low, 1)
+    return PatternBounds(max_length, repeat)
+
+
+class FilterPlan:
+    """
+    A set of filter patterns compiled for repeated use: a string passes when every pattern matches it.
+
+    Duplicate patterns are merged, patterns are tried in order of how often they reject per unit of cost (re-ranked as
+    rejections are observed), and decisions for recently seen strings are cached.
+    """
+
+    def __init__(self, patterns: Iterable[re.Pattern], cache_size: int = 4096, sample_every: int = 64):
+        unique: dict[tuple[str, int], re.Pattern] = {}
+        for p in patterns:
+            unique.setdefault((p.pattern, p.flags), p)
+        # Pattern source length stands in for evaluation cost until rejections have been observed.
+        self.patterns: list[re.Pattern] = sorted(unique.values(), key=self._cost)
+        self.rejects: dict[re.Pattern, int] = {p: 0 for p in self.patterns}
+        self.samples = 0
+        self.evaluated = 0
+        self._matchers = [p.match for p in self.patterns]
+        self._sample_every = sample_every
+        self.accepts = lru_cache(maxsize=cache_size)(self._evaluate)
+
+    @staticmethod
+    def _cost(pattern: re.Pattern) -> int:
+        return 1 + len(pattern.pattern)
+
+    def _evaluate(self, data: str) -> bool:
+        self.evaluated += 1
+        if self.evaluated % self._sample_every == 0:
+            return self._sample(data)
+        for match in self._matchers:
+            if not match(data):
+                return False
+        return True
+
+    def _sample(self, data: str) -> bool:
+        # Short-circuiting hides how selective the later patterns are, so every so often run all of them.
+        self.samples += 1
+        result = True
+        for p in self.patterns:
+            if not p.match(data):
+                self.rejects[p] += 1
+                result = False
+        self._reorder()
+        return result
+
+    def _reorder(self):
+        def rank(p: re.Pattern) -> float:
+            # Laplace smoothing keeps a pattern that has not rejected anything yet from ranking as useless.
+            reject_rate = (self.rejects[p] + 1) / (self.samples + 2)
+            return -reject_rate / self._cost(p)
+
+        self.patterns.sort(key=rank)
+        self._matchers = [p.match for p in self.patterns]
+
+    @cached_property
+    def bounds(self) -> list[tuple[re.Pattern, PatternBounds]]:
+        return [(p, pattern_bounds(p)) for p in self.patterns]
+
+    def max_length(self) -> Optional[int]:
+        """The longest string every pattern could accept, if any pattern bounds it. Assumes no newlines."""
+        lengths = [b.max_length for (_, b) in self.bounds if b.max_length is not None]
+        return min(lengths) if lengths else None
+
+    def character_test(self) -> Optional[Callable[[str], bool]]:
+        """
+        A test of whether every character of a string is one the patterns allow, or None if they don't limit
+        characters. A string that fails can't be part of any string the plan accepts.
+        """
+        classes = [(p.match, b.repeat) for (p, b) in self.bounds if b.repeat is not None]
+        if not classes:
+            return None
+        allowed: dict[str, bool] = {}
+
+        def test(text: str) -> bool:
+            for ch in text:
+                ok = allowed.get(ch)
+                if ok is None:
+                    ok = allowed[ch] = all(match(ch * repeat) for (match, repeat) in classes)
+                if not ok:
+                    return False
+            return True
+
+        return test
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __iter__(self):
+        return iter(self.patterns)
+
+    def __repr__(self):
+        return f'FilterPlan({[p.pattern for p in self.patterns]!r})'
@@ -6,6 +6,8 @@ from typing import Callable, Any
 
 from pydantic import BaseModel, constr, confloat
 
+from hunterlib.sources import compiled_lines
+
 
 class ListSource:
     def __init__(self, kind: type, data: Iterable):
@@ -17,11 +19,25 @@ class ListSource:
 
 
 class FileSource:
-    def __init__(self, kind: Callable[[str], Any], filename: str):
+    """
+    Lines of a text file, each passed through `kind`.
+
+    By default the file is read through a compiled copy (see `hunterlib.sources`): stripped, without blank or repeated
+    lines, and rebuilt only when the file changes.
+    """
+
+    def __init__(self, kind: Callable[[str], Any], filename: str, compiled: bool = True):
         self._kind = kind
         self._filename = os.path.join(os.getcwd(), filename)
+        self._compiled = compiled
 
     def __iter__(self):
+        if self._compiled:
+            lines = compiled_lines(self._filename)
+            return lines if self._kind is str else map(self._kind, lines)
+        return self._iter_text()
+
+    def _iter_text(self):
         with open(self._filename, 'r') as f:
             for line_raw in f:
                 yield self._kind(line_raw.strip())
@@ -42,5 +58,12 @@ class Bias(BaseModel):
 
 
 class ScoreWeight(BaseModel):
-    query: str
+    # Dotted path into `plugin_data`, like `pronounce.score`.
+    query: constr(min_length=1)
     adjust: float
+
+    class Config:
+        allow_mutation = False
+
+    def __hash__(self):
+        return hash((self.query, self.adjust))
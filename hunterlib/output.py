@@ -0,0 +1,224 @@
+"""Writing generated domains out, in bulk."""
+
+import csv
+import io
+import json
+import mmap
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional, Union
+
+from hunterlib.steps.data import Domain
+
+BINARY_MAGIC = b'DHOUT001'
+_LENGTH = struct.Struct('<I')
+_WORD_COUNT = struct.Struct('<B')
+_STRING_LENGTH = struct.Struct('<H')
+_SCORE = struct.Struct('<d')
+
+
+class DomainRecord(NamedTuple):
+    """The parts of a `Domain` that are written out, and read back from binary output."""
+    domain: str
+    words: tuple[str, ...]
+    tld: str
+    score: float
+    plugin_data: dict[str, dict[str, Any]]
+
+    @classmethod
+    def from_domain(cls, d: Union[Domain, 'DomainRecord']) -> 'DomainRecord':
+        if isinstance(d, DomainRecord):
+            return d
+        return cls(d.domain, d.as_words(), d.domain.rpartition('.')[2], d.score, d.plugin_data)
+
+
+class DomainWriter(ABC):
+    """
+    Buffers formatted records and writes them in batches.
+
+    The first record is written straight away so output starts immediately. After that a batch is written once it
+    holds `batch_size` records or `flush_interval` seconds have passed since the last write, whichever comes first.
+    A background thread writes the batch out if the interval passes with no more records, so records aren't held back
+    while the source is slow to produce the next one.
+    """
+
+    def __init__(self, stream: BinaryIO, batch_size: int = 1024, flush_interval: float = 0.25):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._batch: list[bytes] = []
+        self._last_flush = None
+        # Held while the batch or the stream is touched, since the flushing thread does both.
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def format(self, record: DomainRecord) -> bytes:
+        """The bytes written for `record`."""
+
+    def write(self, d: Union[Domain, DomainRecord]):
+        formatted = self.format(DomainRecord.from_domain(d))
+        with self._lock:
+            self._batch.append(formatted)
+            self.written += 1
+            if (self._last_flush is None or len(self._batch) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+            elif self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_stalled, name='domain-hunter-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_stalled(self):
+        timeout = self.flush_interval
+        while not self._closed.wait(timeout):
+            with self._lock:
+                timeout = self._last_flush + self.flush_interval - time.monotonic()
+                if timeout <= 0:
+                    if self._batch:
+                        self._flush()
+                    timeout = self.flush_interval
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._batch:
+            self.stream.write(b''.join(self._batch))
+            self._batch.clear()
+        self.stream.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TextWriter(DomainWriter):
+    def format(self, record: DomainRecord) -> bytes:
+        return "{0:32s} {1: 11.9g}\n".format(record.domain, record.score).encode('utf-8')
+
+
+class JsonLinesWriter(DomainWriter):
+    def format(self, record: DomainRecord) -> bytes:
+        return (json.dumps(record._asdict(), separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class CsvWriter(DomainWriter):
+    COLUMNS = ('domain', 'words', 'tld', 'score', 'plugin_data')
+
+    def __init__(self, stream: BinaryIO, *args, **kwargs):
+        super().__init__(stream, *args, **kwargs)
+        self._text = io.StringIO()
+        self._csv = csv.writer(self._text, lineterminator='\n')
+        self._batch.append(self._row(self.COLUMNS))
+
+    def _row(self, row) -> bytes:
+        self._csv.writerow(row)
+        value = self._text.getvalue()
+        self._text.seek(0)
+        self._text.truncate()
+        return value.encode('utf-8')
+
+    def format(self, record: DomainRecord) -> bytes:
+        plugin_data = json.dumps(record.plugin_data, separators=(',', ':')) if record.plugin_data else ''
+        return self._row((record.domain, ' '.join(record.words), record.tld, repr(record.score), plugin_data))
+
+
+def _pack_string(s: str) -> bytes:
+    encoded = s.encode('utf-8')
+    return _STRING_LENGTH.pack(len(encoded)) + encoded
+
+
+class BinaryWriter(DomainWriter):
+    """
+    Length-prefixed binary records, after an 8 byte magic header. All integers are little endian.
+
+    Each record is a uint32 payload length, then the payload: a uint8 word count, each word as a uint16 length and
+    UTF-8 bytes, the TLD the same way, the score as a float64, and `plugin_data` as a uint32 length and UTF-8 JSON.
+    """
+
+    def __init__(self, stream: BinaryIO, *args, **kwargs):
+        super().__init__(stream, *args, **kwargs)
+        self._batch.append(BINARY_MAGIC)
+
+    def format(self, record: DomainRecord) -> bytes:
+        return pack_record(record)
+
+
+def pack_record(record: DomainRecord) -> bytes:
+    """A record the way `BinaryWriter` writes it."""
+    plugin_data = json.dumps(record.plugin_data, separators=(',', ':')).encode('utf-8') if record.plugin_data else b''
+    payload = b''.join((
+        _WORD_COUNT.pack(len(record.words)),
+        *map(_pack_string, record.words),
+        _pack_string(record.tld),
+        _SCORE.pack(record.score),
+        _LENGTH.pack(len(plugin_data)),
+        plugin_data,
+    ))
+    return _LENGTH.pack(len(payload)) + payload
+
+
+WRITERS = {
+    'text': TextWriter,
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'binary': BinaryWriter,
+}
+
+
+def read_binary(path: str) -> Iterator[DomainRecord]:
+    """Memory-map a file written by `BinaryWriter` and iterate over its records."""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f'Not a binary domain file: {path}')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+                raise ValueError(f'Not a binary domain file: {path}')
+            yield from _read_records(mm, len(BINARY_MAGIC))
+
+
+def _read_string(buffer, position: int) -> tuple[str, int]:
+    (length,) = _STRING_LENGTH.unpack_from(buffer, position)
+    position += _STRING_LENGTH.size
+    return str(buffer[position:position + length], 'utf-8'), position + length
+
+
+def _read_records(buffer, position: int) -> Iterator[DomainRecord]:
+    end = len(buffer)
+    while position < end:
+        (record, position) = unpack_record(buffer, position)
+        yield record
+
+
+def unpack_record(buffer, position: int) -> tuple[DomainRecord, int]:
+    """Read the record `pack_record` wrote at `position` in `buffer`. Returns it and the position after it."""
+    (length,) = _LENGTH.unpack_from(buffer, position)
+    position += _LENGTH.size
+    record_end = position + length
+    (word_count,) = _WORD_COUNT.unpack_from(buffer, position)
+    position += _WORD_COUNT.size
+    words = []
+    for _ in range(word_count):
+        word, position = _read_string(buffer, position)
+        words.append(word)
+    tld, position = _read_string(buffer, position)
+    (score,) = _SCORE.unpack_from(buffer, position)
+    position += _SCORE.size
+    (plugin_length,) = _LENGTH.unpack_from(buffer, position)
+    position += _LENGTH.size
+    plugin_data = json.loads(buffer[position:position + plugin_length]) if plugin_length else {}
+    return DomainRecord(''.join(words) + '.' + tld, tuple(words), tld, score, plugin_data), record_end
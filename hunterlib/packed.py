@@ -0,0 +1,173 @@
+"""A small, memory-mappable container of named binary sections, used for the on-disk indexes."""
+
+import mmap
+import os
+import os.path
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+from hunterlib.utils import atomic_write
+
+MAGIC = b'DHPACK01'
+_HEADER = struct.Struct('<8sBxxxI')
+_ENTRY = struct.Struct('<16sQQ')
+_BYTEORDER = {'little': 1, 'big': 2}[sys.byteorder]
+
+
+def pack_strings(strings: Iterable[str]) -> tuple[bytes, bytes]:
+    """Encode strings as an offsets table (n + 1 native uint64 values) and a single UTF-8 blob."""
+    offsets = array('Q', [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets.tobytes(), bytes(blob)
+
+
+def pack_ints(values: Iterable[int], typecode: str = 'I') -> bytes:
+    return array(typecode, values).tobytes()
+
+
+def _layout(sizes: dict[str, int]) -> tuple[bytes, list[int]]:
+    """The header and section table for sections of the given sizes, and the padding before each section."""
+    position = _HEADER.size + _ENTRY.size * len(sizes)
+    entries = []
+    paddings = []
+    for name, size in sizes.items():
+        if len(name) > 16:
+            raise ValueError(f'Section name is longer than 16 characters: {name}')
+        # Keep every section 8-byte aligned so it can be cast straight to an array.
+        padding = -position % 8
+        position += padding
+        entries.append(_ENTRY.pack(name.encode('ascii'), position, size))
+        paddings.append(padding)
+        position += size
+    return _HEADER.pack(MAGIC, _BYTEORDER, len(sizes)) + b''.join(entries), paddings
+
+
+def write_packed(path: str, sections: dict[str, bytes]):
+    """Atomically write `sections` to `path`. String tables take two sections, `<name>.offsets` and `<name>.data`."""
+    header, paddings = _layout({name: len(data) for name, data in sections.items()})
+    body = b''.join(b'\0' * padding + data for padding, data in zip(paddings, sections.values()))
+    atomic_write(path, header + body)
+
+
+def write_packed_files(path: str, sections: dict[str, str]):
+    """Like `write_packed`, but each section is copied from the file at the given path, so none are held in memory."""
+    header, paddings = _layout({name: os.path.getsize(source) for name, source in sections.items()})
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(header)
+            for padding, source in zip(paddings, sections.values()):
+                out.write(b'\0' * padding)
+                with open(source, 'rb') as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class StringTable(Sequence):
+    """Read-only view of a string table written by `pack_strings`. Items are decoded on access."""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def raw(self, index: int) -> memoryview:
+        return self._data[self._offsets[index]:self._offsets[index + 1]]
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(self.raw(index), 'utf-8')
+
+    def __iter__(self):
+        data = self._data
+        offsets = self._offsets
+        for i in range(len(self)):
+            yield str(data[offsets[i]:offsets[i + 1]], 'utf-8')
+
+    def find(self, key: str) -> Optional[int]:
+        """Binary search a table that was written in sorted order. UTF-8 byte order matches code point order."""
+        encoded = key.encode('utf-8')
+        keys = _RawKeys(self)
+        i = bisect_left(keys, encoded)
+        if i < len(self) and keys[i] == encoded:
+            return i
+        return None
+
+
+class _RawKeys(Sequence):
+    def __init__(self, table: StringTable):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, index: int) -> bytes:
+        return bytes(self._table.raw(index))
+
+
+class PackedFile:
+    """A memory-mapped file written by `write_packed`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, byteorder, count = _HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'Not a packed index file: {path}')
+        if byteorder != _BYTEORDER:
+            self.close()
+            raise ValueError(f'Packed index was written on a machine with a different byte order: {path}')
+        self._sections = {}
+        for i in range(count):
+            name, offset, length = _ENTRY.unpack_from(self._view, _HEADER.size + i * _ENTRY.size)
+            self._sections[name.rstrip(b'\0').decode('ascii')] = (offset, length)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def raw(self, name: str) -> memoryview:
+        offset, length = self._sections[name]
+        return self._view[offset:offset + length]
+
+    def find(self, name: str, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        """Search section `name` for `sub`, in C, without copying. Positions are relative to the section."""
+        offset, length = self._sections[name]
+        end = length if end is None else min(end, length)
+        position = self._mmap.find(sub, offset + start, offset + end)
+        return position - offset if position >= 0 else -1
+
+    def ints(self, name: str, typecode: str = 'I') -> memoryview:
+        return self.raw(name).cast(typecode)
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable(self.ints(f'{name}.offsets', 'Q'), self.raw(f'{name}.data'))
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
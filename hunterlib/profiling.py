@@ -0,0 +1,246 @@
+"""
+Opt-in per-stage profiling of the pipeline.
+
+Pipeline code marks its stages with `profiled` (for a lazy chain) or `profiled_block` (for a step that runs all at
+once). Both hand back their argument untouched unless a `Profiler` is active, so with profiling off each stage costs
+one global lookup when the pipeline is built, and nothing per item.
+"""
+
+import json
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from typing import Any, Optional, TypeVar
+
+from hunterlib.filters import FilterPlan
+
+T = TypeVar('T')
+
+# The profiler in use, if any. Set by `Profiler.start`.
+ACTIVE: Optional['Profiler'] = None
+
+
+class Stage:
+    """What one stage cost. Times are inclusive of the stages it pulls from, and `self_*` times exclude them."""
+
+    def __init__(self, name: str, source: Optional[str] = None):
+        self.name = name
+        self.source = source
+        self.calls = 0
+        self.items_in: Optional[int] = None
+        self.items_out = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.self_wall = 0.0
+        self.self_cpu = 0.0
+        self.peak_size: Optional[int] = None
+        self.peak_alloc: Optional[int] = None
+        self.filters: Optional[FilterPlan] = None
+        self.rejects: dict[str, int] = {}
+
+    def count(self, items_in: Optional[int] = None, items_out: int = 0):
+        if items_in is not None:
+            self.items_in = (self.items_in or 0) + items_in
+        self.items_out += items_out
+
+    def as_dict(self, stages: dict[str, 'Stage']) -> dict[str, Any]:
+        items_in = self.items_in
+        if items_in is None and self.source in stages:
+            items_in = stages[self.source].items_out
+        result = {
+            'source': self.source, 'calls': self.calls, 'items_in': items_in, 'items_out': self.items_out,
+            'wall': self.wall, 'cpu': self.cpu, 'self_wall': self.self_wall, 'self_cpu': self.self_cpu,
+        }
+        if self.peak_size is not None:
+            result['peak_size'] = self.peak_size
+        if self.peak_alloc is not None:
+            result['peak_alloc'] = self.peak_alloc
+        if self.filters is not None:
+            result['rejects'] = dict(sorted(self.rejects.items(), key=lambda kv: -kv[1]))
+        return result
+
+
+class _NullStage:
+    def count(self, items_in: Optional[int] = None, items_out: int = 0):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """
+    Collects `Stage` records while it is active.
+
+    Lazy stages interleave, so time is attributed the way a call profiler does it: each pull from a stage is timed, and
+    the time spent in pulls from other stages inside it is subtracted for its self time. With `memory`, allocations are
+    traced with `tracemalloc` and each stage records the most memory allocated during any one pull, which slows
+    everything down noticeably.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stages: dict[str, Stage] = {}
+        # Per active pull: [wall start, cpu start, child wall, child cpu, allocated at start, highest seen].
+        self._stack: list[list] = []
+        self._started = 0.0
+        self._cpu_started = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_alloc: Optional[int] = None
+
+    def start(self) -> 'Profiler':
+        global ACTIVE
+        ACTIVE = self
+        if self.memory:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        return self
+
+    def stop(self):
+        global ACTIVE
+        if ACTIVE is self:
+            ACTIVE = None
+        self.wall = time.perf_counter() - self._started
+        self.cpu = time.process_time() - self._cpu_started
+        if self.memory and tracemalloc.is_tracing():
+            self.peak_alloc = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def stage(self, name: str, source: Optional[str] = None) -> Stage:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name, source)
+        return stage
+
+    def _enter(self):
+        allocated = 0
+        if self.memory:
+            (allocated, peak) = tracemalloc.get_traced_memory()
+            if self._stack:
+                # The peak is about to be reset, so hand it to the pull this one is nested in first.
+                self._stack[-1][5] = max(self._stack[-1][5], peak)
+            tracemalloc.reset_peak()
+        self._stack.append([time.perf_counter(), time.process_time(), 0.0, 0.0, allocated, allocated])
+
+    def _exit(self, stage: Stage):
+        (wall_start, cpu_start, child_wall, child_cpu, allocated, seen) = self._stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        stage.calls += 1
+        stage.wall += wall
+        stage.cpu += cpu
+        stage.self_wall += wall - child_wall
+        stage.self_cpu += cpu - child_cpu
+        if self._stack:
+            self._stack[-1][2] += wall
+            self._stack[-1][3] += cpu
+        if self.memory:
+            peak = max(seen, tracemalloc.get_traced_memory()[1])
+            stage.peak_alloc = max(stage.peak_alloc or 0, peak - allocated)
+            if self._stack:
+                self._stack[-1][5] = max(self._stack[-1][5], peak)
+
+    def wrap(self, stage: Stage, chain: Iterable[T], size: Optional[Callable[[], int]]) -> Iterator[T]:
+        items = iter(chain)
+        enter = self._enter
+        exit_ = self._exit
+        while True:
+            enter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                exit_(stage)
+                if size is not None:
+                    stage.peak_size = max(stage.peak_size or 0, size())
+            stage.items_out += 1
+            yield item
+
+    @contextmanager
+    def block(self, stage: Stage) -> Iterator[Stage]:
+        self._enter()
+        try:
+            yield stage
+        finally:
+            self._exit(stage)
+
+    @staticmethod
+    def count_rejects(stage: Stage, filters: FilterPlan):
+        """Swap in an `accepts` for `filters` that also counts, for each rejected string, every pattern it fails."""
+        stage.filters = filters
+        rejects = stage.rejects
+        accepts = filters.accepts
+
+        def counting_accepts(data: str) -> bool:
+            if accepts(data):
+                return True
+            for p in filters.patterns:
+                if not p.match(data):
+                    rejects[p.pattern] = rejects.get(p.pattern, 0) + 1
+            return False
+
+        filters.accepts = counting_accepts
+
+    def report(self) -> dict[str, Any]:
+        return {
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'peak_alloc': self.peak_alloc,
+            'stages': {name: stage.as_dict(self.stages) for (name, stage) in self.stages.items()},
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self) -> str:
+        """The report as a table, one line per stage, in the order the stages were set up."""
+        memory = self.peak_alloc is not None
+        lines = [f'{"stage":<20} {"self wall":>10} {"self cpu":>10} {"wall":>10} {"in":>10} {"out":>10} {"peak":>8}'
+                 + (f' {"alloc":>10}' if memory else '')]
+        report = self.report()['stages']
+        for (name, s) in report.items():
+            items_in = '' if s['items_in'] is None else s['items_in']
+            line = (f'{name:<20} {s["self_wall"]:>9.3f}s {s["self_cpu"]:>9.3f}s {s["wall"]:>9.3f}s {items_in:>10} '
+                    f'{s["items_out"]:>10} {s.get("peak_size", ""):>8}')
+            if memory:
+                line += f' {_size(s.get("peak_alloc", 0)):>10}'
+            lines.append(line)
+            for (pattern, count) in s.get('rejects', {}).items():
+                lines.append(f'    rejected {count:>10} by {pattern}')
+        lines.append(f'{"total":<20} {self.wall:>9.3f}s {self.cpu:>9.3f}s'
+                     + (f'   peak allocated {_size(self.peak_alloc)}' if memory else ''))
+        return '\n'.join(lines)
+
+
+def _size(n: int) -> str:
+    return f'{n / (1 << 20):.2f}MiB'
+
+
+def profiled(name: str, chain: Iterable[T], source: Optional[str] = None, size: Optional[Callable[[], int]] = None,
+             filters: Optional[FilterPlan] = None) -> Iterable[T]:
+    """
+    Record stage `name` as `chain` is pulled from, if profiling.
+
+    `source` names the stage `chain` consumes, for its item count. `size` reports a queue length to track the peak of.
+    With `filters` (the plan `chain` filters with, before `chain` starts), rejections are counted per pattern.
+    """
+    profiler = ACTIVE
+    if profiler is None:
+        return chain
+    stage = profiler.stage(name, source)
+    if filters is not None:
+        profiler.count_rejects(stage, filters)
+    return profiler.wrap(stage, chain, size)
+
+
+def profiled_block(name: str):
+    """A context manager recording stage `name` around a step, if profiling. It gives a stage to `count` items on."""
+    profiler = ACTIVE
+    if profiler is None:
+        return nullcontext(_NULL_STAGE)
+    return profiler.block(profiler.stage(name))
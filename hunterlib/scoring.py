@@ -0,0 +1,163 @@
+"""Extra scorers for candidate domains, whose results re-rank the domain stream through `score_weights`."""
+
+import logging
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from heapq import heappop, heappush
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Optional, Protocol
+
+from hunterlib.conf import RunConfig
+from hunterlib.models import ScoreWeight
+
+if TYPE_CHECKING:
+    # hunterlib.steps imports this module, so only import from it for type checkers.
+    from hunterlib.steps.data import Domain
+
+logger = logging.getLogger('domain-hunter.scoring')
+
+# Scorers loaded in this process, by spec. Pool workers load each one once and keep it.
+_LOADED: dict[str, 'Scorer'] = {}
+
+
+class Scorer(Protocol):
+    """
+    Scores domains a batch at a time.
+
+    `score_batch` gets a batch of domain names and returns one dict per name, in the same order, which ends up in the
+    domain's `plugin_data` under `name`. A scorer that is cheap per batch (vectorized, or a lookup in memory) can set
+    `in_process = True` to skip the trip to a worker process.
+    """
+    name: str
+    in_process: bool
+
+    def score_batch(self, domains: Sequence[str]) -> Sequence[dict[str, Any]]:
+        ...
+
+
+def load_scorer(spec: str) -> Scorer:
+    """
+    Import the scorer named by `spec`, as `package.module:attribute`. A class is instantiated with no arguments.
+    Scorers without a `name` are named by their spec.
+    """
+    scorer = _LOADED.get(spec)
+    if scorer is None:
+        (module_name, _, attribute) = spec.partition(':')
+        if not attribute:
+            raise ValueError(f'Scorer must be given as module:attribute, not {spec!r}')
+        scorer = getattr(import_module(module_name), attribute)
+        if isinstance(scorer, type):
+            scorer = scorer()
+        if not hasattr(scorer, 'name'):
+            scorer.name = spec
+        _LOADED[spec] = scorer
+    return scorer
+
+
+def _score_in_worker(spec: str, domains: list[str]) -> list[dict[str, Any]]:
+    return list(load_scorer(spec).score_batch(domains))
+
+
+def query_value(plugin_data: dict[str, Any], path: Sequence[str]) -> Any:
+    """Follow a dotted query like `pronounce.score`, split on the dots, into `plugin_data`. None if it isn't there."""
+    value = plugin_data
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def weight_adjustment(plugin_data: dict[str, Any], weights: Iterable[tuple[Sequence[str], float]]) -> float:
+    """
+    Sum of the adjustments `score_weights` give a domain. A numeric result is multiplied by its weight's `adjust`, and a
+    boolean one adds `adjust` when true. Anything else, or nothing at all, adds nothing.
+    """
+    total = 0.0
+    for (path, adjust) in weights:
+        value = query_value(plugin_data, path)
+        if isinstance(value, bool):
+            total += adjust if value else 0.0
+        elif isinstance(value, (int, float)):
+            total += adjust * value
+    return total
+
+
+def _split_weights(score_weights: Iterable[ScoreWeight]) -> list[tuple[tuple[str, ...], float]]:
+    # Sorted, so the sum comes out the same whatever order the set iterates in.
+    return sorted((tuple(w.query.split('.')), w.adjust) for w in score_weights)
+
+
+def score_domains(domains: Iterable['Domain'], config: RunConfig) -> Iterator['Domain']:
+    """
+    Run the configured scorers over `domains` in batches, adjust each score by `score_weights`, and re-rank.
+
+    Scorers that aren't `in_process` run on a pool of `workers` processes (in process, when that's 0), with a few
+    batches in flight while the next ones are generated. Re-ranking only looks `window` domains ahead, so results
+    keep streaming: a domain can move up at most `window` places, and the output is only fully sorted if no
+    adjustment lifts a domain further than that.
+    """
+    conf = config.scorer_conf
+    scorers = [(spec, load_scorer(spec)) for spec in conf.names]
+    weights = _split_weights(config.score_weights)
+    pooled = conf.workers > 0 and any(not getattr(s, 'in_process', False) for (_, s) in scorers)
+    pool = ProcessPoolExecutor(conf.workers) if pooled else None
+    logger.debug('Scoring domains', extra={'scorers': conf.names, 'workers': conf.workers if pooled else 0})
+    try:
+        batches = _scored_batches(domains, scorers, conf.batch_size, conf.prefetch, pool)
+        yield from rerank((d for batch in batches for d in _adjust(batch, weights)), conf.window)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _scored_batches(domains: Iterable['Domain'], scorers: list[tuple[str, Scorer]], batch_size: int, prefetch: int,
+                    pool: Optional[Executor]) -> Iterator[list['Domain']]:
+    source = iter(domains)
+    in_flight: deque[tuple[list['Domain'], list[Future]]] = deque()
+    pooled = [(spec, s) for (spec, s) in scorers if pool is not None and not getattr(s, 'in_process', False)]
+    local = [s for (_, s) in scorers if pool is None or getattr(s, 'in_process', False)]
+    # Batches only need to queue up while the pool works on them.
+    prefetch = prefetch if pooled else 1
+    while True:
+        batch = [d for (_, d) in zip(range(batch_size), source)]
+        if batch:
+            names = [d.domain for d in batch]
+            in_flight.append((batch, [pool.submit(_score_in_worker, spec, names) for (spec, _) in pooled]))
+        if not in_flight:
+            return
+        if batch and len(in_flight) < prefetch:
+            continue
+        (batch, futures) = in_flight.popleft()
+        names = [d.domain for d in batch]
+        for ((_, s), future) in zip(pooled, futures):
+            _attach(batch, s.name, future.result())
+        for s in local:
+            _attach(batch, s.name, s.score_batch(names))
+        yield batch
+
+
+def _attach(batch: list['Domain'], name: str, results: Sequence[dict[str, Any]]):
+    if len(results) != len(batch):
+        raise ValueError(f'Scorer {name} returned {len(results)} results for {len(batch)} domains.')
+    for (d, result) in zip(batch, results):
+        d.plugin_data[name] = result
+
+
+def _adjust(batch: list['Domain'], weights: list[tuple[tuple[str, ...], float]]) -> list['Domain']:
+    if weights:
+        for d in batch:
+            d.score += weight_adjustment(d.plugin_data, weights)
+    return batch
+
+
+def rerank(domains: Iterable['Domain'], window: int) -> Iterator['Domain']:
+    """Yield `domains` best score first, holding back at most `window` of them. Ties keep their order."""
+    heap = []
+    for (i, d) in enumerate(domains):
+        heappush(heap, (-d.score, i, d))
+        if len(heap) > window:
+            yield heappop(heap)[2]
+    while heap:
+        yield heappop(heap)[2]
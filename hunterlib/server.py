@@ -0,0 +1,302 @@
+"""A long-running local HTTP server that keeps configs loaded and domain cursors live between requests."""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from importlib import import_module
+from itertools import islice
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from hunterlib.conf import RunConfig
+from hunterlib.output import DomainRecord
+from hunterlib.steps.config import load_config
+from hunterlib.steps.cursor import DomainCursor
+
+logger = logging.getLogger('domain-hunter.server')
+
+# Rough per-item sizes, in bytes, for estimating how much memory a cursor holds.
+_COMBO_NODE_BYTES = 200
+_DOMAIN_NODE_BYTES = 600
+_WORD_BYTES = 400
+_STREAM_BATCH = 256
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class CursorEntry:
+    config: str
+    limit: Optional[int]
+    min_score: Optional[float]
+    cursor: DomainCursor
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def estimated_bytes(self) -> int:
+        return (len(self.cursor.combos.heap) * _COMBO_NODE_BYTES
+                + len(self.cursor.domains.queue) * _DOMAIN_NODE_BYTES
+                + len(self.cursor.domains.word_buffer) * _WORD_BYTES)
+
+
+def _int_param(params: dict[str, str], name: str, default: Optional[int]) -> Optional[int]:
+    try:
+        return int(params[name]) if name in params else default
+    except ValueError:
+        raise RequestError(400, f'{name} must be an integer')
+
+
+def _float_param(params: dict[str, str], name: str) -> Optional[float]:
+    try:
+        return float(params[name]) if name in params else None
+    except ValueError:
+        raise RequestError(400, f'{name} must be a number')
+
+
+class DomainServer:
+    """
+    Serves pages of the ranked domain stream for the config modules in `config_names`.
+
+    Every page is addressed by offset. Cursors are kept after each request, and a request continues the live cursor
+    for the same config and search bounds that is furthest along without having passed its offset, so a client paging
+    forwards pays only for the page itself. Cursors are dropped after `idle_timeout` seconds without use, and least
+    recently used first whenever their estimated size goes over `memory_budget` bytes.
+
+    Searching runs on a worker thread, so the event loop keeps accepting requests, and each cursor serves one request at
+    a time.
+    """
+
+    def __init__(self, config_names: Iterable[str], idle_timeout: float = 300, memory_budget: int = 256 << 20,
+                 max_count: int = 10000, snapshot: bool = True):
+        self.config_names = set(config_names)
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.max_count = max_count
+        self.snapshot = snapshot
+        self.configs: dict[str, RunConfig] = {}
+        self.cursors: list[CursorEntry] = []
+        self._loading: dict[str, asyncio.Future] = {}
+
+    async def config(self, name: str) -> RunConfig:
+        if name in self.configs:
+            return self.configs[name]
+        if name not in self.config_names:
+            raise RequestError(404, f'Unknown config: {name}')
+        if name not in self._loading:
+            loop = asyncio.get_running_loop()
+            self._loading[name] = loop.run_in_executor(None, lambda: load_config(import_module(name), self.snapshot))
+        try:
+            conf = await asyncio.shield(self._loading[name])
+        finally:
+            self._loading.pop(name, None)
+        self.configs[name] = conf
+        return conf
+
+    async def _checkout(self, name: str, limit: Optional[int], min_score: Optional[float],
+                        offset: int) -> CursorEntry:
+        """Lock and return the best cursor to continue from for `offset`, creating one if none can be reused."""
+        best = None
+        for entry in self.cursors:
+            if ((entry.config, entry.limit, entry.min_score) == (name, limit, min_score)
+                    and not entry.lock.locked() and entry.cursor.position <= offset
+                    and (best is None or entry.cursor.position > best.cursor.position)):
+                best = entry
+        if best is None:
+            conf = await self.config(name)
+            cursor = await asyncio.get_running_loop().run_in_executor(None, DomainCursor, conf, limit, min_score)
+            best = CursorEntry(name, limit, min_score, cursor)
+            self.cursors.append(best)
+        await best.lock.acquire()
+        return best
+
+    def _release(self, entry: CursorEntry):
+        entry.last_used = time.monotonic()
+        entry.lock.release()
+        self.evict()
+
+    def evict(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        idle = [e for e in self.cursors if not e.lock.locked() and now - e.last_used > self.idle_timeout]
+        for entry in idle:
+            self.cursors.remove(entry)
+        total = sum(e.estimated_bytes() for e in self.cursors)
+        for entry in sorted(self.cursors, key=lambda e: e.last_used):
+            if total <= self.memory_budget:
+                break
+            if not entry.lock.locked():
+                self.cursors.remove(entry)
+                total -= entry.estimated_bytes()
+        if idle:
+            logger.debug('Evicted idle cursors', extra={'evicted': len(idle), 'cursors': len(self.cursors)})
+
+    def _request(self, params: dict[str, str]) -> tuple[str, Optional[int], Optional[float], int, int]:
+        if 'config' not in params:
+            raise RequestError(400, 'config is required')
+        offset = _int_param(params, 'offset', 0)
+        count = _int_param(params, 'count', 50)
+        if offset < 0 or not 0 <= count <= self.max_count:
+            raise RequestError(400, f'offset must be at least 0, and count between 0 and {self.max_count}')
+        return params['config'], _int_param(params, 'limit', None), _float_param(params, 'min_score'), offset, count
+
+    @staticmethod
+    def _take(cursor: DomainCursor, offset: int, count: int) -> list[dict[str, Any]]:
+        cursor.skip(offset - cursor.position)
+        return [DomainRecord.from_domain(d)._asdict() for d in islice(cursor, count)]
+
+    async def page(self, params: dict[str, str]) -> dict[str, Any]:
+        name, limit, min_score, offset, count = self._request(params)
+        entry = await self._checkout(name, limit, min_score, offset)
+        try:
+            domains = await asyncio.get_running_loop().run_in_executor(None, self._take, entry.cursor, offset, count)
+        finally:
+            self._release(entry)
+        return {'offset': offset, 'next_offset': offset + len(domains), 'domains': domains}
+
+    async def stream(self, params: dict[str, str], writer: asyncio.StreamWriter) -> bool:
+        """
+        Write results as chunked JSON lines, a batch at a time, waiting for the client to keep up between batches.
+
+        Once the response has started, an error can only be reported by cutting it short, so this returns False if the
+        stream was not completed.
+        """
+        name, limit, min_score, offset, count = self._request(params)
+        entry = await self._checkout(name, limit, min_score, offset)
+        try:
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n')
+            loop = asyncio.get_running_loop()
+            position = offset
+            end = offset + count
+            while position < end:
+                batch = await loop.run_in_executor(None, self._take, entry.cursor, position,
+                                                   min(_STREAM_BATCH, end - position))
+                if not batch:
+                    break
+                position += len(batch)
+                data = ''.join(json.dumps(d, separators=(',', ':')) + '\n' for d in batch).encode('utf-8')
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            return True
+        except ConnectionError:
+            raise
+        except Exception:
+            logger.exception('Stream failed')
+            return False
+        finally:
+            self._release(entry)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'configs': sorted(self.configs),
+            'cursors': [{'config': e.config, 'position': e.cursor.position, 'bytes': e.estimated_bytes()}
+                        for e in self.cursors],
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if not await self._respond(request_line, writer) or not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line: bytes, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request. Returns False when the connection can't be reused."""
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            url = urlsplit(target)
+            params = dict(parse_qsl(url.query))
+            if method != 'GET':
+                raise RequestError(405, 'Only GET is supported')
+            if url.path == '/stream':
+                return await self.stream(params, writer)
+            if url.path == '/page':
+                body = await self.page(params)
+            elif url.path == '/stats':
+                body = self.stats()
+            else:
+                raise RequestError(404, f'No such endpoint: {url.path}')
+            status = 200
+        except RequestError as e:
+            status, body = e.status, {'error': str(e)}
+        except ValueError:
+            status, body = 400, {'error': 'Malformed request'}
+        except Exception as e:
+            logger.exception('Request failed')
+            status, body = 500, {'error': f'{type(e).__name__}: {e}'}
+        data = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\n\r\n'.encode('latin-1') + data)
+        await writer.drain()
+        return True
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            self.evict()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8737, path: Optional[str] = None,
+                    ready: Optional[Future] = None):
+        """Serve on a TCP port, or on the Unix socket at `path`, until cancelled. `ready` gets the bound address."""
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        evictor = asyncio.ensure_future(self._evict_periodically())
+        if ready is not None:
+            ready.set_result(server.sockets[0].getsockname())
+        logger.debug('Serving', extra={'address': path or f'{host}:{port}'})
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description='Serve ranked domains to local clients over HTTP.')
+    parser.add_argument('--config', action='append', dest='configs', required=True,
+                        help='Config module clients may ask for. Repeat for more than one.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8737)
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of a TCP port.')
+    parser.add_argument('--idle-timeout', type=float, default=300, help='Seconds before an unused cursor is dropped.')
+    parser.add_argument('--memory-budget', type=int, default=256, help='MiB of cursors to keep at most (estimated).')
+    args = parser.parse_args(argv)
+
+    server = DomainServer(args.configs, args.idle_timeout, args.memory_budget << 20)
+
+    async def run():
+        # Load every config up front, so the first request doesn't pay for it.
+        await asyncio.gather(*map(server.config, args.configs))
+        await server.serve(args.host, args.port, args.socket)
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
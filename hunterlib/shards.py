@@ -0,0 +1,255 @@
+"""
+A run split by TLD across machines, each writing a shard file, and the shard files merged back into the serial order.
+
+Shard `i` of `n` takes every `n`th TLD from the `i`th, the same partitions `generate_domains_parallel` deals its
+workers. Merging needs every domain's place in the serial queue, which `generate_domains_parallel` gets by having
+workers send a key for rejected domains as well. Shard files instead give each domain the highest key of any domain up
+to it in the shard, rejected ones included. That makes each shard sorted, so rejected domains can be left out, and
+merging the shards on those keys gives exactly the order merging on the plain keys does.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import struct
+import sys
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from typing import BinaryIO, Iterator, Optional
+
+from hunterlib.conf import RunConfig
+from hunterlib.output import WRITERS, DomainRecord, DomainWriter, pack_record, unpack_record
+from hunterlib.steps.chains import MAX_WORDS, generate_tld_chain
+from hunterlib.steps.data import Domain
+from hunterlib.steps.parallel import partition_domains
+from hunterlib.zones import RegisteredIndex
+
+logger = logging.getLogger('domain-hunter.shards')
+
+SHARD_MAGIC = b'DHSHARD1'
+# Bump when the shard layout or how domains are keyed changes.
+SHARD_VERSION = 2
+# The key ahead of each record: the serial queue's (negated score, TLD index).
+_KEY = struct.Struct('<dI')
+_TRAILER_LENGTH = struct.Struct('<I')
+
+
+def shard_tlds(tld_count: int, shard: int, shards: int) -> tuple[int, ...]:
+    if not 0 <= shard < shards:
+        raise ValueError(f'Shard {shard} is out of range for {shards} shards.')
+    return tuple(range(shard, tld_count, shards))
+
+
+def shard_fingerprint(config: RunConfig, shards: int, limit: Optional[int], min_score: Optional[float],
+                      registered: Optional[RegisteredIndex] = None) -> str:
+    """
+    Everything the keys in a shard depend on, so shards are only merged with others from the same run. The registered
+    index counts by its contents rather than its directory, so shards can be written on machines with their own copy.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+            SHARD_VERSION, MAX_WORDS, shards, limit, min_score,
+            registered.stamp() if registered is not None else None,
+            sorted(config.word_list), sorted(config.tld_list),
+            *(sorted((p.pattern, p.flags) for p in filters)
+              for filters in (config.word_filters, config.tld_filters, config.domain_filters)),
+            *(sorted((b.pattern, b.adjust) for b in biases)
+              for biases in (config.word_biases, config.tld_biases, config.domain_biases)),
+            config.dedupe_conf.dict(),
+    ):
+        digest.update(json.dumps(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def generate_shard(config: RunConfig, shard: int, shards: int, limit: Optional[int] = None,
+                   min_score: Optional[float] = None,
+                   registered: Optional[RegisteredIndex] = None) -> Iterator[tuple[tuple[float, int], Domain]]:
+    """
+    The domains of shard `shard` of `shards` that pass the filters and aren't registered, in serial order, each with
+    its merge key. Keys never decrease.
+    """
+    tld_count = sum(1 for _ in generate_tld_chain(config))
+    key = None
+    for (score, tld_index, domain) in partition_domains(config, shard_tlds(tld_count, shard, shards), limit,
+                                                        min_score, registered):
+        if key is None or (score, tld_index) > key:
+            key = (score, tld_index)
+        if domain is not None:
+            yield key, domain
+
+
+class ShardWriter(DomainWriter):
+    """
+    Shard files: an 8 byte magic header, the records, then a trailer. All integers are little endian.
+
+    Each record is its key, as a float64 and a uint32, then the record the way `BinaryWriter` writes it. The trailer
+    describes the shard as UTF-8 JSON, followed by the JSON's uint32 length and the magic again. `finish` writes it
+    once the shard is done, so a file without one was cut short.
+    """
+
+    def __init__(self, stream: BinaryIO, *args, **kwargs):
+        super().__init__(stream, *args, **kwargs)
+        self._batch.append(SHARD_MAGIC)
+        self._key: Optional[tuple[float, int]] = None
+
+    def write_keyed(self, key: tuple[float, int], d: Domain):
+        self._key = key
+        self.write(d)
+
+    def format(self, record: DomainRecord) -> bytes:
+        return _KEY.pack(*self._key) + pack_record(record)
+
+    def finish(self, meta: dict):
+        data = json.dumps(meta, sort_keys=True).encode('utf-8')
+        with self._lock:
+            self._batch.append(data + _TRAILER_LENGTH.pack(len(data)) + SHARD_MAGIC)
+            self._flush()
+
+
+def write_shard(config: RunConfig, stream: BinaryIO, shard: int, shards: int, count: int = 0,
+                limit: Optional[int] = None, min_score: Optional[float] = None,
+                registered: Optional[RegisteredIndex] = None) -> dict:
+    """
+    Write the first `count` domains of a shard (all of them for 0) to `stream`. Returns the trailer written.
+
+    The trailer records whether the shard is complete, which it isn't if `count` cut it off. The merge stops where an
+    incomplete shard ends, since what that shard would have had next is missing.
+    """
+    chain = generate_shard(config, shard, shards, limit, min_score, registered)
+    with ShardWriter(stream) as writer:
+        for (key, d) in islice(chain, count or None):
+            writer.write_keyed(key, d)
+        complete = not count or writer.written < count or next(chain, None) is None
+        meta = {
+            'version': SHARD_VERSION,
+            'shard': shard,
+            'shards': shards,
+            'fingerprint': shard_fingerprint(config, shards, limit, min_score, registered),
+            'domains': writer.written,
+            'complete': complete,
+        }
+        writer.finish(meta)
+    logger.debug('Wrote shard', extra=meta)
+    return meta
+
+
+class ShardReader:
+    """A memory-mapped shard file. Iterating gives its (key, record) pairs, reading them from the file as it goes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = f.seek(0, 2)
+            if size < 2 * len(SHARD_MAGIC) + _TRAILER_LENGTH.size:
+                raise ValueError(f'Not a complete shard file: {path}')
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            trailer_end = size - len(SHARD_MAGIC) - _TRAILER_LENGTH.size
+            if self._mm[:len(SHARD_MAGIC)] != SHARD_MAGIC or self._mm[-len(SHARD_MAGIC):] != SHARD_MAGIC:
+                raise ValueError(f'Not a complete shard file: {path}')
+            (length,) = _TRAILER_LENGTH.unpack_from(self._mm, trailer_end)
+            self._end = trailer_end - length
+            self.meta = json.loads(self._mm[self._end:trailer_end])
+            if self.meta.get('version') != SHARD_VERSION:
+                raise ValueError(f'Shard file {path} has version {self.meta.get("version")}, not {SHARD_VERSION}.')
+        except BaseException:
+            self._mm.close()
+            raise
+
+    def __iter__(self) -> Iterator[tuple[tuple[float, int], DomainRecord]]:
+        (mm, position, end) = (self._mm, len(SHARD_MAGIC), self._end)
+        while position < end:
+            key = _KEY.unpack_from(mm, position)
+            (record, position) = unpack_record(mm, position + _KEY.size)
+            yield key, record
+
+    def close(self):
+        self._mm.close()
+
+
+class ShardMerge:
+    """
+    Every shard of a run, merged into the serial order. Memory use is the same however large the shards are: each
+    one is only read at the position the merge has reached in it.
+
+    If an incomplete shard runs out, the merge stops there, and `stopped_at` is that shard.
+    """
+
+    def __init__(self, paths: list[str]):
+        self.readers: list[ShardReader] = []
+        self.shards = 0
+        self.stopped_at: Optional[int] = None
+        try:
+            for path in paths:
+                self.readers.append(ShardReader(path))
+            self._check()
+        except BaseException:
+            self.close()
+            raise
+
+    def _check(self):
+        if not self.readers:
+            raise ValueError('No shards to merge.')
+        if len({r.meta['fingerprint'] for r in self.readers}) > 1:
+            raise ValueError('Shards come from different configs, search bounds, registered indexes or shard counts.')
+        shards = self.shards = self.readers[0].meta['shards']
+        found = [r.meta['shard'] for r in self.readers]
+        if len(set(found)) < len(found):
+            raise ValueError(f'Shards given more than once: {sorted({s for s in found if found.count(s) > 1})}')
+        missing = sorted(set(range(shards)) - set(found))
+        if missing:
+            raise ValueError(f'Missing shards {missing} of {shards}.')
+
+    @staticmethod
+    def _stream(reader: ShardReader) -> Iterator[tuple[tuple[float, int], Optional[DomainRecord]]]:
+        key = None
+        for (key, record) in reader:
+            yield key, record
+        if not reader.meta['complete']:
+            # Sorts after the shard's last domain and before anything the shard left out.
+            yield key, None
+
+    def __iter__(self) -> Iterator[DomainRecord]:
+        streams = [self._stream(r) for r in self.readers]
+        for (key, record) in merge(*streams, key=itemgetter(0)):
+            if record is None:
+                # TLDs are dealt round-robin, so the TLD gives the shard.
+                self.stopped_at = key[1] % self.shards
+                return
+            yield record
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description='Merge the shard files of a run made with `--shard` into one '
+                                                 'ranked output.')
+    parser.add_argument('shards', nargs='+', help='Shard files, one for every shard of the run, in any order.')
+    parser.add_argument('--output', help='File to write results to. Defaults to standard output.')
+    parser.add_argument('--format', default='text', choices=sorted(WRITERS), help='Output format.')
+    parser.add_argument('--count', type=int, default=0, help='Number of domains to output. 0 means no limit.')
+    args = parser.parse_args(argv)
+
+    with ShardMerge(args.shards) as shards:
+        stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        with stream, WRITERS[args.format](stream) as writer:
+            for record in islice(shards, args.count or None):
+                writer.write(record)
+    if shards.stopped_at is not None:
+        print(f'Stopped after {writer.written} domains, where shard {shards.stopped_at} was cut off by its --count. '
+              f'Write it again with a higher --count to merge further.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Text sources (word lists, filters, biases) compiled to memory-mappable binary files."""
+
+import hashlib
+import logging
+import os
+import os.path
+import struct
+from collections.abc import Iterator
+from typing import Optional
+
+from array import array
+
+from hunterlib.packed import PackedFile, write_packed
+from hunterlib.utils import cache_path
+
+logger = logging.getLogger('domain-hunter.sources')
+
+# Bump when the compiled layout or normalization changes, so old files are ignored.
+FORMAT_VERSION = 1
+# Source modification time, size, and BLAKE2b digest.
+_META = struct.Struct('<QQ32s')
+# Lines decoded at a time when iterating.
+_CHUNK = 8192
+
+
+def file_digest(path: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def compiled_path(path: str) -> str:
+    key = hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=8).hexdigest()
+    return cache_path('sources', f'v{FORMAT_VERSION}', f'{key}-{os.path.basename(path)}.pack')
+
+
+def normalize_lines(path: str) -> Iterator[str]:
+    """Each line of a text source with surrounding whitespace removed, skipping blank lines and repeats."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return iter(dict.fromkeys(filter(None, (line.strip() for line in f))))
+
+
+def _is_current(compiled: PackedFile, stat: os.stat_result, path: str) -> bool:
+    """Whether `compiled` holds the source's current contents. If only its modification time changed, records it."""
+    if 'meta' not in compiled:
+        return False
+    mtime, size, digest = _META.unpack(compiled.raw('meta'))
+    if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+        return True
+    # Touched or copied, but possibly unchanged: compare contents before recompiling.
+    if size != stat.st_size or digest != file_digest(path):
+        return False
+    # Otherwise every later run would hash the source again.
+    write_packed(compiled.path, {'meta': _META.pack(stat.st_mtime_ns, stat.st_size, digest),
+                                 'offsets': compiled.raw('offsets'), 'lines': compiled.raw('lines')})
+    return True
+
+
+def compile_source(path: str, target: Optional[str] = None) -> str:
+    """
+    Compile the text source at `path`, unless an up to date compiled copy already exists.
+
+    The compiled file holds the normalized lines as newline-terminated UTF-8 (`lines`), the start of each line and the
+    end of the last (`offsets`, uint64), and the source's modification time, size and digest (`meta`).
+
+    Returns the path of the compiled file.
+    """
+    target = target or compiled_path(path)
+    stat = os.stat(path)
+    if os.path.exists(target):
+        try:
+            with PackedFile(target) as compiled:
+                if _is_current(compiled, stat, path):
+                    return target
+        except (ValueError, OSError, struct.error) as e:
+            logger.debug('Discarding unreadable compiled source', extra={'path': target, 'error': str(e)})
+
+    lines = list(normalize_lines(path))
+    encoded = [(line + '\n').encode('utf-8') for line in lines]
+    offsets = array('Q', [0])
+    position = 0
+    for e in encoded:
+        position += len(e)
+        offsets.append(position)
+    meta = _META.pack(stat.st_mtime_ns, stat.st_size, file_digest(path))
+    write_packed(target, {'meta': meta, 'offsets': offsets.tobytes(), 'lines': b''.join(encoded)})
+    logger.debug('Compiled source', extra={'path': path, 'compiled': target, 'lines': len(lines)})
+    return target
+
+
+def compiled_lines(path: str) -> Iterator[str]:
+    """
+    Iterate over the normalized lines of a text source, compiling it first if needed.
+
+    Lines are read straight from the mapped file and decoded a chunk at a time, split on the newlines in C.
+    """
+    compiled = PackedFile(compile_source(path))
+    offsets = compiled.ints('offsets', 'Q')
+    data = compiled.raw('lines')
+    try:
+        count = len(offsets) - 1
+        for start in range(0, count, _CHUNK):
+            end = min(start + _CHUNK, count)
+            chunk = str(data[offsets[start]:offsets[end]], 'utf-8').split('\n')
+            chunk.pop()
+            yield from chunk
+    finally:
+        # Views of the mapping have to go before it can be closed.
+        del offsets, data
+        compiled.close()
@@ -1,4 +1,6 @@
 from .chains import generate_word_chain, generate_tld_chain
 from .config import load_config
+from .cursor import DomainCursor
 from .domains import generate_domains
-from .install import install_data
+from .install import install_data, build_wordnet_index
+from .parallel import generate_domains_parallel
@@ -1,113 +1,381 @@
 import logging
+import math
 import re
-from dataclasses import dataclass
 from heapq import heappush, heappop
-from typing import Iterable, TypeVar, Callable
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, TypeVar, Callable, Union, NamedTuple, Optional
 
+from hunterlib.bias import BiasMatcher, ordered_biases
 from hunterlib.conf import RunConfig
+from hunterlib.dedup import Deduplicator, dedupe
+from hunterlib.filters import FilterPlan
 from hunterlib.models import Bias
-from hunterlib.steps.data import ScoredWord, WordCombo
+from hunterlib.profiling import profiled, profiled_block
+from hunterlib.steps.data import ScoredWord, WordCombo, WordTable
+from hunterlib.trace import TracePoint
+
+if TYPE_CHECKING:
+    from hunterlib.steps.scores import ScoreTable
 
 logger = logging.getLogger('domain-hunter.chains')
 
+score_trace = TracePoint(logger, 'Generated score for word.')
+yield_trace = TracePoint(logger, 'Yielding words from search_combos')
+match_trace = TracePoint(logger, 'Word matched all filters')
+discard_trace = TracePoint(logger, 'Word discarded via filters')
+
+# Most words combined into one domain.
+MAX_WORDS = 10
+
+
+def generate_word_chain(config: RunConfig, limit: Optional[int] = None, min_score: Optional[float] = None,
+                        scores: Optional['ScoreTable'] = None) -> Iterable[WordCombo]:
+    """
+    Generate combinations of configured words, best first: at most `limit` of them, and none scoring under
+    `min_score`.
+
+    Both bound the search itself (see `search_combos`), which is told about the word filters and deduplication so that
+    `limit` counts what gets through them. With `scores`, words are scored through it (see `build_word_table`).
+    """
+    table, filters = build_word_table(config, scores)
+    seen = word_deduplicator(config)
+    combos = search_combos(table, MAX_WORDS, limit, min_score, search_bounds(config, table, filters), filters, seen)
+    chain = profiled('search_combos', combos, size=lambda: len(combos.heap))
+    chain = profiled('word_filters', filter_chain(filters, chain, lambda wc: wc.concatenated), 'search_combos',
+                     filters=filters)
+    return dedupe_words(config, chain, seen)
+
+
+def word_deduplicator(config: RunConfig) -> Optional[Deduplicator]:
+    conf = config.dedupe_conf
+    return Deduplicator(conf.exact_limit, conf.capacity, conf.error_rate) if conf.enable else None
+
+
+def dedupe_words(config: RunConfig, chain: Iterable[WordCombo],
+                 seen: Optional[Deduplicator] = None) -> Iterable[WordCombo]:
+    """
+    Drop combinations that spell the same as an earlier one, if the config asks for it.
+
+    Combinations come best first, so the one kept is the best scoring. TLDs are distinct, so this leaves no two domains
+    the same either.
+    """
+    seen = seen or word_deduplicator(config)
+    if seen is None:
+        return chain
+    return profiled('dedupe', dedupe(chain, lambda wc: wc.concatenated, seen), 'word_filters')
+
+
+def search_bounds(config: RunConfig, table: WordTable, word_filters: FilterPlan) -> Optional['SearchBounds']:
+    """
+    What the word and domain filters imply for the combinations that could pass them, or None if nothing.
 
-def generate_word_chain(config: RunConfig) -> Iterable[WordCombo]:
-    filters = config.word_filters
-    word_list = config.word_list
-    biases = config.word_biases
+    A domain is its combination, a dot and a TLD, so the domain filters' length bound less the shortest TLD bounds the
+    combination. Words with characters a filter doesn't allow are given a length over the bound, so nothing containing
+    them passes either.
+    """
+    domain_filters = FilterPlan(config.domain_filters)
+    limits = []
+    if word_filters.max_length() is not None:
+        limits.append(word_filters.max_length())
+    if domain_filters.max_length() is not None:
+        tld_lengths = [len(t.concatenated) for t in generate_tld_chain(config)]
+        if tld_lengths:
+            limits.append(domain_filters.max_length() - 1 - min(tld_lengths))
+    tests = [t for t in (word_filters.character_test(), domain_filters.character_test()) if t is not None]
+    # The bounds don't hold for strings with newlines in them (see `pattern_bounds`).
+    if not (limits or tests) or any('\n' in w for w in table.words):
+        return None
+    max_length = min(limits) if limits else sum(map(len, table.words)) * MAX_WORDS
+    lengths = [len(w) if all(t(w) for t in tests) else max_length + 1 for w in table.words]
+    return SearchBounds(lengths, max_length)
 
-    word_list = set(filter_chain(filters, word_list, lambda x: x))
 
-    chain = generate_chain(word_list, biases, 10)
-    return filter_chain(filters, chain, lambda wc: wc.concatenated)
+def build_word_table(config: RunConfig, scores: Optional['ScoreTable'] = None) -> tuple[WordTable, FilterPlan]:
+    """
+    The scored table `generate_word_chain` searches, and the word filters it applies to the results.
 
+    With `scores`, only the words it hasn't filtered and scored under the configured filters and biases are. The table
+    is the same.
+    """
+    filters = FilterPlan(config.word_filters)
+    if scores is not None:
+        return scores.table(config.word_list, filters, config.word_biases), filters
+    word_list = set(filter_chain(filters, config.word_list, lambda x: x))
+    # Sorted first so words with equal scores come out in the same order in every process. Set order depends on the
+    # per-process string hash seed.
+    return score_word_list(sorted(word_list), BiasMatcher(ordered_biases(config.word_biases))), filters
 
-def process_word(biases, word: str) -> ScoredWord:
-    matching_biases = [b for b in biases if b.pattern in word]
-    score = 3 + sum(b.adjust for b in matching_biases)
+
+def process_word(biases: BiasMatcher, word: str) -> ScoredWord:
+    # Matched once, for both the score and the trace.
+    indexes = biases.match_indexes(word) if biases else ()
+    score = 3 + biases.sum_adjusts(indexes)
     score = score - len(word) / 100
-    log_msg = 'Generated score for word.'
-    logger.debug(log_msg, extra={
-        'word': word,
-        'score': score,
-        'biases': matching_biases,
-    })
+    if score_trace.enabled():
+        score_trace(word, score=score, biases=lambda: [biases.biases[i] for i in indexes])
     return ScoredWord(word=word, score=score)
 
 
 T = TypeVar('T')
 
 
-def generate_chain(source_list: set[str], biases: set[Bias], max_repeat: int) -> Iterable[WordCombo]:
-    biased: list[ScoredWord] = [process_word(biases, w) for w in source_list]
-    biased.sort(key=lambda t: t.score, reverse=True)
-    biased: tuple[ScoredWord] = tuple(biased)
+def score_word_list(source_list: Iterable[str], biases: BiasMatcher) -> WordTable:
+    """
+    Score a whole word list as arrays and sort it best first, without building a `ScoredWord` per word.
+
+    Scores are the same as `process_word`'s, clamped to the bounds `ScoredWord` allows. Ties keep the order of
+    `source_list`, the same as sorting the models would.
+    """
+    with profiled_block('score_word_list') as stage:
+        table = _score_word_list(list(source_list), biases)
+        stage.count(len(table), len(table))
+    return table
+
+
+def _score_word_list(words: list[str], biases: BiasMatcher) -> WordTable:
+    scores = word_scores(words, biases)
+    order = sorted(range(len(words)), key=scores.__getitem__, reverse=True)
+    return sorted_table([words[i] for i in order], [scores[i] for i in order])
+
+
+def word_scores(words: list[str], biases: BiasMatcher) -> list[float]:
+    """`process_word`'s score for each word, clamped to the bounds `ScoredWord` allows."""
+    scores = [3 + biases.adjustment(w) - len(w) / 100 for w in words]
+    scores = [10.0 if s > 10 else -10.0 if s < -10 else s for s in scores]
+    if score_trace.enabled():
+        for (w, s) in zip(words, scores):
+            score_trace(w, score=s, biases=lambda: biases.matches(w))
+    return scores
 
-    return search_combos(biased, max_repeat)
 
+def sorted_table(words: list[str], scores: list[float]) -> WordTable:
+    """A table of words already sorted best first, normalized the way the ScoredWord model does it."""
+    normalized = [w.strip().lower() for w in words]
+    if '' in normalized:
+        raise ValueError('Cannot score a word that is empty or only whitespace.')
+    return WordTable(normalized, scores)
 
-@dataclass(order=True)
-class QueueNode:
+
+def generate_chain(source_list: set[str], biases: set[Bias], max_repeat: int, limit: Optional[int] = None,
+                   min_score: Optional[float] = None) -> Iterable[WordCombo]:
+    table = score_word_list(sorted(source_list), BiasMatcher(ordered_biases(biases)))
+    return search_combos(table, max_repeat, limit, min_score)
+
+
+class QueueNode(NamedTuple):
+    """
+    A candidate combination in `search_combos`, as indexes into the word table.
+
+    `score` is negated so the heap pops the best combination first; ties fall back to comparing `data`. `prefix` and
+    `total` are the running sums of `score + 20` over all but the last word, and over all words, so a child's score
+    is one addition away.
+    """
     score: float
-    data: tuple[int]
-
-    def __init__(self, data: tuple[int], score: float):
-        self.data = data
-        self.score = -1 * score
-
-
-def search_combos(source: tuple[ScoredWord], max_repeat: int) -> Iterable[WordCombo]:
-    def get_words(indexes: tuple[int]) -> tuple[ScoredWord]:
-        rv: list[ScoredWord] = list()
-        for i in indexes:
-            rv.append(source[i])
-        return tuple(rv)
-
-    if len(source) == 0:
-        return ()
-    if len(source) == 1:
-        sw = source[0]
-        yield WordCombo(sw.word, (sw,))
-    else:
-        heap = []
-        starter_node = QueueNode((0,), source[0].score)
-        heappush(heap, starter_node)
+    data: tuple[int, ...]
+    prefix: float
+    total: float
 
+
+class SearchBounds(NamedTuple):
+    """The length of each word in a table, and the longest concatenation worth searching for."""
+    lengths: list[int]
+    max_length: int
+
+
+def search_combos(source: Union[WordTable, tuple[ScoredWord]], max_repeat: int, limit: Optional[int] = None,
+                  min_score: Optional[float] = None, bounds: Optional[SearchBounds] = None,
+                  filters: Optional[FilterPlan] = None, seen: Optional[Deduplicator] = None) -> 'ComboSearch':
+    """
+    Yield combinations of up to `max_repeat` words from a score-sorted source, best first.
+
+    Stops after `limit` combinations or once scores drop below `min_score`. Given the word `filters` and the `seen`
+    deduplicator the results go through next, `limit` only counts combinations that will get through them, so it
+    stops after `limit` of those.
+
+    A combination never scores higher than the one it was expanded from, so the heap only has to keep its best nodes up
+    to the one with the `limit - counted`th different spelling that counts, and never has to keep nodes under
+    `min_score`. That keeps memory O(limit) for filters that pass a fair share of combinations, without changing the
+    order of what is yielded.
+
+    With `bounds`, nodes are only pushed if some combination they expand into is within `bounds.max_length`.
+    Combinations over it may still be yielded, for the filters to reject; `limit` doesn't count those, so it stops at
+    the same place whether they were pruned or not.
+    """
+    table = source if isinstance(source, WordTable) else WordTable.from_scored(source)
+    return ComboSearch(table, max_repeat, limit, min_score, bounds=bounds, filters=filters, seen=seen)
+
+
+class ComboSearch:
+    """
+    The iterator behind `search_combos`.
+
+    Between results, all of its progress is in `heap` and `remaining`: a node's children are pushed before the node is
+    yielded. `state` and `restore` turn that into plain index tuples and back, so a search can be checkpointed and
+    resumed against the same word table.
+    """
+
+    def __init__(self, table: WordTable, max_repeat: int, limit: Optional[int] = None,
+                 min_score: Optional[float] = None, heap: Optional[list[QueueNode]] = None,
+                 bounds: Optional[SearchBounds] = None, filters: Optional[FilterPlan] = None,
+                 seen: Optional[Deduplicator] = None):
+        self.table = table
+        self.max_repeat = max_repeat
+        self.remaining = limit
+        self.filters = filters
+        self.seen = seen
+        # Nodes are pushed with negated scores, so the cutoff is negated as well.
+        self.cutoff = math.inf if min_score is None else -min_score
+        self.bounds = bounds
+        if bounds is not None:
+            # The shortest word from each index on: the least a node's last word can add to its descendants.
+            shortest = list(bounds.lengths)
+            for i in range(len(shortest) - 2, -1, -1):
+                shortest[i] = min(shortest[i], shortest[i + 1])
+            self._shortest = shortest
+        if heap is None:
+            heap = []
+            if len(table) > 0 and limit != 0:
+                start = QueueNode(-table.weights[0] / 100, (0,), 0, table.weights[0])
+                if start.score <= self.cutoff and (self.bounds is None or shortest[0] <= self.bounds.max_length):
+                    heap.append(start)
+        self.heap = heap
+        self._results = self._search()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> WordCombo:
+        return next(self._results)
+
+    def _search(self) -> Iterator[WordCombo]:
+        table = self.table
+        weights = table.weights
+        last_word = len(table) - 1
+        max_repeat = self.max_repeat
+        cutoff = self.cutoff
+        heap = self.heap
+        remaining = self.remaining
+        pruning = self.bounds is not None
+        if pruning:
+            lengths = self.bounds.lengths
+            max_length = self.bounds.max_length
+            shortest = self._shortest
+        tracing = yield_trace.enabled()
+
+        # The heap is cut down once it doubles from where the last cut left it.
+        cut_at = None if remaining is None else 2 * remaining
         while len(heap) > 0:
+            if remaining is not None:
+                if remaining == 0:
+                    return
+                if len(heap) > cut_at:
+                    heap = self.heap = self._cut(heap, remaining)
+                    cut_at = 2 * max(remaining, len(heap))
             next_node = heappop(heap)
-            words = get_words(next_node.data)
-            log_msg = 'Yielding words from search_combos'
-            logger.debug(log_msg, extra={'words': str(words), 'priority': next_node.score})
-            yield WordCombo(''.join(w.word for w in words), words)
-            last_index = next_node.data[-1]
-            if len(next_node.data) < max_repeat and next_node.data[-1] + 1 < len(source):
-                future_add = next_node.data + (last_index + 1,)
-                score = WordCombo.score_words(get_words(future_add))
-                heappush(heap, QueueNode(future_add, score))
-            if last_index + 1 < len(source):
-                future_iterate = next_node.data[:-1] + (last_index + 1,)
-                score = WordCombo.score_words(get_words(future_iterate))
-                heappush(heap, QueueNode(future_iterate, score))
-
-
-def filter_chain(filter_pattern: set[re.Pattern], chain: Iterable[T], conversion: Callable[[T], str]) -> Iterable[T]:
+            data = next_node.data
+            last_index = data[-1]
+            if last_index < last_word:
+                following = last_index + 1
+                extend = replace = True
+                if pruning:
+                    # The shortest combination under each child: its fixed words, then the shortest later word.
+                    head = 0
+                    for i in data[:-1]:
+                        head += lengths[i]
+                    replace = head + shortest[following] <= max_length
+                    extend = head + lengths[last_index] + shortest[following] <= max_length
+                if len(data) < max_repeat and extend:
+                    total = next_node.total + weights[following]
+                    score = -total / (10 ** (len(data) + 2))
+                    if score <= cutoff:
+                        heappush(heap, QueueNode(score, data + (following,), next_node.total, total))
+                total = next_node.prefix + weights[following]
+                score = -total / (10 ** (len(data) + 1))
+                if score <= cutoff and replace:
+                    heappush(heap, QueueNode(score, data[:-1] + (following,), next_node.prefix, total))
+            if tracing:
+                yield_trace(words=table.words_at(data), priority=next_node.score)
+            combo = table.combo(data, next_node.total / (10 ** (len(data) + 1)))
+            if remaining is not None and self._counts(data, combo.concatenated):
+                remaining -= 1
+                self.remaining = remaining
+            yield combo
+
+    def _counts(self, data: tuple[int, ...], spelling: str) -> bool:
+        """
+        Whether a combination counts towards `limit`: it is within the bounds, passes the filters and isn't a repeat.
+        Everything yielded before it has been through `seen` by the time it is popped.
+        """
+        if self.bounds is not None:
+            lengths = self.bounds.lengths
+            if sum([lengths[i] for i in data]) > self.bounds.max_length:
+                return False
+        return ((self.filters is None or self.filters.accepts(spelling))
+                and (self.seen is None or spelling not in self.seen))
+
+    def _cut(self, heap: list[QueueNode], remaining: int) -> list[QueueNode]:
+        """
+        Drop the nodes that can only be popped once `remaining` more combinations have counted.
+
+        Every different spelling that counts among the best nodes is yielded, by one of them or something better,
+        before they are all popped, so nothing after the node that makes `remaining` of them is needed. A Bloom
+        filter in `seen` can start calling a spelling a repeat later on, so nothing is dropped once it uses one.
+        """
+        if self.seen is not None and self.seen.exact is None:
+            return heap
+        words = self.table.words
+        spellings = set()
+        best = sorted(heap)
+        for (n, node) in enumerate(best):
+            spelling = ''.join([words[i] for i in node.data])
+            if spelling not in spellings and self._counts(node.data, spelling):
+                spellings.add(spelling)
+                if len(spellings) == remaining:
+                    return best[:n + 1]
+        return heap
+
+    def state(self) -> dict[str, Any]:
+        """The heap, in heap order, as index tuples, and the number of results left under `limit`."""
+        return {'heap': [node.data for node in self.heap], 'remaining': self.remaining}
+
+    @classmethod
+    def restore(cls, table: WordTable, max_repeat: int, min_score: Optional[float], state: dict[str, Any],
+                bounds: Optional[SearchBounds] = None, filters: Optional[FilterPlan] = None,
+                seen: Optional[Deduplicator] = None) -> 'ComboSearch':
+        """Rebuild a search from `state`. Sums are redone left to right, as the search did, so scores match exactly."""
+        weights = table.weights
+        heap = []
+        for data in state['heap']:
+            prefix = 0
+            total = weights[data[0]]
+            for i in data[1:]:
+                prefix = total
+                total += weights[i]
+            heap.append(QueueNode(-total / (10 ** (len(data) + 1)), tuple(data), prefix, total))
+        # Kept in heap order rather than re-heapified, so equal nodes come out in the same order as before.
+        return cls(table, max_repeat, state['remaining'], min_score, heap, bounds, filters, seen)
+
+
+def filter_chain(filter_pattern: Union[FilterPlan, set[re.Pattern]], chain: Iterable[T],
+                 conversion: Callable[[T], str]) -> Iterable[T]:
     # This is a filter and a map with extra steps. The imperative version is easier to debug.
+    if not isinstance(filter_pattern, FilterPlan):
+        filter_pattern = FilterPlan(filter_pattern)
+    accepts = filter_pattern.accepts
+    tracing = match_trace.enabled()
     for item in chain:
         data = conversion(item)
-        if all(p.match(data) for p in filter_pattern):
-            logger.debug('Word matched all filters', extra={
-                'word': data,
-                'filters': filter_pattern
-            })
+        if accepts(data):
+            if tracing:
+                match_trace(data, filters=filter_pattern)
             yield item
-        else:
-            logger.debug('Word discarded via filters', extra={'word': str(data), 'filters': filter_pattern})
+        elif tracing:
+            discard_trace(data, filters=filter_pattern)
 
 
 def generate_tld_chain(config: RunConfig):
     biases = config.tld_biases
     word_list = config.tld_list
-    filters = config.tld_filters
+    filters = FilterPlan(config.tld_filters)
 
     filtered_list = set(filter_chain(filters, word_list, lambda x: x))
     raw_chain = generate_chain(filtered_list, biases, 1)
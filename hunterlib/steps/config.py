@@ -1,10 +1,23 @@
+import hashlib
+import inspect
+import logging
+import os.path
+import pickle
 import re
-from typing import Iterable
+from typing import Iterable, Optional
 
-from hunterlib.conf import RunConfig, NameGuppyConfig, NamecheapConfig
-from hunterlib.models import Bias, FileSource
+from hunterlib.conf import DedupeConfig, RunConfig, NameGuppyConfig, NamecheapConfig, ScorerConfig
+from hunterlib.models import Bias, FileSource, ScoreWeight
+from hunterlib.profiling import profiled_block
+from hunterlib.sources import file_digest
+from hunterlib.utils import atomic_write, cache_path
 from hunterlib.wordlist import flatten
 
+logger = logging.getLogger('domain-hunter.config')
+
+# Bump when RunConfig or load_config change in a way that makes old snapshots wrong.
+SNAPSHOT_VERSION = 3
+
 
 def mk_bias(o):
     if isinstance(o, str):
@@ -20,7 +33,71 @@ def mk_bias(o):
         raise ValueError(f'Cannot convert value to bias: {repr(o)}')
 
 
-def load_config(config_module) -> RunConfig:
+def mk_score_weight(o):
+    if isinstance(o, str):
+        if '{' in o:
+            return ScoreWeight.parse_raw(o)
+        query, adj = o.split(',')
+        return ScoreWeight(query=query, adjust=adj)
+    elif isinstance(o, dict):
+        return ScoreWeight.parse_obj(o)
+    elif isinstance(o, ScoreWeight):
+        return o
+    else:
+        raise ValueError(f'Cannot convert value to score weight: {repr(o)}')
+
+
+def load_config(config_module, snapshot: bool = False) -> RunConfig:
+    """
+    Build the run config described by `config_module`.
+
+    With `snapshot`, the built config is pickled to the cache, keyed by the config module's source and the contents of
+    every `*_files` setting, and later loads with the same key skip building it. A config module that computes its
+    settings from anything else (environment variables, the date) shouldn't use snapshots.
+    """
+    with profiled_block('load_config'):
+        return _load_config(config_module, snapshot)
+
+
+def _load_config(config_module, snapshot: bool) -> RunConfig:
+    if not snapshot:
+        return build_config(config_module)
+    path = snapshot_path(config_module)
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                conf = pickle.load(f)
+            if isinstance(conf, RunConfig):
+                return conf
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.debug('Discarding unreadable config snapshot', extra={'path': path, 'error': str(e)})
+    conf = build_config(config_module)
+    if path is not None:
+        atomic_write(path, pickle.dumps(conf, protocol=pickle.HIGHEST_PROTOCOL))
+    return conf
+
+
+def snapshot_path(config_module) -> Optional[str]:
+    """Where the snapshot of `config_module` goes, or None for a module with no source file to key it on."""
+    try:
+        source = inspect.getsource(config_module)
+    except (OSError, TypeError):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{SNAPSHOT_VERSION}\0{config_module.__name__}\0{source}'.encode('utf-8'))
+    for (name, fn) in source_files(config_module):
+        digest.update(f'\0{name}\0{fn}\0'.encode('utf-8'))
+        digest.update(file_digest(os.path.join(os.getcwd(), fn)))
+    return cache_path('config', f'{digest.hexdigest()}.pickle')
+
+
+def source_files(config_module) -> list[tuple[str, str]]:
+    """Each file a `*_files` setting of `config_module` names (relative to the current directory), with the setting."""
+    return [(name, fn) for name in sorted(dir(config_module)) if name.endswith('_files')
+            for fn in getattr(config_module, name)]
+
+
+def build_config(config_module) -> RunConfig:
     # Do domain stuff first, we re-use it to try to keep items down
     domain_filters = get_flattened_lists_and_files(config_module, 'domain_filter', re.compile)
     domain_biases = get_flattened_lists_and_files(config_module, 'domain_bias', mk_bias)
@@ -43,15 +120,21 @@ def load_config(config_module) -> RunConfig:
     # Extra bits of config
     guppy = NameGuppyConfig(
         enable=getattr(config_module, 'use_nameguppy'),
-        cache_loc=getattr(config_module, 'nameguppy_cache')
+        cache_loc=getattr(config_module, 'nameguppy_cache'),
+        **get_optional_settings(config_module, 'nameguppy', NameGuppyConfig, {'enable', 'cache_loc'}),
     )
 
     cheap = NamecheapConfig(
         enable=getattr(config_module, 'use_namecheap'),
-        cache_loc=getattr(config_module, 'namecheap_cache')
+        cache_loc=getattr(config_module, 'namecheap_cache'),
+        **get_optional_settings(config_module, 'namecheap', NamecheapConfig, {'enable', 'cache_loc'}),
     )
 
-    return RunConfig(
+    dedupe = DedupeConfig(**get_optional_settings(config_module, 'dedupe', DedupeConfig, set()))
+    scorers = ScorerConfig(**get_optional_settings(config_module, 'scorer', ScorerConfig, set()))
+    score_weights = get_flattened_lists_and_files(config_module, 'score_weight', mk_score_weight)
+
+    return RunConfig.from_bulk(
         word_list=word_sources,
         tld_list=tld_sources,
 
@@ -63,8 +146,12 @@ def load_config(config_module) -> RunConfig:
         tld_biases=tld_biases,
         domain_biases=domain_biases,
 
+        score_weights=score_weights,
+
         name_guppy_conf=guppy,
         namecheap_conf=cheap,
+        dedupe_conf=dedupe,
+        scorer_conf=scorers,
     )
 
 
@@ -74,4 +161,14 @@ def get_flattened_lists_and_files(config_module, setting_base: str, kind=None) -
         getattr(config_module, f'{setting_base}_lists', ()),
         (FileSource(kind, fn) for fn in getattr(config_module, f'{setting_base}_files', ())),
     ])
-    return set(map(kind, data))
+    # str items are already strings, so skip a call per item.
+    return set(data) if kind is str else set(map(kind, data))
+
+
+def get_optional_settings(config_module, prefix: str, model, skip: set[str]) -> dict:
+    """Collect `<prefix>_<field>` settings for the fields of `model` that the config module sets."""
+    settings = {}
+    for name in model.__fields__:
+        if name not in skip and hasattr(config_module, f'{prefix}_{name}'):
+            settings[name] = getattr(config_module, f'{prefix}_{name}')
+    return settings
@@ -0,0 +1,184 @@
+"""A position in the ranked domain stream that can be saved to a file and resumed from later."""
+
+import hashlib
+import json
+from array import array
+from collections import deque
+from itertools import islice
+from typing import Any, Optional
+
+from hunterlib.conf import RunConfig
+from hunterlib.filters import FilterPlan
+from hunterlib.packed import PackedFile, write_packed
+from hunterlib.profiling import profiled
+from hunterlib.steps.chains import (MAX_WORDS, ComboSearch, build_word_table, dedupe_words, filter_chain,
+                                    generate_tld_chain, search_bounds, word_deduplicator)
+from hunterlib.steps.data import Domain, WordCombo
+from hunterlib.steps.domains import DomainSearch
+from hunterlib.steps.scores import ScoreTable
+from hunterlib.zones import RegisteredIndex, drop_registered
+
+CHECKPOINT_VERSION = 4
+
+
+def _pack_tuples(tuples: list[tuple[int, ...]]) -> tuple[bytes, bytes]:
+    return array('B', map(len, tuples)).tobytes(), array('I', (i for t in tuples for i in t)).tobytes()
+
+
+def _unpack_tuples(lengths: memoryview, indexes: memoryview) -> list[tuple[int, ...]]:
+    flat = indexes.tolist()
+    tuples = []
+    position = 0
+    for length in lengths.tolist():
+        tuples.append(tuple(flat[position:position + length]))
+        position += length
+    return tuples
+
+
+class DomainCursor:
+    """
+    The output of `generate_domains` (without caches) for `config`, as an iterator whose position can be saved.
+
+    The search state between results is the word search heap, the domain queue and the words it still needs, all of
+    which are stored as indexes into the word and TLD tables, and the words already seen for deduplication. Those
+    tables are rebuilt from the config on load, and a fingerprint of them and the registered index makes sure a
+    checkpoint is only resumed against the config and index it came from. Resuming costs the same whatever the
+    position, where skipping ahead with `skip` costs a search per result skipped.
+    """
+
+    def __init__(self, config: RunConfig, limit: Optional[int] = None, min_score: Optional[float] = None,
+                 registered: Optional[RegisteredIndex] = None, state: Optional[dict[str, Any]] = None,
+                 scores: Optional[ScoreTable] = None):
+        self.config = config
+        self.table, self.word_filters = build_word_table(config, scores)
+        self.tlds = tuple(generate_tld_chain(config))
+        self.fingerprint = self._fingerprint(registered)
+        self.dedupe = word_deduplicator(config)
+        bounds = search_bounds(config, self.table, self.word_filters)
+        if state is None:
+            self.min_score = min_score
+            self.position = 0
+            self.combos = ComboSearch(self.table, MAX_WORDS, limit, min_score, bounds=bounds,
+                                      filters=self.word_filters, seen=self.dedupe)
+            domain_state = None
+        else:
+            if state['fingerprint'] != self.fingerprint:
+                raise ValueError('Checkpoint was made with a different config or registered index.')
+            self.min_score = state['min_score']
+            self.position = state['position']
+            self.combos = ComboSearch.restore(self.table, MAX_WORDS, self.min_score, state['combos'], bounds,
+                                              self.word_filters, self.dedupe)
+            domain_state = dict(state['domains'], words=[self._word(w) for w in state['domains']['words']])
+            if self.dedupe is not None:
+                self.dedupe.load(state['dedupe'], state['suppressed'])
+
+        combos = profiled('search_combos', self.combos, size=lambda: len(self.combos.heap))
+        word_chain = profiled('word_filters', filter_chain(self.word_filters, combos, lambda wc: wc.concatenated),
+                              'search_combos', filters=self.word_filters)
+        self.domains = DomainSearch(dedupe_words(config, word_chain, self.dedupe), self.tlds, config.domain_biases,
+                                    domain_state)
+        domain_chain = profiled('domain_combos', (node.domain for node in self.domains),
+                                size=lambda: len(self.domains.queue))
+        domain_filters = FilterPlan(config.domain_filters)
+        chain = profiled('domain_filters', filter_chain(domain_filters, domain_chain, lambda d: d.domain),
+                         'domain_combos', filters=domain_filters)
+        if registered is not None:
+            chain = profiled('drop_registered', drop_registered(chain, registered), 'domain_filters')
+        self._results = chain
+
+    def _fingerprint(self, registered: Optional[RegisteredIndex]) -> str:
+        config = self.config
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (
+                CHECKPOINT_VERSION, MAX_WORDS,
+                # The saved queue was filtered against it.
+                registered.stamp() if registered is not None else None,
+                '\n'.join(self.table.words), self.table.scores.tobytes().hex(),
+                [(t.concatenated, t.score) for t in self.tlds],
+                sorted((b.pattern, b.adjust) for b in config.domain_biases),
+                sorted((p.pattern, p.flags) for p in config.word_filters),
+                sorted((p.pattern, p.flags) for p in config.domain_filters),
+                config.dedupe_conf.dict(),
+        ):
+            digest.update(json.dumps(part).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _word(self, indexes: tuple[int, ...]) -> WordCombo:
+        weights = self.table.weights
+        total = weights[indexes[0]]
+        for i in indexes[1:]:
+            total += weights[i]
+        return self.table.combo(indexes, total / (10 ** (len(indexes) + 1)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Domain:
+        d = next(self._results)
+        self.position += 1
+        return d
+
+    def skip(self, count: int):
+        deque(islice(self, count), maxlen=0)
+
+    def state(self) -> dict[str, Any]:
+        # Every buffered word came from `table.combo`, so its models are the table's own.
+        word_index = self.table.model_indexes()
+        domains = self.domains.state()
+        return {
+            'fingerprint': self.fingerprint,
+            'position': self.position,
+            'min_score': self.min_score,
+            'combos': self.combos.state(),
+            'domains': dict(domains, words=[tuple(word_index[id(sw)] for sw in w.source) for w in domains['words']]),
+            'dedupe': self.dedupe.to_bytes() if self.dedupe is not None else None,
+            'suppressed': self.dedupe.suppressed if self.dedupe is not None else 0,
+        }
+
+    def save(self, path: str):
+        """
+        Write a checkpoint: a small JSON header, the heaps and words as packed integer arrays, then the words seen for
+        deduplication.
+        """
+        state = self.state()
+        combos = state.pop('combos')
+        domains = state.pop('domains')
+        seen = state.pop('dedupe')
+        meta = dict(state, version=CHECKPOINT_VERSION, remaining=combos['remaining'], word_base=domains['word_base'])
+        combo_lengths, combo_indexes = _pack_tuples(combos['heap'])
+        word_lengths, word_indexes = _pack_tuples(domains['words'])
+        write_packed(path, {
+            'meta': json.dumps(meta).encode('utf-8'),
+            'combos.lengths': combo_lengths,
+            'combos.indexes': combo_indexes,
+            'words.lengths': word_lengths,
+            'words.indexes': word_indexes,
+            # Signed, for TLDs that haven't started (word index -1).
+            'queue': array('i', (i for pair in domains['queue'] for i in pair)).tobytes(),
+            **({'dedupe': seen} if seen is not None else {}),
+        })
+
+    @classmethod
+    def load(cls, config: RunConfig, path: str, registered: Optional[RegisteredIndex] = None) -> 'DomainCursor':
+        with PackedFile(path) as f:
+            meta = json.loads(bytes(f.raw('meta')))
+            if meta.get('version') != CHECKPOINT_VERSION:
+                raise ValueError(f'Unsupported checkpoint version: {meta.get("version")}')
+            queue = f.ints('queue', 'i').tolist()
+            state = {
+                'fingerprint': meta['fingerprint'],
+                'position': meta['position'],
+                'min_score': meta['min_score'],
+                'combos': {
+                    'heap': _unpack_tuples(f.ints('combos.lengths', 'B'), f.ints('combos.indexes')),
+                    'remaining': meta['remaining'],
+                },
+                'domains': {
+                    'word_base': meta['word_base'],
+                    'words': _unpack_tuples(f.ints('words.lengths', 'B'), f.ints('words.indexes')),
+                    'queue': list(zip(queue[0::2], queue[1::2])),
+                },
+                'dedupe': bytes(f.raw('dedupe')) if 'dedupe' in f else None,
+                'suppressed': meta['suppressed'],
+            }
+        return cls(config, registered=registered, state=state)
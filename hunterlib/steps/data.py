@@ -1,5 +1,7 @@
+from array import array
+from collections.abc import Sequence
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, constr, confloat
 
@@ -30,6 +32,51 @@ class WordCombo:
         return tuple(sw.word for sw in self.source)
 
 
+class WordTable:
+    """
+    Struct-of-arrays form of a score-sorted word list, for searches that work on indexes instead of models.
+
+    `weights` holds `score + 20` for each word, the per-word term of `WordCombo.score_words`. `ScoredWord` models are
+    only built for words that end up in a combination someone asks for.
+    """
+    __slots__ = ('words', 'scores', 'weights', '_models')
+
+    def __init__(self, words: Sequence[str], scores: Sequence[float], models: Optional[list[ScoredWord]] = None):
+        self.words: Sequence[str] = words
+        self.scores = array('d', scores)
+        self.weights = array('d', (s + 20 for s in self.scores))
+        self._models: list[Optional[ScoredWord]] = models if models is not None else [None] * len(words)
+
+    @classmethod
+    def from_scored(cls, source: Sequence[ScoredWord]) -> 'WordTable':
+        return cls([sw.word for sw in source], [sw.score for sw in source], list(source))
+
+    def __len__(self):
+        return len(self.words)
+
+    def scored_word(self, index: int) -> ScoredWord:
+        model = self._models[index]
+        if model is None:
+            # Words and scores in the table have already been normalized, so skip validation.
+            model = ScoredWord.construct(word=self.words[index], score=self.scores[index])
+            self._models[index] = model
+        return model
+
+    def model_indexes(self) -> dict[int, int]:
+        """
+        The index of every `ScoredWord` built so far, by the model's `id`. Words that normalize alike share a string
+        but not a model, since there is one per index.
+        """
+        return {id(model): i for (i, model) in enumerate(self._models) if model is not None}
+
+    def words_at(self, indexes: tuple[int, ...]) -> tuple[str, ...]:
+        words = self.words
+        return tuple(words[i] for i in indexes)
+
+    def combo(self, indexes: tuple[int, ...], score: float) -> WordCombo:
+        return WordCombo(''.join(self.words_at(indexes)), tuple(self.scored_word(i) for i in indexes), score)
+
+
 @dataclass(init=True, repr=True)
 class Domain:
     domain: str
@@ -1,78 +1,219 @@
 import logging
 from dataclasses import dataclass, field
 from heapq import heappush, heappop
-from itertools import chain, repeat
-from typing import Iterable, List
+from typing import Any, Iterable, Iterator, List, Optional
 
+from hunterlib.bias import BiasMatcher, ordered_biases
+from hunterlib.cache import AvailabilityCache, attach_cached
 from hunterlib.conf import RunConfig
+from hunterlib.filters import FilterPlan
 from hunterlib.models import Bias
+from hunterlib.profiling import profiled
+from hunterlib.scoring import score_domains
 from hunterlib.steps.chains import filter_chain
 from hunterlib.steps.data import WordCombo, Domain
+from hunterlib.trace import TracePoint
+from hunterlib.zones import RegisteredIndex, drop_registered
 
 logger = logging.getLogger('domain-hunter.domains')
 
+output_trace = TracePoint(logger, 'Outputting domain')
+next_word_trace = TracePoint(logger, 'Queueing up next word')
+
+
+# Buffered words before the search first tries to drop the ones it is done with.
+_MIN_COMPACT = 1024
+
 
 @dataclass(init=True, eq=True, order=True)
 class QueueNode:
-    word_index: int = field(compare=False)
-    tld_index: int = field(compare=False)
-    domain: Domain = field(compare=False)
+    # Ties go to the better TLD, so the order is deterministic and partitions of the TLDs merge back into it exactly.
     score: float = field(init=False)
+    tld_index: int
+    word_index: int = field(compare=False)
+    domain: Optional[Domain] = field(compare=False)
 
     def __post_init__(self):
-        self.score = -1 * self.domain.score
+        if self.domain is not None:
+            self.score = -1 * self.domain.score
+
+    @classmethod
+    def placeholder(cls, tld_index: int, bound: float) -> 'QueueNode':
+        """Stands in for a TLD not started yet, with a score no domain for that TLD can beat."""
+        node = cls(tld_index, -1, None)
+        node.score = -bound
+        return node
 
 
-def generate_domains(config: RunConfig, word_chain: Iterable[WordCombo], tld_chain: Iterable[WordCombo]):
+def generate_domains(config: RunConfig, word_chain: Iterable[WordCombo], tld_chain: Iterable[WordCombo],
+                     caches: Iterable[AvailabilityCache] = (), registered: Optional[RegisteredIndex] = None):
+    """
+    Score and filter every domain, attaching any cached lookups from `caches` to `plugin_data`.
+
+    Domains found in the `registered` index are dropped before any lookups. Configured scorers run on what's left, and
+    re-rank it (see `hunterlib.scoring.score_domains`).
+    """
     biases = config.domain_biases
-    filters = config.domain_filters
+    filters = FilterPlan(config.domain_filters)
+
+    nodes = domain_nodes(word_chain, tld_chain, biases)
+    raw_chain = profiled('domain_combos', (node.domain for node in nodes), size=lambda: len(nodes.queue))
+    domain_chain = profiled('domain_filters', filter_chain(filters, raw_chain, lambda d: d.domain), 'domain_combos',
+                            filters=filters)
+    return domain_stages(config, domain_chain, 'domain_filters', caches, registered)
+
 
-    raw_chain = domain_combos(word_chain, tld_chain, biases)
-    return filter_chain(filters, raw_chain, lambda d: d.domain)
+def domain_stages(config: RunConfig, domain_chain: Iterable[Domain], source: str,
+                  caches: Iterable[AvailabilityCache] = (),
+                  registered: Optional[RegisteredIndex] = None) -> Iterable[Domain]:
+    """The stages after filtering, shared with `generate_domains_parallel`. `source` names the stage before them."""
+    if registered is not None:
+        domain_chain = profiled('drop_registered', drop_registered(domain_chain, registered), source)
+        source = 'drop_registered'
+    if config.scorer_conf.names:
+        domain_chain = profiled('scoring', score_domains(domain_chain, config), source)
+        source = 'scoring'
+    for cache in caches:
+        domain_chain = profiled('attach_cached', attach_cached(domain_chain, cache), source)
+        source = 'attach_cached'
+    return domain_chain
 
 
 def domain_combos(word_chain: Iterable[WordCombo], tld_chain: Iterable[WordCombo], biases: set[Bias]):
-    def mk_domain(word_list: List[WordCombo], tld_list: tuple[WordCombo], word_idx: int, tld_idx: int) -> QueueNode:
-        word = word_list[word_idx]
-        tld = tld_list[tld_idx]
+    return (node.domain for node in domain_nodes(word_chain, tld_chain, biases))
+
+
+def domain_nodes(word_chain: Iterable[WordCombo], tld_chain: Iterable[WordCombo],
+                 biases: set[Bias]) -> 'DomainSearch':
+    """The queue nodes behind `domain_combos`, for callers that need to know which TLD each domain used."""
+    return DomainSearch(word_chain, tld_chain, biases)
+
+
+class DomainSearch:
+    """
+    The iterator behind `domain_nodes`.
+
+    The search runs over a grid of words (best first, pulled from `word_chain` as needed) by TLDs (best first), with
+    one node per started TLD in `queue`. TLDs are started lazily: the next one waits in the queue as a placeholder
+    scored at the most any of its domains could score, and only becomes a real node when that placeholder comes up.
+    The first result never has to wait for a node per TLD, and the order is the same as if every TLD had started at
+    once. Buffered words are dropped once no node can reach them again.
+
+    Between results, all of its progress is in `queue` and the buffered words from `word_base` on: a node's child is
+    pushed before the node is yielded. `state` returns exactly that, and passing it back in (with `word_chain`
+    resuming where the old one stopped) continues the search.
+    """
+
+    def __init__(self, word_chain: Iterable[WordCombo], tld_chain: Iterable[WordCombo], biases: set[Bias],
+                 state: Optional[dict[str, Any]] = None):
+        # In a fixed order, so scores come out the same to the bit on every machine and shards merge back exactly.
+        self.matcher = BiasMatcher(ordered_biases(biases))
+        # Most the biases can add to a domain's score. Placeholders are scored with it, so they never come up late.
+        self.max_adjustment = sum(b.adjust for b in self.matcher.biases if b.adjust > 0)
+        self.tlds = tuple(tld_chain)
+        if not self.tlds:
+            raise ValueError("Given tld_chain had no objects. Check config.")
+        self._words = iter(word_chain)
+        if state is None:
+            first_word = next(self._words, None)
+            if first_word is None:
+                raise ValueError('Given tld_chain had no objects. Check config.')
+            logger.debug('Doing initial domain word append', extra={'words': first_word.words()})
+            self.word_base = 0
+            self.word_buffer: List[WordCombo] = [first_word]
+            self.queue: List[QueueNode] = []
+            self._start_tld(0)
+        else:
+            self.word_base = state['word_base']
+            self.word_buffer = list(state['words'])
+            # Kept in heap order rather than re-heapified, so equal nodes come out in the same order as before.
+            self.queue = [self._node(word_idx, tld_idx) if word_idx >= 0 else self._placeholder(tld_idx)
+                          for (tld_idx, word_idx) in state['queue']]
+        self._results = self._search()
+
+    def _node(self, word_idx: int, tld_idx: int) -> QueueNode:
+        word = self.word_buffer[word_idx - self.word_base]
+        tld = self.tlds[tld_idx]
         domain_str = word.concatenated + '.' + tld.concatenated
         domain = Domain(domain_str, word.source, tld)
-        for bias in biases:
-            if bias.pattern in domain.domain:
-                domain.score += bias.adjust
-        return QueueNode(word_idx, tld_idx, domain)
-
-    word_buffer = []
-    words = iter(chain(word_chain, repeat(None)))
-    tlds = tuple(tld_chain)
-    if not tlds:
-        raise ValueError("Given tld_chain had no objects. Check config.")
-    queue: List[QueueNode] = []
-    next_word = next(words)
-    if next_word is not None:
-        logger.debug('Doing initial domain word append', extra={'words': next_word.words()})
-        word_buffer.append(next_word)
-    else:
-        raise ValueError('Given tld_chain had no objects. Check config.')
-    for i in range(len(tlds)):
-        node = mk_domain(word_buffer, tlds, 0, i)
-        heappush(queue, node)
-
-    while len(queue) > 0:
-        current_node = heappop(queue)
-        logger.debug('Outputting domain', extra={
-            'words': current_node.domain.as_words(),
-            'domain_score': current_node.domain.score,
-        })
-        yield current_node.domain
-        # Make sure that if there's going to be a next word, it's available.
-        if current_node.word_index + 1 == len(word_buffer):
-            next_word = next(words)
-            if next_word is not None:
-                logger.debug('Queueing up next word',
-                             extra={'words': next_word.words(), 'buffer_len': len(word_buffer)})
-                word_buffer.append(next_word)
-        # Add the next word if we can
-        if current_node.word_index + 1 < len(word_buffer):
-            child_1 = mk_domain(word_buffer, tlds, current_node.word_index + 1, current_node.tld_index)
-            heappush(queue, child_1)
+        domain.score = self.matcher.adjustment(domain.domain, domain.score)
+        return QueueNode(tld_idx, word_idx, domain)
+
+    def _placeholder(self, tld_idx: int) -> QueueNode:
+        # A TLD always starts at the first word, which stays buffered until the last TLD has started.
+        word = self.word_buffer[0]
+        bound = WordCombo.score_words(word.source + (self.tlds[tld_idx],)) * 100 + self.max_adjustment
+        # Headroom for biases being summed in a different order than here.
+        return QueueNode.placeholder(tld_idx, bound + 1e-9 * (1 + abs(bound)))
+
+    def _start_tld(self, tld_idx: int):
+        heappush(self.queue, self._node(0, tld_idx))
+        if tld_idx + 1 < len(self.tlds):
+            heappush(self.queue, self._placeholder(tld_idx + 1))
+
+    def _compact(self, needed: int) -> int:
+        """Drop buffered words before `needed` that no node can reach any more. Returns how many were dropped."""
+        # A placeholder's TLD will start from the first word.
+        low = min(needed, min((max(node.word_index, 0) for node in self.queue), default=needed))
+        dropped = low - self.word_base
+        if dropped > 0:
+            del self.word_buffer[:dropped]
+            self.word_base = low
+        return dropped
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> QueueNode:
+        return next(self._results)
+
+    def _search(self) -> Iterator[QueueNode]:
+        queue = self.queue
+        word_buffer = self.word_buffer
+        words = self._words
+        tlds = self.tlds
+        adjustment = self.matcher.adjustment
+        # Index of the first buffered word, so `following - base` is its position in the buffer.
+        base = self.word_base
+        compact_at = max(_MIN_COMPACT, 2 * len(word_buffer))
+        tracing = output_trace.enabled()
+        while len(queue) > 0:
+            current_node = heappop(queue)
+            if current_node.domain is None:
+                self._start_tld(current_node.tld_index)
+                continue
+            following = current_node.word_index + 1 - base
+            # Make sure that if there's going to be a next word, it's available.
+            if following == len(word_buffer):
+                next_word = next(words, None)
+                if next_word is not None:
+                    if tracing:
+                        next_word_trace(words=next_word.words(), buffer_len=len(word_buffer))
+                    word_buffer.append(next_word)
+                    if len(word_buffer) >= compact_at:
+                        following -= self._compact(following + base)
+                        base = self.word_base
+                        compact_at = max(_MIN_COMPACT, 2 * len(word_buffer))
+            # Add the next word if we can. (`_node`, inlined.)
+            if following < len(word_buffer):
+                word = word_buffer[following]
+                tld = tlds[current_node.tld_index]
+                domain = Domain(word.concatenated + '.' + tld.concatenated, word.source, tld)
+                domain.score = adjustment(domain.domain, domain.score)
+                heappush(queue, QueueNode(current_node.tld_index, following + base, domain))
+            if tracing:
+                output_trace(words=current_node.domain.as_words(), domain_score=current_node.domain.score)
+            yield current_node
+
+    def state(self) -> dict[str, Any]:
+        """
+        The queue in heap order as (TLD index, word index) pairs, and the words any of it can still reach. A TLD that
+        hasn't started has a word index of -1.
+        """
+        end = self.word_base + len(self.word_buffer)
+        base = min((max(node.word_index, 0) for node in self.queue), default=end)
+        return {
+            'word_base': base,
+            'words': self.word_buffer[base - self.word_base:],
+            'queue': [(node.tld_index, node.word_index) for node in self.queue],
+        }
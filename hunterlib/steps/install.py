@@ -1,5 +1,13 @@
 import nltk
 
+from hunterlib.wordlist import build_hyponym_index
+
 
 def install_data():
     nltk.download('wordnet')
+    build_wordnet_index()
+
+
+def build_wordnet_index() -> str:
+    """One-time build of the hyponym index that makes `wordlist.words` a cheap lookup."""
+    return build_hyponym_index()
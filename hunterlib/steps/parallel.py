@@ -0,0 +1,115 @@
+import logging
+import multiprocessing
+from heapq import merge
+from typing import Iterable, Iterator, Optional
+
+from hunterlib.cache import AvailabilityCache
+from hunterlib.conf import RunConfig
+from hunterlib.filters import FilterPlan
+from hunterlib.profiling import profiled
+from hunterlib.steps.chains import generate_word_chain, generate_tld_chain
+from hunterlib.steps.data import Domain
+from hunterlib.steps.domains import domain_nodes, domain_stages
+from hunterlib.zones import RegisteredIndex
+
+logger = logging.getLogger('domain-hunter.parallel')
+
+_DONE = None
+
+
+def generate_domains_parallel(config: RunConfig, workers: int, chunk_size: int = 256, limit: Optional[int] = None,
+                              min_score: Optional[float] = None, prefetch: int = 4,
+                              caches: Iterable[AvailabilityCache] = (),
+                              registered: Optional[RegisteredIndex] = None) -> Iterator[Domain]:
+    """
+    Same output as `generate_domains` over `generate_word_chain(config, limit, min_score)` and
+    `generate_tld_chain(config)`, computed across a pool of worker processes.
+
+    TLDs are dealt round-robin to the workers. Each worker enumerates and filters the domains for its TLDs, in order,
+    and sends them back `chunk_size` at a time, staying at most `prefetch` chunks ahead. The streams are merged on the
+    same (score, TLD) key the serial queue uses, so the result is identical to the serial order.
+
+    The serial queue is not strictly sorted (domain biases can lift a later domain above an earlier one), so merging
+    only the domains that passed the filters could reorder them. Workers send a bare key for each rejected domain so
+    it still takes its place in the merge.
+    """
+    domain_chain = _merge_partitions(config, workers, chunk_size, limit, min_score, prefetch, registered)
+    # Registered domains were dropped by the workers. Cache lookups happen here in the parent, so the workers never
+    # open the database.
+    return domain_stages(config, profiled('merge_partitions', domain_chain), 'merge_partitions', caches)
+
+
+def _merge_partitions(config: RunConfig, workers: int, chunk_size: int, limit: Optional[int],
+                      min_score: Optional[float], prefetch: int,
+                      registered: Optional[RegisteredIndex]) -> Iterator[Domain]:
+    tld_count = sum(1 for _ in generate_tld_chain(config))
+    if tld_count == 0:
+        raise ValueError("Given tld_chain had no objects. Check config.")
+    workers = max(1, min(workers, tld_count))
+    partitions = [tuple(range(i, tld_count, workers)) for i in range(workers)]
+
+    ctx = multiprocessing.get_context()
+    processes = []
+    streams = []
+    try:
+        for partition in partitions:
+            queue = ctx.Queue(maxsize=prefetch)
+            process = ctx.Process(target=_enumerate_partition, daemon=True,
+                                  args=(config, partition, chunk_size, limit, min_score, registered, queue))
+            process.start()
+            processes.append(process)
+            streams.append(_read_stream(queue))
+        logger.debug('Started domain workers', extra={'workers': workers, 'chunk_size': chunk_size})
+        for (_, _, domain) in merge(*streams):
+            if domain is not None:
+                yield domain
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def _read_stream(queue) -> Iterable[tuple[float, int, Domain]]:
+    while True:
+        chunk = queue.get()
+        if chunk is _DONE:
+            return
+        if isinstance(chunk, BaseException):
+            raise chunk
+        yield from chunk
+
+
+def _enumerate_partition(config: RunConfig, tld_indexes: tuple[int], chunk_size: int, limit: Optional[int],
+                         min_score: Optional[float], registered: Optional[RegisteredIndex], queue):
+    try:
+        chunk = []
+        for item in partition_domains(config, tld_indexes, limit, min_score, registered):
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                queue.put(chunk)
+                chunk = []
+        if chunk:
+            queue.put(chunk)
+        queue.put(_DONE)
+    except Exception as e:
+        queue.put(e)
+
+
+def partition_domains(config: RunConfig, tld_indexes: tuple[int, ...], limit: Optional[int] = None,
+                      min_score: Optional[float] = None,
+                      registered: Optional[RegisteredIndex] = None) -> Iterator[tuple[float, int, Optional[Domain]]]:
+    """
+    The serial queue's (score, TLD index) key for every domain under the TLDs at `tld_indexes`, in the order the
+    serial search would pop them, with the domain if it passes the filters and isn't registered, or None if not.
+    """
+    if not tld_indexes:
+        return
+    word_chain = generate_word_chain(config, limit, min_score)
+    tlds = tuple(generate_tld_chain(config))
+    nodes = domain_nodes(word_chain, (tlds[i] for i in tld_indexes), config.domain_biases)
+    accepts = FilterPlan(config.domain_filters).accepts
+    for node in nodes:
+        domain = node.domain.domain
+        accepted = accepts(domain) and (registered is None or domain not in registered)
+        yield node.score, tld_indexes[node.tld_index], node.domain if accepted else None
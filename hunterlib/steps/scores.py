@@ -0,0 +1,222 @@
+"""Word scores kept between runs, so a change to the word list or biases only rescores the words it touches."""
+
+import hashlib
+import logging
+import os
+import pickle
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Iterable, Optional
+
+from hunterlib.bias import BiasMatcher, ordered_biases
+from hunterlib.filters import FilterPlan
+from hunterlib.models import Bias
+from hunterlib.profiling import profiled_block
+from hunterlib.steps.chains import filter_chain, word_scores
+from hunterlib.steps.data import WordTable
+from hunterlib.utils import atomic_write, cache_path
+
+logger = logging.getLogger('domain-hunter.scores')
+
+# Bump when `word_scores` or the saved layout change, so old tables are thrown away.
+TABLE_VERSION = 1
+
+
+def bias_fingerprint(biases: tuple[Bias, ...]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for b in biases:
+        digest.update(f'{b.pattern}\0{b.adjust!r}\0'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def filter_key(filters: FilterPlan) -> tuple[tuple[str, int], ...]:
+    return tuple(sorted((p.pattern, p.flags) for p in filters.patterns))
+
+
+def normalized(word: str) -> str:
+    # Same normalization the ScoredWord model applies.
+    return word.strip().lower()
+
+
+def score_table_path(config_name: str) -> str:
+    """Where the table for config module `config_name`, run from the current directory, is kept."""
+    key = hashlib.blake2b(f'{os.getcwd()}\0{config_name}'.encode('utf-8'), digest_size=8).hexdigest()
+    return cache_path('scores', f'v{TABLE_VERSION}', f'{key}-{config_name}.pickle')
+
+
+class ScoreTable:
+    """
+    A word list filtered and scored under a set of word biases, brought up to date with a new list, filters and
+    biases by `table`.
+
+    A word's score only depends on which biases occur in it, so when the biases change, only the words containing the
+    pattern of a bias that was added or removed are rescored (changing an adjustment is both), along with new words.
+    The words are kept sorted the way `score_word_list` sorts them, and changed ones spliced out and back in, so the
+    result is the same table `build_word_table` scores from scratch. Filtering is kept too: unless the filters change,
+    only new words go through them.
+    """
+
+    def __init__(self):
+        self.filters: tuple[tuple[str, int], ...] = ()
+        # Every word given, and the ones that passed the filters.
+        self.source: set[str] = set()
+        self.accepted: set[str] = set()
+        self.biases: tuple[Bias, ...] = ()
+        self.fingerprint = bias_fingerprint(self.biases)
+        # Accepted words best first, ties in word order, with each one normalized and its score in the same order.
+        self.order: list[str] = []
+        self.names: list[str] = []
+        self.ordered_scores = array('d')
+        self.scores: dict[str, float] = {}
+        # How many words the last `update` scored.
+        self.rescored = 0
+        self._table: Optional[WordTable] = None
+
+    def table(self, words: Iterable[str], filters: FilterPlan, biases: Iterable[Bias]) -> WordTable:
+        """The scored table for the `words` passing `filters`, under `biases`, updating this to them first."""
+        with profiled_block('score_word_list') as stage:
+            self.update(words, filters, ordered_biases(biases))
+            stage.count(self.rescored, len(self.order))
+            if self._table is None:
+                self._table = WordTable(list(self.names), self.ordered_scores)
+            return self._table
+
+    def update(self, words: Iterable[str], filters: FilterPlan, biases: tuple[Bias, ...]):
+        """Filter and score `words`, with `biases` in `ordered_biases` order, reusing what was done before."""
+        words = set(words)
+        accepted = self._filter(words, filters)
+        if any(not normalized(w) for w in accepted.difference(self.scores)):
+            raise ValueError('Cannot score a word that is empty or only whitespace.')
+        scores = self.scores
+        dirty = accepted.difference(scores)
+        fingerprint = bias_fingerprint(biases)
+        if fingerprint != self.fingerprint:
+            changed = {b.pattern for b in set(self.biases).symmetric_difference(biases)}
+            dirty.update(w for w in self._containing(changed) if w in accepted)
+        stale = (scores.keys() - accepted) | (dirty & scores.keys())
+        # Found by their old scores, so before those go.
+        self._splice(sorted(self._position(w) for w in stale), [])
+        for w in stale:
+            del scores[w]
+
+        fresh = sorted(dirty)
+        scores.update(zip(fresh, word_scores(fresh, BiasMatcher(biases))))
+        # Stable, so ties stay in word order.
+        fresh.sort(key=scores.__getitem__, reverse=True)
+        self._splice([self._position(w) for w in fresh], fresh)
+
+        (self.source, self.accepted) = (words, accepted)
+        (self.biases, self.fingerprint) = (biases, fingerprint)
+        self.rescored = len(fresh)
+        if stale or fresh:
+            self._table = None
+        logger.debug('Updated word scores', extra={'words': len(self.order), 'rescored': len(fresh)})
+
+    def _filter(self, words: set[str], filters: FilterPlan) -> set[str]:
+        key = filter_key(filters)
+        if key != self.filters:
+            (self.filters, self.source, self.accepted) = (key, set(), set())
+        if words == self.source:
+            return self.accepted
+        accepted = self.accepted - (self.source - words)
+        accepted.update(filter_chain(filters, words - self.source, lambda x: x))
+        return accepted
+
+    def _position(self, w: str) -> int:
+        """Where `w` goes in `order` by its score in `scores`: before the first word that doesn't sort ahead of it."""
+        # By hand, since `bisect` only takes a key from Python 3.10.
+        (key, order, ordered_scores) = ((-self.scores[w], w), self.order, self.ordered_scores)
+        (low, high) = (0, len(order))
+        while low < high:
+            middle = (low + high) // 2
+            if (-ordered_scores[middle], order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _splice(self, positions: list[int], inserted: list[str]):
+        """
+        Insert each of `inserted` before the word at the matching one of `positions`, or without `inserted`, remove
+        the words at `positions`. Positions are ascending. The words in between are copied in slices, so this costs a
+        Python step per change however many words there are.
+        """
+        if not positions:
+            return
+        (order, names, ordered_scores) = (self.order, self.names, self.ordered_scores)
+        (new_order, new_names, new_scores) = ([], [], array('d'))
+        previous = 0
+        for (n, i) in enumerate(positions):
+            new_order += order[previous:i]
+            new_names += names[previous:i]
+            new_scores += ordered_scores[previous:i]
+            if inserted:
+                w = inserted[n]
+                new_order.append(w)
+                new_names.append(normalized(w))
+                new_scores.append(self.scores[w])
+                previous = i
+            else:
+                previous = i + 1
+        new_order += order[previous:]
+        new_names += names[previous:]
+        new_scores += ordered_scores[previous:]
+        (self.order, self.names, self.ordered_scores) = (new_order, new_names, new_scores)
+
+    def _containing(self, patterns: set[str]) -> set[str]:
+        """The scored words any of `patterns` occur in."""
+        order = self.order
+        if not (patterns and order):
+            return set()
+        # One string searched in C per pattern, rather than every word tested in Python.
+        text = '\n'.join(order)
+        starts = list(accumulate((len(w) + 1 for w in order), initial=0))
+        found = set()
+        for p in patterns:
+            if '\n' in p:
+                found.update(w for w in order if p in w)
+                continue
+            position = text.find(p)
+            while position >= 0:
+                i = bisect_right(starts, position) - 1
+                found.add(order[i])
+                # Once is enough for a word, so carry on from the next one.
+                position = text.find(p, starts[i + 1])
+        return found
+
+    @classmethod
+    def load(cls, path: str) -> 'ScoreTable':
+        """The table saved at `path`, or an empty one if there is none or it can't be read."""
+        table = cls()
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            if data['version'] != TABLE_VERSION:
+                raise ValueError(f'table version {data["version"]}')
+            filters = tuple((p, f) for (p, f) in data['filters'])
+            source = set(data['source'])
+            biases = tuple(Bias(pattern=p, adjust=a) for (p, a) in data['biases'])
+            order = data['words']
+            ordered_scores = array('d', data['scores'])
+        except FileNotFoundError:
+            return table
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError, ValueError) as e:
+            logger.debug('Discarding unreadable score table', extra={'path': path, 'error': str(e)})
+            return table
+        (table.filters, table.source, table.accepted) = (filters, source, set(order))
+        (table.biases, table.fingerprint) = (biases, bias_fingerprint(biases))
+        (table.order, table.names) = (order, list(map(normalized, order)))
+        (table.ordered_scores, table.scores) = (ordered_scores, dict(zip(order, ordered_scores)))
+        return table
+
+    def save(self, path: str):
+        data = {
+            'version': TABLE_VERSION,
+            'filters': self.filters,
+            'source': sorted(self.source),
+            'biases': [(b.pattern, b.adjust) for b in self.biases],
+            'words': self.order,
+            'scores': self.ordered_scores,
+        }
+        atomic_write(path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
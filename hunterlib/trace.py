@@ -0,0 +1,49 @@
+"""Debug logging for hot loops that costs nothing when it is switched off."""
+
+import logging
+from typing import Optional
+
+from hunterlib.conf import WordFilter
+
+# Default for trace points that don't set their own rate: log one event in this many.
+SAMPLE_EVERY = 1
+
+
+class TracePoint:
+    """
+    A debug log call site inside a hot loop.
+
+    Check `enabled()` once, outside the loop, and only call the trace point when it returned True. That way a disabled
+    trace point costs one local boolean test per iteration and never builds a record or its `extra` dict.
+
+    When enabled, events are first checked against any `WordFilter` on the logger (before anything else is built),
+    then sampled: only one in `sample_every` of the remaining events is logged. Extra values may be zero-argument
+    callables, which are only evaluated for events that actually get logged.
+    """
+
+    def __init__(self, logger: logging.Logger, msg: str, sample_every: Optional[int] = None):
+        if sample_every is not None and sample_every < 1:
+            raise ValueError(f'sample_every must be at least 1, not {sample_every}')
+        self.logger = logger
+        self.msg = msg
+        self.sample_every = sample_every
+        self._seen = 0
+
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    def __call__(self, word: Optional[str] = None, words: tuple[str, ...] = (), **extra):
+        for f in self.logger.filters:
+            if isinstance(f, WordFilter) and not f.matches(word, words):
+                return
+        self._seen += 1
+        if self._seen % (self.sample_every or SAMPLE_EVERY):
+            return
+        if word is not None:
+            extra['word'] = word
+        if words:
+            extra['words'] = words
+        for (k, v) in extra.items():
+            if callable(v):
+                extra[k] = v()
+        self.logger.debug(self.msg, extra=extra)
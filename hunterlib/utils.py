@@ -0,0 +1,27 @@
+"""Small helpers shared across the library."""
+
+import os
+import os.path
+import tempfile
+
+CACHE_DIR = '~/.domain-hunter/cache'
+
+
+def cache_path(*parts: str) -> str:
+    """Resolve a path under the on-disk cache directory, creating its parent directories."""
+    path = os.path.join(os.path.expanduser(CACHE_DIR), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def atomic_write(path: str, data: bytes):
+    """Write a file such that readers (including other processes) only ever see the old or the new contents."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,51 @@
+"""Polling the files a config is built from, for `--watch`."""
+
+import os
+import os.path
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+from hunterlib.steps.config import source_files
+
+# Modification time and size of a file, or None if it's missing.
+Stamp = Optional[tuple[int, int]]
+
+
+def config_paths(config_module) -> list[str]:
+    """The config module's source and every file its `*_files` settings name."""
+    paths = [os.path.join(os.getcwd(), fn) for (_, fn) in source_files(config_module)]
+    source = getattr(config_module, '__file__', None)
+    return ([os.path.abspath(source)] if source else []) + paths
+
+
+def stamp(path: str) -> Stamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """
+    Notices changes to a set of files after it is made, by polling their modification times and sizes.
+
+    Polling needs no platform support, and a few stat calls per interval cost next to nothing for the handful of files
+    a config names.
+    """
+
+    def __init__(self, paths: Iterable[str], interval: float = 0.2):
+        self.interval = interval
+        self.stamps = {path: stamp(path) for path in paths}
+
+    def changed(self) -> list[str]:
+        return [path for (path, seen) in self.stamps.items() if stamp(path) != seen]
+
+    def wait(self) -> list[str]:
+        """Block until any of the files has changed, and return the ones that have."""
+        while True:
+            changed = self.changed()
+            if changed:
+                return changed
+            time.sleep(self.interval)
@@ -1,41 +1,227 @@
+"""Utilities for generating and interacting with word lists."""
+
+import gzip
 import logging
-from collections.abc import Iterable
+import os.path
+import re
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from typing import Optional
 
+import nltk
 from nltk.corpus import wordnet as wn
 from nltk.corpus.reader import Synset
+from nltk.corpus.reader.wordnet import WordNetError
 from pydantic import BaseModel
 
-"""Utilities for generating and interacting with word lists."""
+from hunterlib.packed import PackedFile, pack_ints, pack_strings, write_packed
+from hunterlib.trace import TracePoint
+from hunterlib.utils import atomic_write, cache_path
 
 logger = logging.getLogger('domain-hunter.wordlist')
 
+word_trace = TracePoint(logger, 'Generated word from synset.')
+
 
 def synset_to_str(s: Synset) -> str:
     return s.lemma_names()[0]
 
 
-def words(syn: str) -> Iterable[str]:
-    """Convert a wordnet synset reference to a list of possible synsets"""
+def words(syn: str, depth: Optional[int] = None) -> Iterator[str]:
+    """
+    Stream the words for a wordnet synset and all of its hyponyms, breadth first and without repeats.
+
+    `depth` limits how many levels of hyponyms are followed: 0 yields only the synset itself. Uses the hyponym index
+    built by `build_hyponym_index` when it exists, and walks WordNet directly otherwise.
+    """
+    index = hyponym_index()
+    if index is not None and syn in index:
+        return index.words(syn, depth)
+    return _walk_wordnet(syn, depth)
+
+
+def _walk_wordnet(syn: str, depth: Optional[int]) -> Iterator[str]:
     base: Synset = wn.synset(syn)
-    tree = base.tree(lambda s: s.hyponyms())
-    rv = set()
-    log_msg = 'Generated word from synset.'
-    for synset in flatten(tree):
-        word = synset_to_str(synset)
-        logger.debug(log_msg, extra={
-            'word': word,
-            'alternates': synset.lemma_names(),
-            'tree_base': str(base),
-        })
-        rv.add(word)
-    return {synset_to_str(s) for s in flatten(tree)}
+    seen_synsets = {base}
+    seen_words = set()
+    frontier = [base]
+    level = 0
+    tracing = word_trace.enabled()
+    while frontier:
+        next_frontier = []
+        for synset in frontier:
+            word = synset_to_str(synset)
+            if word not in seen_words:
+                seen_words.add(word)
+                if tracing:
+                    word_trace(word, alternates=synset.lemma_names, tree_base=syn)
+                yield word
+            if depth is None or level < depth:
+                for hyponym in synset.hyponyms():
+                    if hyponym not in seen_synsets:
+                        seen_synsets.add(hyponym)
+                        next_frontier.append(hyponym)
+        frontier = next_frontier
+        level += 1
+
+
+class HyponymIndex:
+    """
+    Memory-mapped synset -> lemma names and hyponyms lookup, written by `build_hyponym_index`.
+
+    Hyponyms are stored as direct edges (CSR style) rather than full closures: the closure of a broad synset like
+    `entity.n.01` covers most of WordNet, so it is cheaper to walk the edges on demand.
+    """
+
+    def __init__(self, path: str):
+        self._file = PackedFile(path)
+        self.names = self._file.strings('names')
+        self.lemmas = self._file.strings('lemmas')
+        self._lemma_index = self._file.ints('lemma_index')
+        self._hyponym_index = self._file.ints('hyponym_index')
+        self._hyponyms = self._file.ints('hyponyms')
+
+    def __contains__(self, syn: str) -> bool:
+        return self.names.find(syn) is not None
+
+    def synset_id(self, syn: str) -> int:
+        synset_id = self.names.find(syn)
+        if synset_id is None:
+            # Match what `wn.synset` raises for an unknown name.
+            raise WordNetError(f'No synset found for {syn!r} in the hyponym index.')
+        return synset_id
+
+    def lemma_names(self, synset_id: int) -> list[str]:
+        return [self.lemmas[i] for i in range(self._lemma_index[synset_id], self._lemma_index[synset_id + 1])]
+
+    def hyponyms(self, synset_id: int) -> memoryview:
+        return self._hyponyms[self._hyponym_index[synset_id]:self._hyponym_index[synset_id + 1]]
+
+    def words(self, syn: str, depth: Optional[int] = None) -> Iterator[str]:
+        base = self.synset_id(syn)
+        lemmas = self.lemmas
+        lemma_index = self._lemma_index
+        seen_synsets = {base}
+        seen_words = set()
+        frontier = [base]
+        level = 0
+        tracing = word_trace.enabled()
+        while frontier:
+            next_frontier = []
+            for synset_id in frontier:
+                word = lemmas[lemma_index[synset_id]]
+                if word not in seen_words:
+                    seen_words.add(word)
+                    if tracing:
+                        word_trace(word, alternates=lambda: self.lemma_names(synset_id), tree_base=syn)
+                    yield word
+                if depth is None or level < depth:
+                    for hyponym in self.hyponyms(synset_id):
+                        if hyponym not in seen_synsets:
+                            seen_synsets.add(hyponym)
+                            next_frontier.append(hyponym)
+            frontier = next_frontier
+            level += 1
+
+
+def hyponym_index_path() -> str:
+    return cache_path('wordnet', wordnet_version(), 'hyponyms.idx')
+
+
+@lru_cache(maxsize=None)
+def _load_hyponym_index(path: str) -> Optional[HyponymIndex]:
+    if not os.path.exists(path):
+        return None
+    return HyponymIndex(path)
+
+
+def hyponym_index() -> Optional[HyponymIndex]:
+    """Get the hyponym index for the installed WordNet, or None if it has not been built."""
+    return _load_hyponym_index(hyponym_index_path())
+
+
+def build_hyponym_index(path: Optional[str] = None) -> str:
+    """Walk all of WordNet once and write the index used by `words`. Returns the path written."""
+    path = path or hyponym_index_path()
+    synsets = sorted(wn.all_synsets(), key=lambda s: s.name())
+    ids = {s.name(): i for (i, s) in enumerate(synsets)}
+
+    lemma_index = [0]
+    hyponym_index_ = [0]
+    hyponyms = []
+    lemma_names = []
+    for synset in synsets:
+        lemma_names.extend(synset.lemma_names())
+        lemma_index.append(len(lemma_names))
+        hyponyms.extend(ids[h.name()] for h in synset.hyponyms())
+        hyponym_index_.append(len(hyponyms))
+
+    name_offsets, name_data = pack_strings(s.name() for s in synsets)
+    lemma_offsets, lemma_data = pack_strings(lemma_names)
+    write_packed(path, {
+        'names.offsets': name_offsets,
+        'names.data': name_data,
+        'lemmas.offsets': lemma_offsets,
+        'lemmas.data': lemma_data,
+        'lemma_index': pack_ints(lemma_index),
+        'hyponym_index': pack_ints(hyponym_index_),
+        'hyponyms': pack_ints(hyponyms),
+    })
+    _load_hyponym_index.cache_clear()
+    logger.info('Wrote hyponym index.', extra={'path': path, 'synsets': len(synsets)})
+    return path
+
+
+@lru_cache(maxsize=None)
+def wordnet_version() -> str:
+    """
+    Read the WordNet version from the corpus files without loading the corpus itself.
+
+    Mirrors what `wn.get_version()` does, but that call parses every index and exception file first.
+    """
+    root = nltk.data.find('corpora/wordnet')
+    with root.join('data.adj').open() as f:
+        for line in f:
+            match = re.search(rb'Word[nN]et (\d+|\d+\.\d+) Copyright', line)
+            if match is not None:
+                return match.group(1).decode('ascii')
+    return 'unknown'
+
+
+def pos_lemmas(pos: str) -> set[str]:
+    """Get the primary lemma of every synset with the given part of speech, caching the result on disk."""
+    path = cache_path('wordnet', wordnet_version(), f'pos-{pos}.txt.gz')
+    if os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return set(f.read().split('\n'))
+
+    lemmas = {synset_to_str(s) for s in wn.all_synsets(pos)}
+    logger.debug('Caching part of speech lemmas.', extra={'pos': pos, 'count': len(lemmas), 'path': path})
+    atomic_write(path, gzip.compress('\n'.join(sorted(lemmas)).encode('utf-8')))
+    return lemmas
+
+
+class _LemmaSet:
+    """Class attribute that computes a part of speech's lemmas on first access, then replaces itself."""
+
+    def __init__(self, pos: str):
+        self.pos = pos
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner) -> set[str]:
+        lemmas = pos_lemmas(self.pos)
+        setattr(owner, self.name, lemmas)
+        return lemmas
 
 
 class PartOfSpeech:
-    ADJECTIVE = {synset_to_str(s) for s in wn.all_synsets('a')}
-    NOUN = {synset_to_str(s) for s in wn.all_synsets('n')}
-    ADVERB = {synset_to_str(s) for s in wn.all_synsets('r')}
-    VERB = {synset_to_str(s) for s in wn.all_synsets('v')}
+    ADJECTIVE = _LemmaSet('a')
+    NOUN = _LemmaSet('n')
+    ADVERB = _LemmaSet('r')
+    VERB = _LemmaSet('v')
 
 
 def flatten(items: Iterable, f=lambda i: True) -> Iterable:
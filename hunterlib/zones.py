@@ -0,0 +1,273 @@
+"""An offline index of registered domains, built from zone files or plain domain lists."""
+
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import os.path
+import tempfile
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from heapq import merge
+from typing import TYPE_CHECKING, Optional
+
+from hunterlib.bloom import BloomFilter
+from hunterlib.packed import PackedFile, write_packed_files
+
+if TYPE_CHECKING:
+    # hunterlib.steps imports this module, so only import from it for type checkers.
+    from hunterlib.steps.data import Domain
+
+logger = logging.getLogger('domain-hunter.zones')
+
+INDEX_SUFFIX = '.pack'
+# The first name of each block of this many is held in memory. Lookups bisect those, then search one block on disk.
+BLOCK_SIZE = 256
+
+
+def _open_source(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def registered_names(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield (TLD, second level label) for each owner name in a zone file, or each line of a plain domain list.
+
+    Comments, `$` directives other than `$ORIGIN`, and continuation lines are skipped. Names below the second level
+    (name servers, for example) count as registering their second level domain.
+    """
+    origin = ''
+    for line in lines:
+        if not line or line[0] in ' \t;\r\n':
+            continue
+        owner = line.split(None, 2)
+        if owner[0] == '$ORIGIN' and len(owner) > 1:
+            origin = owner[1].lower().rstrip('.')
+            continue
+        if owner[0].startswith('$'):
+            continue
+        name = owner[0].lower()
+        if name == '@':
+            name = origin
+        elif name.endswith('.'):
+            name = name[:-1]
+        elif origin and len(owner) > 1:
+            # A relative owner name in a zone file. Plain lists (one field per line) are always absolute.
+            name = f'{name}.{origin}'
+        labels = name.split('.')
+        if len(labels) >= 2 and labels[-2]:
+            yield labels[-1], labels[-2]
+
+
+def _spill(buffers: dict[str, list[str]], runs: dict[str, list[str]], directory: str):
+    for tld, names in buffers.items():
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.run')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(name + '\n' for name in sorted(set(names)))
+        runs[tld].append(path)
+    buffers.clear()
+
+
+def _read_run(path: str) -> Iterator[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line[:-1]
+
+
+def _unique(names: Iterable[str]) -> Iterator[str]:
+    previous = None
+    for name in names:
+        if name != previous:
+            yield name
+            previous = name
+
+
+def _write_index(path: str, names: Iterable[str], capacity: int, bloom_error_rate: Optional[float],
+                 scratch: str) -> int:
+    """
+    Write sorted, unique `names` as an index file, streaming through scratch files.
+
+    The `names` section is every name terminated by a newline, after a leading newline, so a name can be found with a
+    single C-level substring search for `\\nname\\n`. `blocks` holds the position of the newline in front of every
+    `BLOCK_SIZE`th name, which bounds that search to one block.
+    """
+    names_path = os.path.join(scratch, 'names')
+    blocks_path = os.path.join(scratch, 'blocks')
+    bloom = BloomFilter(capacity, bloom_error_rate) if bloom_error_rate else None
+    count = 0
+    position = 1
+    with open(names_path, 'wb') as data:
+        data.write(b'\n')
+        blocks = array('Q')
+        for name in names:
+            if count % BLOCK_SIZE == 0:
+                blocks.append(position - 1)
+            encoded = name.encode('utf-8') + b'\n'
+            data.write(encoded)
+            position += len(encoded)
+            if bloom is not None:
+                bloom.add(name)
+            count += 1
+    with open(blocks_path, 'wb') as f:
+        blocks.tofile(f)
+
+    sections = {'names': names_path, 'blocks': blocks_path}
+    if bloom is not None:
+        bloom_path = os.path.join(scratch, 'bloom')
+        with open(bloom_path, 'wb') as f:
+            f.write(bloom.to_bytes())
+        sections['bloom'] = bloom_path
+    write_packed_files(path, sections)
+    return count
+
+
+def build_registered_index(sources: Iterable[str], directory: str, bloom_error_rate: Optional[float] = None,
+                           run_size: int = 1_000_000) -> dict[str, int]:
+    """
+    Build one sorted index file per TLD in `directory` from zone files or domain lists (optionally gzipped).
+
+    Inputs are sorted externally: names are buffered `run_size` at a time, written out as sorted runs, and the runs
+    for each TLD are merged straight into its index, so memory use doesn't grow with the input.
+
+    With `bloom_error_rate`, each index also carries a Bloom filter that answers most misses without reading the
+    names. Hashing costs more than a search of a block that is already in the page cache, so this only pays off when
+    the index is much larger than memory.
+
+    Returns the number of distinct registered names per TLD.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    with tempfile.TemporaryDirectory(dir=directory, prefix='.build-') as scratch:
+        runs: dict[str, list[str]] = defaultdict(list)
+        totals: dict[str, int] = defaultdict(int)
+        buffers: dict[str, list[str]] = defaultdict(list)
+        buffered = 0
+        for source in sources:
+            with _open_source(source) as f:
+                for (tld, name) in registered_names(f):
+                    buffers[tld].append(name)
+                    totals[tld] += 1
+                    buffered += 1
+                    if buffered >= run_size:
+                        _spill(buffers, runs, scratch)
+                        buffered = 0
+            logger.debug('Read registered domains', extra={'source': source, 'tlds': len(totals)})
+        _spill(buffers, runs, scratch)
+
+        for (tld, paths) in runs.items():
+            unique = _unique(merge(*map(_read_run, paths)))
+            counts[tld] = _write_index(os.path.join(directory, tld + INDEX_SUFFIX), unique, totals[tld],
+                                       bloom_error_rate, scratch)
+            for path in paths:
+                os.unlink(path)
+            logger.debug('Wrote registered domain index', extra={'tld': tld, 'names': counts[tld]})
+    return counts
+
+
+class _TldIndex:
+    def __init__(self, path: str):
+        self.file = PackedFile(path)
+        self.bloom = BloomFilter.from_buffer(self.file.raw('bloom')) if 'bloom' in self.file else None
+        self.blocks = self.file.ints('blocks', 'Q').tolist()
+        self.length = len(self.file.raw('names'))
+        names = self.file.raw('names')
+        self.first_names = [bytes(names[start + 1:self.file.find('names', b'\n', start + 1)]) for start in self.blocks]
+
+    def __contains__(self, name: str) -> bool:
+        if self.bloom is not None and name not in self.bloom:
+            return False
+        encoded = name.encode('utf-8')
+        block = bisect_right(self.first_names, encoded) - 1
+        if block < 0:
+            return False
+        start = self.blocks[block]
+        end = self.blocks[block + 1] + 1 if block + 1 < len(self.blocks) else self.length
+        return self.file.find('names', b'\n' + encoded + b'\n', start, end) >= 0
+
+    def close(self):
+        # Views of the mapping have to go before it can be closed.
+        self.bloom = None
+        self.file.close()
+
+
+class RegisteredIndex:
+    """
+    The indexes written by `build_registered_index`, memory-mapped and opened one TLD at a time as they are needed.
+
+    Domains under a TLD without an index are never reported as registered. Pickling only carries the directory, so an
+    index can be handed to worker processes, which map the files themselves.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.expanduser(directory)
+        self._tlds: dict[str, Optional[_TldIndex]] = {}
+
+    def _index(self, tld: str) -> Optional[_TldIndex]:
+        try:
+            return self._tlds[tld]
+        except KeyError:
+            path = os.path.join(self.directory, tld + INDEX_SUFFIX)
+            index = self._tlds[tld] = _TldIndex(path) if os.path.exists(path) else None
+            return index
+
+    def __contains__(self, domain: str) -> bool:
+        name, _, tld = domain.rpartition('.')
+        index = self._index(tld)
+        return index is not None and name in index
+
+    def stamp(self) -> str:
+        """
+        A digest of which TLDs have an index, and each index's size and block offsets. Those change with any name
+        added, removed or renamed to a different length, and unlike modification times they survive copying the
+        indexes to another machine. It only reads the small block tables, however large the indexes are.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        names = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+        for fn in names:
+            if not fn.endswith(INDEX_SUFFIX):
+                continue
+            path = os.path.join(self.directory, fn)
+            digest.update(f'{fn}\0{os.path.getsize(path)}\0'.encode('utf-8'))
+            with PackedFile(path) as f:
+                digest.update(f.raw('blocks'))
+        return digest.hexdigest()
+
+    def close(self):
+        for index in self._tlds.values():
+            if index is not None:
+                index.close()
+        self._tlds.clear()
+
+    def __getstate__(self):
+        return {'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'])
+
+
+def drop_registered(domains: Iterable['Domain'], index: RegisteredIndex) -> Iterator['Domain']:
+    return (d for d in domains if d.domain not in index)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description='Build an offline index of registered domains.')
+    parser.add_argument('directory', help='Directory to write one index file per TLD to.')
+    parser.add_argument('sources', nargs='+', help='Zone files or lists of domains, one per line. May be gzipped.')
+    parser.add_argument('--bloom-error-rate', type=float,
+                        help='Also build a Bloom filter per TLD with this false positive rate.')
+    parser.add_argument('--run-size', type=int, default=1_000_000,
+                        help='Names to sort in memory at a time.')
+    args = parser.parse_args(argv)
+
+    counts = build_registered_index(args.sources, args.directory, args.bloom_error_rate, args.run_size)
+    for tld, count in sorted(counts.items()):
+        print(f'{tld:16s} {count:12d}')
+
+
+if __name__ == '__main__':
+    main()
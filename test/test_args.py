@@ -20,3 +20,54 @@ class TestArgParser:
     def test_specify_config_file_with_no_arg(self):
         with pytest.raises(SystemExit):
             arg_parser.parse_args(['--config-file'])
+
+    def test_search_bounds(self):
+        parse_res = arg_parser.parse_args(['--limit', '250', '--min-score', '0.25'])
+        assert parse_res.limit == 250
+        assert parse_res.min_score == 0.25
+
+    def test_search_bounds_default_to_unbounded(self):
+        parse_res = arg_parser.parse_args([])
+        assert parse_res.limit is None
+        assert parse_res.min_score is None
+
+    def test_parallel_options(self):
+        parse_res = arg_parser.parse_args(['--workers', '8', '--chunk-size', '64'])
+        assert parse_res.workers == 8
+        assert parse_res.chunk_size == 64
+
+    def test_shard(self):
+        assert arg_parser.parse_args(['--shard', '2/4']).shard == (2, 4)
+        for bad in ('4/4', '1', 'a/b'):
+            with pytest.raises(SystemExit):
+                arg_parser.parse_args(['--shard', bad])
+
+    def test_log_sample(self):
+        assert arg_parser.parse_args([]).log_sample == 1
+        assert arg_parser.parse_args(['--log-sample', '100']).log_sample == 100
+        for bad in ('0', '-3', 'x'):
+            with pytest.raises(SystemExit):
+                arg_parser.parse_args(['--log-sample', bad])
+
+    def test_output_options(self):
+        parse_res = arg_parser.parse_args(['--count', '0', '--format', 'jsonl', '--output', 'out.jsonl'])
+        assert (parse_res.count, parse_res.format, parse_res.output) == (0, 'jsonl', 'out.jsonl')
+        assert arg_parser.parse_args([]).count == 250
+
+    def test_check(self):
+        assert arg_parser.parse_args(['--check']).check
+        assert not arg_parser.parse_args([]).check
+
+    def test_config_snapshot(self):
+        assert arg_parser.parse_args(['--config-snapshot']).config_snapshot
+        assert not arg_parser.parse_args([]).config_snapshot
+
+    def test_paging(self):
+        args = arg_parser.parse_args(['--offset', '1000', '--resume', 'a.ckpt', '--checkpoint', 'b.ckpt'])
+        assert (args.offset, args.resume, args.checkpoint) == (1000, 'a.ckpt', 'b.ckpt')
+        args = arg_parser.parse_args([])
+        assert (args.offset, args.resume, args.checkpoint) == (0, None, None)
+
+    def test_registered(self):
+        assert arg_parser.parse_args(['--registered', 'zones']).registered == 'zones'
+        assert arg_parser.parse_args([]).registered is None
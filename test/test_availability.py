@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from hunterlib.availability import HttpPool, NamecheapChecker, TokenBucket, check_domains
+from hunterlib.conf import NamecheapConfig
+from hunterlib.steps.data import Domain, ScoredWord, WordCombo
+
+RESPONSE = '''<?xml version="1.0" encoding="utf-8"?>
+<ApiResponse Status="OK" xmlns="http://api.namecheap.com/xml.response">
+  <CommandResponse Type="namecheap.domains.check">
+    {results}
+  </CommandResponse>
+</ApiResponse>'''
+RESULT = '<DomainCheckResult Domain="{domain}" Available="{available}" IsPremiumName="false" />'
+
+
+class StandIn:
+    """
+    Namecheap stand-in: domains starting with 'a' are available, the first two requests with 'flaky' domains fail,
+    and requests with 'broken' domains get a cut off response.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+
+    def handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                domains = parse_qs(urlsplit(self.path).query)['DomainList'][0].split(',')
+                with stand_in.lock:
+                    stand_in.requests.append(domains)
+                    stand_in.active += 1
+                    stand_in.max_active = max(stand_in.max_active, stand_in.active)
+                    attempts = stand_in.requests.count(domains)
+                time.sleep(0.01)
+                with stand_in.lock:
+                    stand_in.active -= 1
+                status = 200
+                body = RESPONSE.format(results=''.join(
+                    RESULT.format(domain=d, available=str(d.startswith('a')).lower()) for d in domains)).encode()
+                if any(d.startswith('flaky') for d in domains) and attempts < 3:
+                    status, body = 503, b'busy'
+                elif any(d.startswith('broken') for d in domains):
+                    body = body[:len(body) // 2]
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def server():
+    stand_in = StandIn()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), stand_in.handler())
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in, f'http://127.0.0.1:{httpd.server_address[1]}/xml.response'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def mk_domain(name: str) -> Domain:
+    words = (ScoredWord(word=name, score=1),)
+    return Domain(f'{name}.com', words, WordCombo('com', (ScoredWord(word='com', score=1),)))
+
+
+@pytest.fixture
+def checker(server):
+    _, url = server
+    checker = NamecheapChecker(NamecheapConfig(endpoint=url), HttpPool(url, 4))
+    yield checker
+    checker.close()
+
+
+class TestCheckDomains:
+    def test_preserves_order_and_attaches_results(self, server, checker):
+        names = ['alpha', 'beta', 'apex', 'gamma', 'delta', 'atom', 'zeta', 'nova']
+        result = list(check_domains(map(mk_domain, names), checker, concurrency=3, backoff=0))
+        assert [d.domain for d in result] == [f'{n}.com' for n in names]
+        assert [d.plugin_data['namecheap']['available'] for d in result] == [n.startswith('a') for n in names]
+        stand_in, _ = server
+        assert stand_in.max_active <= 3
+
+    def test_batches_requests(self, server, checker):
+        checker.batch_size = 3
+        names = [f'n{i}' for i in range(10)]
+        result = list(check_domains(map(mk_domain, names), checker, max_ahead=5, backoff=0))
+        assert [d.plugin_data['namecheap'] for d in result] == [{'available': False, 'premium': False}] * 10
+        stand_in, _ = server
+        assert sorted(stand_in.requests) == sorted([[f'n{i}.com' for i in range(j, min(j + 3, 10))]
+                                                   for j in range(0, 10, 3)])
+
+    def test_retries_transient_errors(self, server, checker):
+        result = list(check_domains([mk_domain('flaky')], checker, retries=3, backoff=0))
+        assert result[0].plugin_data['namecheap']['available'] is False
+        result = list(check_domains([mk_domain('flakyer')], checker, retries=1, backoff=0))
+        assert result[0].plugin_data['namecheap'] == {'error': 'HTTP 503'}
+        result = list(check_domains([mk_domain('broken')], checker, retries=1, backoff=0))
+        assert result[0].plugin_data['namecheap']['error'].startswith('Unreadable API response')
+
+    def test_backpressure(self, server, checker):
+        pulled = []
+
+        def source():
+            for i in range(100):
+                pulled.append(i)
+                yield mk_domain(f'n{i}')
+
+        checked = check_domains(source(), checker, max_ahead=5)
+        next(checked)
+        assert len(pulled) <= 6
+        checked.close()
+
+
+class TestTokenBucket:
+    def test_limits_rate(self):
+        async def acquire_all():
+            bucket = TokenBucket(rate=50, burst=1)
+            start = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(acquire_all()) >= 0.09
+
+
+class TestNamecheapParse:
+    def test_api_error(self):
+        body = b'''<ApiResponse Status="ERROR" xmlns="http://api.namecheap.com/xml.response">
+            <Errors><Error Number="1011102">API Key is invalid</Error></Errors></ApiResponse>'''
+        assert NamecheapChecker.parse(['a.com'], body) == {'a.com': {'error': 'API Key is invalid'}}
+
+    def test_batch(self):
+        body = RESPONSE.format(results=RESULT.format(domain='B.com', available='true')).encode()
+        assert NamecheapChecker.parse(['a.com', 'b.com'], body) == {
+            'a.com': {'error': 'Domain missing from API response'},
+            'b.com': {'available': True, 'premium': False},
+        }
@@ -0,0 +1,25 @@
+from bench.configs import make_config
+from bench.run import compare
+from hunterlib.steps.config import load_config
+
+
+class TestBenchConfigs:
+    def test_deterministic(self):
+        assert vars(make_config(50, 5, 10, 3)) == vars(make_config(50, 5, 10, 3))
+        assert vars(make_config(50, 5, 10, 3)) != vars(make_config(50, 5, 10, 3, seed=1))
+
+    def test_loads(self):
+        conf = load_config(make_config(50, 5, 10, 3))
+        assert len(conf.word_list) == 50
+        assert len(conf.tld_list) == 5
+        assert len(conf.word_biases) <= 10
+
+
+class TestCompare:
+    def test_flags_slower_stages(self):
+        baseline = {'sizes': {'small': {'stages': {'load_config': {'seconds': 1.0, 'peak_bytes': 100}}}}}
+        current = {'sizes': {'small': {'stages': {'load_config': {'seconds': 2.0, 'peak_bytes': 110},
+                                                  'new_stage': {'seconds': 5.0}}}}}
+        regressions = compare(current, baseline, 1.5)
+        assert len(regressions) == 1
+        assert regressions[0].startswith('small/load_config/seconds')
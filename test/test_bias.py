@@ -0,0 +1,32 @@
+from hypothesis import given, strategies as st
+
+from hunterlib.bias import BiasMatcher, match_biases_naive
+from hunterlib.models import Bias
+
+letters = 'abcd'
+
+biases = st.builds(Bias, pattern=st.text(letters, min_size=1, max_size=4),
+                   adjust=st.floats(-2, 2, allow_nan=False))
+
+
+class TestBiasMatcher:
+    @given(st.sets(biases, max_size=50), st.text(letters, max_size=30))
+    def test_matches_naive_loop(self, bias_set, text):
+        matcher = BiasMatcher(bias_set)
+        assert matcher.matches(text) == match_biases_naive(bias_set, text)
+
+    @given(st.sets(biases, max_size=50), st.text(letters, max_size=30), st.floats(-10, 10, allow_nan=False))
+    def test_adjustment_is_identical_to_naive_sum(self, bias_set, text, start):
+        matcher = BiasMatcher(bias_set)
+        expected = start
+        for bias in match_biases_naive(bias_set, text):
+            expected += bias.adjust
+        assert matcher.adjustment(text, start) == expected
+
+    def test_overlapping_patterns(self):
+        bias_set = (Bias(pattern='he', adjust=1), Bias(pattern='she', adjust=0.5), Bias(pattern='hers', adjust=-1),
+                    Bias(pattern='his', adjust=2), Bias(pattern='e', adjust=0.25))
+        matcher = BiasMatcher(bias_set)
+        assert matcher.matches('ushers') == [bias_set[0], bias_set[1], bias_set[2], bias_set[4]]
+        assert matcher.adjustment('ushers') == 0.75
+        assert matcher.adjustment('xyz') == 0
@@ -0,0 +1,96 @@
+import time
+
+from hypothesis import given, strategies as st
+
+from hunterlib.availability import check_domains
+from hunterlib.bloom import BloomFilter
+from hunterlib.cache import AvailabilityCache, attach_cached
+from hunterlib.steps.data import Domain, ScoredWord, WordCombo
+
+
+def mk_domain(name: str) -> Domain:
+    word, _, tld = name.partition('.')
+    return Domain(name, (ScoredWord(word=word, score=3),), WordCombo(tld, (ScoredWord(word=tld, score=3),)))
+
+
+class CountingChecker:
+    name = 'namecheap'
+
+    def __init__(self):
+        self.checked = []
+
+    batch_size = 1
+
+    async def check(self, domains: list[str]):
+        self.checked.extend(domains)
+        return {d: {'available': True, 'premium': False} for d in domains}
+
+
+class TestBloomFilter:
+    @given(st.sets(st.text(min_size=1), max_size=200))
+    def test_no_false_negatives(self, items):
+        bloom = BloomFilter(len(items))
+        bloom.update(items)
+        assert all(i in bloom for i in items)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        bloom.update(f'taken{i}.com' for i in range(1000))
+        false_positives = sum(f'free{i}.com' in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_round_trip(self):
+        bloom = BloomFilter(100)
+        bloom.update(['a.com', 'b.io'])
+        loaded = BloomFilter.from_buffer(bloom.to_bytes())
+        assert 'a.com' in loaded and 'b.io' in loaded
+        assert loaded.bits == bloom.bits
+
+
+class TestAvailabilityCache:
+    def test_batch_round_trip(self, tmp_path):
+        cache = AvailabilityCache('namecheap', str(tmp_path), ttl=60)
+        cache.put_many({'a.com': {'available': False}, 'b.com': {'available': True}})
+        assert cache.get_many(['a.com', 'b.com', 'c.com']) == {
+            'a.com': {'available': False}, 'b.com': {'available': True}}
+        cache.close()
+
+    def test_persists_between_processes(self, tmp_path):
+        first = AvailabilityCache('namecheap', str(tmp_path), ttl=60)
+        second = AvailabilityCache('namecheap', str(tmp_path), ttl=60)
+        first.put('a.com', {'available': False})
+        # The second handle loaded its filter before the write, so only a fresh open sees it without a lookup.
+        assert AvailabilityCache('namecheap', str(tmp_path), ttl=60).get('a.com') == {'available': False}
+        second.put('b.com', {'available': True})
+        assert first.get_many(['a.com']) == {'a.com': {'available': False}}
+
+    def test_ttl(self, tmp_path):
+        cache = AvailabilityCache('namecheap', str(tmp_path), ttl=0.05)
+        cache.put('a.com', {'available': False})
+        assert cache.get('a.com') is not None
+        time.sleep(0.1)
+        assert cache.get('a.com') is None
+        assert 'a.com' not in AvailabilityCache('namecheap', str(tmp_path), ttl=0.05).bloom
+
+    def test_deletes_expired_on_open(self, tmp_path):
+        with AvailabilityCache('namecheap', str(tmp_path), ttl=0.5) as cache:
+            cache.put('a.com', {'available': False})
+            time.sleep(0.6)
+            cache.put('b.com', {'available': True})
+        with AvailabilityCache('namecheap', str(tmp_path), ttl=0.5) as cache:
+            assert [row[0] for row in cache._db.execute('SELECT domain FROM results')] == ['b.com']
+
+    def test_attach_and_check(self, tmp_path):
+        with AvailabilityCache('namecheap', str(tmp_path), ttl=60) as cache:
+            cache.put('a.com', {'available': False, 'premium': False})
+            domains = list(attach_cached(map(mk_domain, ['a.com', 'b.com', 'c.com']), cache))
+            assert [d.domain for d in domains] == ['a.com', 'b.com', 'c.com']
+            assert domains[0].plugin_data['namecheap']['cached']
+            assert 'namecheap' not in domains[1].plugin_data
+
+            checker = CountingChecker()
+            checked = list(check_domains(domains, checker, cache=cache))
+            assert checker.checked == ['b.com', 'c.com']
+            assert [d.plugin_data['namecheap']['available'] for d in checked] == [False, True, True]
+        with AvailabilityCache('namecheap', str(tmp_path), ttl=60) as cache:
+            assert set(cache.get_many(['b.com', 'c.com'])) == {'b.com', 'c.com'}
@@ -1,2 +1,85 @@
+import importlib.util
+
+import pytest
+from pydantic import ValidationError
+
+import hunterlib.steps.config
+import hunterlib.utils
+from hunterlib.conf import NamecheapConfig, NameGuppyConfig, RunConfig
+from hunterlib.models import Bias
+from hunterlib.steps.config import get_optional_settings, load_config
+
+
 class TestConfigFromFile:
     pass
+
+
+class TestOptionalSettings:
+    class ConfigModule:
+        namecheap_api_user = 'someone'
+        namecheap_rate = 1.5
+        namecheap_enable = False
+
+    def test_reads_prefixed_settings(self):
+        settings = get_optional_settings(self.ConfigModule, 'namecheap', NamecheapConfig, {'enable'})
+        assert settings == {'api_user': 'someone', 'rate': 1.5}
+        assert NamecheapConfig(**settings).rate == 1.5
+
+
+class TestFromBulk:
+    def test_matches_constructor(self):
+        words = {'Sky', 'nova', 'PIXEL'}
+        extra = dict(word_biases={Bias(pattern='y', adjust=1)}, name_guppy_conf=NameGuppyConfig(),
+                     namecheap_conf=NamecheapConfig())
+        fast = RunConfig.from_bulk(words, {'COM', 'io'}, **extra)
+        slow = RunConfig(word_list=words, tld_list={'COM', 'io'}, **extra)
+        assert (fast.word_list, fast.tld_list, fast.word_biases) == (slow.word_list, slow.tld_list, slow.word_biases)
+        assert RunConfig.from_bulk({'sky', 3}, {'com'}, **extra).word_list == {'sky', '3'}
+
+    @pytest.mark.parametrize('words', [set(), {'sky', ''}, {'sky', object()}])
+    def test_rejects_what_constructor_rejects(self, words):
+        extra = dict(name_guppy_conf=NameGuppyConfig(), namecheap_conf=NamecheapConfig())
+        with pytest.raises(ValidationError):
+            RunConfig(word_list=words, tld_list={'com'}, **extra)
+        with pytest.raises(ValidationError):
+            RunConfig.from_bulk(words, {'com'}, **extra)
+
+
+CONFIG_MODULE = """\
+import os.path
+
+word_source_lists = (('sky', 'nova'),)
+word_source_files = ({words!r},)
+tld_source_lists = (('com',),)
+domain_filter_lists = (('.{{1,20}}$',),)
+use_nameguppy = False
+nameguppy_cache = '~/.domain-hunter/cache/nameguppy'
+use_namecheap = False
+namecheap_cache = '~/.domain-hunter/cache/namecheap'
+"""
+
+
+class TestSnapshot:
+    @pytest.fixture
+    def config_module(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(hunterlib.utils, 'CACHE_DIR', str(tmp_path / 'cache'))
+        (tmp_path / 'words.txt').write_text('zen\nmint\n')
+        (tmp_path / 'snapshot_conf.py').write_text(CONFIG_MODULE.format(words=str(tmp_path / 'words.txt')))
+        spec = importlib.util.spec_from_file_location('snapshot_conf', tmp_path / 'snapshot_conf.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def test_reused_until_files_change(self, config_module, tmp_path, monkeypatch):
+        built = load_config(config_module, snapshot=True)
+        assert built.word_list == load_config(config_module).word_list == {'sky', 'nova', 'zen', 'mint'}
+
+        def fail(_):
+            raise AssertionError('config was rebuilt')
+        monkeypatch.setattr(hunterlib.steps.config, 'build_config', fail)
+        assert load_config(config_module, snapshot=True).word_list == built.word_list
+
+        monkeypatch.undo()
+        monkeypatch.setattr(hunterlib.utils, 'CACHE_DIR', str(tmp_path / 'cache'))
+        (tmp_path / 'words.txt').write_text('zen\nmint\nhive\n')
+        assert 'hive' in load_config(config_module, snapshot=True).word_list
@@ -0,0 +1,97 @@
+import re
+from itertools import islice
+
+import pytest
+
+import hunterlib.steps
+from hunterlib.conf import RunConfig, NameGuppyConfig, NamecheapConfig
+from hunterlib.models import Bias
+from hunterlib.steps import DomainCursor
+from hunterlib.zones import RegisteredIndex, build_registered_index
+
+
+def mk_config(**overrides):
+    values = dict(
+        word_list={'sky', 'nova', 'pixel', 'forge', 'hive', 'byte', 'zen', 'loop', 'grid', 'spark', 'peak', 'mint'},
+        tld_list={'com', 'net', 'org', 'io', 'dev', 'app'},
+
+        word_filters={re.compile(r'\w{1,32}')},
+        tld_filters={re.compile(r'\w{1,5}')},
+        domain_filters={re.compile(r'.{1,14}$')},
+
+        word_biases={Bias(pattern='y', adjust=1), Bias(pattern='o', adjust=-0.5)},
+        tld_biases={Bias(pattern='com', adjust=1)},
+        domain_biases={Bias(pattern='o.i', adjust=2), Bias(pattern='x', adjust=-1)},
+
+        name_guppy_conf=NameGuppyConfig(),
+        namecheap_conf=NamecheapConfig(),
+    )
+    values.update(overrides)
+    return RunConfig(**values)
+
+
+def key(domains):
+    return [(d.domain, d.score) for d in domains]
+
+
+class TestDomainCursor:
+    def test_matches_generate_domains(self):
+        config = mk_config()
+        word_chain = hunterlib.steps.generate_word_chain(config, 400)
+        tld_chain = hunterlib.steps.generate_tld_chain(config)
+        expected = list(hunterlib.steps.generate_domains(config, word_chain, tld_chain))
+        assert key(DomainCursor(config, limit=400)) == key(expected)
+
+    @pytest.mark.parametrize('split', [0, 1, 7, 150, 900])
+    @pytest.mark.parametrize('limit,min_score', [(None, None), (300, None), (None, 0.05)])
+    def test_resume_continues_exactly(self, tmp_path, split, limit, min_score):
+        config = mk_config()
+        expected = list(islice(DomainCursor(config, limit, min_score), 0, 1500))
+
+        cursor = DomainCursor(config, limit, min_score)
+        head = list(islice(cursor, 0, split))
+        cursor.save(str(tmp_path / 'checkpoint'))
+
+        resumed = DomainCursor.load(mk_config(), str(tmp_path / 'checkpoint'))
+        assert resumed.position == len(head)
+        tail = list(islice(resumed, 0, 1500 - len(head)))
+        assert key(head + tail) == key(expected)
+
+    @pytest.mark.parametrize('split', [3, 20])
+    def test_resume_with_words_that_normalize_alike(self, tmp_path, split):
+        # 'zen' and 'Zen  ' share a table string but not a score.
+        config = mk_config(word_list={'sky', 'zen', 'Zen  ', 'nova'})
+        expected = list(islice(DomainCursor(config), 0, 200))
+        cursor = DomainCursor(config)
+        head = list(islice(cursor, 0, split))
+        cursor.save(str(tmp_path / 'checkpoint'))
+        tail = list(islice(DomainCursor.load(config, str(tmp_path / 'checkpoint')), 0, 200 - split))
+        assert key(head + tail) == key(expected)
+
+    def test_skip(self):
+        config = mk_config()
+        expected = list(islice(DomainCursor(config), 0, 300))
+        cursor = DomainCursor(config)
+        cursor.skip(250)
+        assert key(islice(cursor, 0, 50)) == key(expected[250:])
+
+    def test_rejects_other_config(self, tmp_path):
+        cursor = DomainCursor(mk_config())
+        cursor.skip(10)
+        cursor.save(str(tmp_path / 'checkpoint'))
+        with pytest.raises(ValueError):
+            DomainCursor.load(mk_config(domain_biases=set()), str(tmp_path / 'checkpoint'))
+
+    def test_rejects_other_registered_index(self, tmp_path):
+        for (name, listed) in (('a', 'sky.com\n'), ('b', 'sky.com\nzen.io\n')):
+            (tmp_path / f'{name}.txt').write_text(listed)
+            build_registered_index([str(tmp_path / f'{name}.txt')], str(tmp_path / name))
+        registered = RegisteredIndex(str(tmp_path / 'a'))
+        cursor = DomainCursor(mk_config(), registered=registered)
+        cursor.skip(10)
+        cursor.save(str(tmp_path / 'checkpoint'))
+        DomainCursor.load(mk_config(), str(tmp_path / 'checkpoint'), registered)
+        for other in (RegisteredIndex(str(tmp_path / 'b')), None):
+            with pytest.raises(ValueError, match='registered index'):
+                DomainCursor.load(mk_config(), str(tmp_path / 'checkpoint'), other)
+        registered.close()
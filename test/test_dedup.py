@@ -0,0 +1,70 @@
+from itertools import islice
+
+from hypothesis import given, strategies as st
+
+import hunterlib.steps
+from hunterlib.conf import DedupeConfig
+from hunterlib.dedup import Deduplicator, dedupe
+from hunterlib.steps import DomainCursor
+from test.test_cursor import key, mk_config
+
+# 'sky' + 'line' spells the same as 'skyline', and 'sk' + 'yline' as well.
+OVERLAPPING = {'sky', 'line', 'skyline', 'sk', 'yline', 'nova', 'byte'}
+
+
+class TestDeduplicator:
+    @given(st.lists(st.text(alphabet='abc', min_size=1, max_size=4), max_size=100), st.integers(0, 20))
+    def test_keeps_first_occurrences(self, keys, exact_limit):
+        seen = Deduplicator(exact_limit, capacity=1000, error_rate=1e-6)
+        kept = list(dedupe(keys, lambda k: k, seen))
+        assert kept == list(dict.fromkeys(keys))
+        assert seen.suppressed == len(keys) - len(kept)
+
+    @given(st.lists(st.text(alphabet='abc', min_size=1, max_size=4), max_size=50), st.integers(0, 20))
+    def test_round_trips(self, keys, exact_limit):
+        seen = Deduplicator(exact_limit, capacity=1000, error_rate=1e-6)
+        list(dedupe(keys, lambda k: k, seen))
+        restored = Deduplicator(exact_limit, capacity=1000, error_rate=1e-6)
+        restored.load(seen.to_bytes(), seen.suppressed)
+        assert not any(restored.add(k) for k in keys)
+        assert restored.add('d')
+
+    def test_memory_stops_growing(self):
+        seen = Deduplicator(exact_limit=10, capacity=1000)
+        for i in range(10):
+            seen.add(str(i))
+        seen.add('10')
+        assert seen.exact is None
+        size = len(seen.to_bytes())
+        for i in range(11, 500):
+            seen.add(str(i))
+        assert len(seen.to_bytes()) == size
+
+
+class TestWordChain:
+    def test_no_repeated_concatenations(self):
+        config = mk_config(word_list=OVERLAPPING)
+        words = [wc.concatenated for wc in hunterlib.steps.generate_word_chain(config, 2000)]
+        assert len(words) == len(set(words))
+        assert words.count('skyline') == 1
+
+    def test_keeps_best_scoring_copy(self):
+        config = mk_config(word_list=OVERLAPPING)
+        off = mk_config(word_list=OVERLAPPING, dedupe_conf=DedupeConfig(enable=False))
+        best = {}
+        for wc in hunterlib.steps.generate_word_chain(off, 2000):
+            best[wc.concatenated] = max(best.get(wc.concatenated, wc.score), wc.score)
+        deduped = {wc.concatenated: wc.score for wc in hunterlib.steps.generate_word_chain(config, 2000)}
+        assert deduped == {w: s for (w, s) in best.items() if w in deduped}
+        assert set(deduped) == set(best)
+
+    def test_resumed_cursor_remembers_seen_words(self, tmp_path):
+        for exact_limit in (0, 1_000_000):
+            config = mk_config(word_list=OVERLAPPING, dedupe_conf=DedupeConfig(exact_limit=exact_limit))
+            expected = list(islice(DomainCursor(config, limit=400), 0, 600))
+            cursor = DomainCursor(config, limit=400)
+            first = list(islice(cursor, 200))
+            cursor.save(str(tmp_path / 'checkpoint'))
+            resumed = DomainCursor.load(config, str(tmp_path / 'checkpoint'))
+            assert key(first + list(islice(resumed, 400))) == key(expected)
+            assert len({d.domain for d in expected}) == len(expected)
@@ -0,0 +1,52 @@
+import re
+
+from hypothesis import given, strategies as st
+
+from hunterlib.filters import FilterPlan, pattern_bounds
+
+patterns = (re.compile(r'\w{1,32}'), re.compile(r'.{1,32}'), re.compile(r'[a-m]'), re.compile(r'.*z$'))
+
+
+class TestFilterPlan:
+    def test_merges_duplicates(self):
+        plan = FilterPlan([re.compile(r'\w+'), re.compile(r'\w+'), re.compile(r'\w+', re.IGNORECASE)])
+        assert len(plan) == 2
+
+    @given(st.lists(st.text('abmnz', max_size=40), max_size=200))
+    def test_same_decisions_as_all(self, strings):
+        plan = FilterPlan(patterns, cache_size=16, sample_every=3)
+        for s in strings:
+            assert plan.accepts(s) == all(p.match(s) for p in patterns)
+
+    def test_most_selective_pattern_moves_first(self):
+        plan = FilterPlan(patterns, sample_every=1)
+        for i in range(100):
+            plan.accepts(f'a{i}')
+        assert plan.patterns[0].pattern == '.*z$'
+
+
+bounded_patterns = st.sampled_from([
+    r'\w{1,32}', r'.{1,8}$', r'[a-m]{2,6}\Z', r'^[a-mz]+$', r'(ab|c){1,3}$', r'a*?$', r'[^b]{0,5}$', r'x|.{2}$',
+])
+
+
+class TestPatternBounds:
+    @given(bounded_patterns, st.text('abmnz.', max_size=12))
+    def test_accepted_strings_are_within_bounds(self, source, text):
+        pattern = re.compile(source)
+        bounds = pattern_bounds(pattern)
+        if pattern.match(text):
+            assert bounds.max_length is None or len(text) <= bounds.max_length
+            assert bounds.repeat is None or all(pattern.match(ch * bounds.repeat) for ch in text)
+
+    def test_bounds(self):
+        assert pattern_bounds(re.compile(r'\w{1,32}')) == (None, None)
+        assert pattern_bounds(re.compile(r'.{1,14}$')) == (14, 1)
+        assert pattern_bounds(re.compile(r'[a-z]{3,20}\Z')) == (20, 3)
+        assert pattern_bounds(re.compile(r'(ab|c){2}$')) == (4, None)
+
+    def test_plan_character_test(self):
+        plan = FilterPlan([re.compile(r'[a-z.]{1,20}$'), re.compile(r'[^x]+$'), re.compile(r'\w')])
+        assert plan.max_length() == 20
+        test = plan.character_test()
+        assert test('ab.c') and not test('abx') and not test('a_b')
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import time
+
+from hunterlib.output import BinaryWriter, CsvWriter, DomainRecord, JsonLinesWriter, TextWriter, read_binary
+from hunterlib.steps.data import Domain, ScoredWord, WordCombo
+
+records = [
+    DomainRecord('skynova.com', ('sky', 'nova'), 'com', 4.25, {}),
+    DomainRecord('zen.io', ('zen',), 'io', -0.5, {'namecheap': {'available': True}}),
+]
+
+
+class TestWriters:
+    def test_from_domain(self):
+        words = (ScoredWord(word='sky', score=3), ScoredWord(word='nova', score=2))
+        tld = WordCombo('com', (ScoredWord(word='com', score=3),))
+        d = Domain('skynova.com', words, tld)
+        assert DomainRecord.from_domain(d) == DomainRecord('skynova.com', ('sky', 'nova'), 'com', d.score, {})
+
+    def test_text(self):
+        stream = io.BytesIO()
+        with TextWriter(stream) as w:
+            for r in records:
+                w.write(r)
+        assert stream.getvalue().decode().splitlines()[0].split() == ['skynova.com', '4.25']
+
+    def test_jsonl(self):
+        stream = io.BytesIO()
+        with JsonLinesWriter(stream) as w:
+            for r in records:
+                w.write(r)
+        lines = [json.loads(line) for line in stream.getvalue().decode().splitlines()]
+        assert [DomainRecord(**{**line, 'words': tuple(line['words'])}) for line in lines] == records
+
+    def test_csv(self):
+        stream = io.BytesIO()
+        with CsvWriter(stream) as w:
+            for r in records:
+                w.write(r)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue().decode())))
+        assert [row['domain'] for row in rows] == ['skynova.com', 'zen.io']
+        assert float(rows[1]['score']) == -0.5
+        assert json.loads(rows[1]['plugin_data']) == {'namecheap': {'available': True}}
+
+    def test_binary_round_trip(self, tmp_path):
+        path = tmp_path / 'out.bin'
+        with open(path, 'wb') as stream, BinaryWriter(stream, batch_size=1) as w:
+            for r in records:
+                w.write(r)
+        assert list(read_binary(str(path))) == records
+
+    def test_first_record_is_written_immediately(self):
+        stream = io.BytesIO()
+        w = TextWriter(stream, batch_size=100, flush_interval=3600)
+        w.write(records[0])
+        assert stream.getvalue() != b''
+        w.write(records[1])
+        assert len(stream.getvalue().splitlines()) == 1
+        w.close()
+        assert len(stream.getvalue().splitlines()) == 2
+
+    def test_flushes_when_the_source_stalls(self):
+        stream = io.BytesIO()
+        with TextWriter(stream, batch_size=100, flush_interval=0.2) as w:
+            w.write(records[0])
+            w.write(records[1])
+            assert len(stream.getvalue().splitlines()) == 1
+            time.sleep(0.6)
+            assert len(stream.getvalue().splitlines()) == 2
@@ -0,0 +1,56 @@
+import re
+from itertools import islice
+
+import pytest
+
+import hunterlib.steps
+from hunterlib.conf import RunConfig, NameGuppyConfig, NamecheapConfig
+from hunterlib.models import Bias
+from hunterlib.zones import RegisteredIndex, build_registered_index
+
+
+@pytest.fixture
+def config():
+    return RunConfig(
+        word_list={'sky', 'nova', 'pixel', 'forge', 'hive', 'byte', 'zen', 'loop', 'grid', 'spark', 'peak', 'mint'},
+        tld_list={'com', 'net', 'org', 'io', 'dev', 'app', 'co', 'ai', 'me'},
+
+        word_filters={re.compile(r'\w{1,32}')},
+        tld_filters={re.compile(r'\w{1,5}')},
+        domain_filters={re.compile(r'.{1,14}$')},
+
+        word_biases={Bias(pattern='y', adjust=1), Bias(pattern='o', adjust=-0.5)},
+        tld_biases={Bias(pattern='com', adjust=1)},
+        domain_biases={Bias(pattern='o.i', adjust=2), Bias(pattern='x', adjust=-1)},
+
+        name_guppy_conf=NameGuppyConfig(),
+        namecheap_conf=NamecheapConfig(),
+    )
+
+
+class TestParallelDomains:
+    @pytest.mark.parametrize('workers,chunk_size', [(1, 7), (3, 1), (4, 50), (20, 16)])
+    def test_matches_serial_order(self, config, workers, chunk_size):
+        word_chain = hunterlib.steps.generate_word_chain(config, 300)
+        tld_chain = hunterlib.steps.generate_tld_chain(config)
+        serial = list(hunterlib.steps.generate_domains(config, word_chain, tld_chain))
+
+        parallel = list(hunterlib.steps.generate_domains_parallel(config, workers, chunk_size, 300))
+        assert [(d.domain, d.score) for d in parallel] == [(d.domain, d.score) for d in serial]
+
+    def test_can_stop_early(self, config):
+        result = list(islice(hunterlib.steps.generate_domains_parallel(config, 2, 4), 0, 25))
+        assert len(result) == 25
+
+    def test_drops_registered_domains(self, config, tmp_path):
+        (tmp_path / 'list.txt').write_text('sky.com\nbyte.io\nzen.me\n')
+        build_registered_index([str(tmp_path / 'list.txt')], str(tmp_path / 'index'))
+        registered = RegisteredIndex(str(tmp_path / 'index'))
+
+        word_chain = hunterlib.steps.generate_word_chain(config, 300)
+        tld_chain = hunterlib.steps.generate_tld_chain(config)
+        serial = list(hunterlib.steps.generate_domains(config, word_chain, tld_chain, registered=registered))
+        parallel = list(hunterlib.steps.generate_domains_parallel(config, 3, 16, 300, registered=registered))
+        domains = [d.domain for d in serial]
+        assert 'sky.com' not in domains and 'zen.me' not in domains and 'sky.io' in domains
+        assert [d.domain for d in parallel] == domains
@@ -0,0 +1,63 @@
+import json
+import re
+from itertools import islice
+
+import pytest
+
+import hunterlib.profiling
+import hunterlib.steps
+from hunterlib.filters import FilterPlan
+from hunterlib.profiling import Profiler, profiled, profiled_block
+from hunterlib.steps.chains import filter_chain
+from test.test_cursor import mk_config
+
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler(memory=True).start()
+    yield profiler
+    profiler.stop()
+
+
+class TestProfiled:
+    def test_untouched_when_off(self):
+        assert hunterlib.profiling.ACTIVE is None
+        chain = iter(range(3))
+        assert profiled('stage', chain) is chain
+        with profiled_block('block') as stage:
+            stage.count(1, 1)
+
+    def test_counts_items_and_rejects(self, profiler):
+        plan = FilterPlan({re.compile(r'[a-m]'), re.compile(r'.{2}')})
+        source = profiled('source', ['a', 'ab', 'zz', 'z', 'mn'])
+        result = list(profiled('filter', filter_chain(plan, source, lambda x: x), 'source', filters=plan))
+        profiler.stop()
+        stages = profiler.report()['stages']
+        assert result == ['ab', 'mn']
+        assert (stages['source']['items_out'], stages['filter']['items_in'], stages['filter']['items_out']) == (5, 5, 2)
+        assert stages['filter']['rejects'] == {'[a-m]': 2, '.{2}': 2}
+
+    def test_self_time_excludes_nested_stages(self, profiler):
+        inner = profiled('inner', range(1000))
+        list(profiled('outer', (i * 2 for i in inner), 'inner'))
+        profiler.stop()
+        (inner, outer) = (profiler.stages['inner'], profiler.stages['outer'])
+        assert outer.self_wall == pytest.approx(outer.wall - inner.wall)
+        assert inner.calls == outer.calls == 1001
+
+    def test_pipeline_report(self, profiler, tmp_path):
+        config = mk_config()
+        list(islice(hunterlib.steps.generate_domains(config, hunterlib.steps.generate_word_chain(config),
+                                                     hunterlib.steps.generate_tld_chain(config)), 500))
+        profiler.stop()
+        profiler.write(str(tmp_path / 'profile.json'))
+        with open(tmp_path / 'profile.json') as f:
+            stages = json.load(f)['stages']
+        assert {'score_word_list', 'search_combos', 'word_filters', 'dedupe', 'domain_combos', 'domain_filters'} \
+            <= set(stages)
+        assert stages['domain_filters']['items_out'] == 500
+        assert stages['domain_filters']['items_in'] == stages['domain_combos']['items_out']
+        assert sum(stages['domain_filters']['rejects'].values()) > 0
+        assert stages['domain_combos']['peak_size'] <= len(config.tld_list)
+        assert stages['search_combos']['peak_alloc'] > 0
+        assert 'domain_filters' in profiler.summary()
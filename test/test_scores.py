@@ -0,0 +1,101 @@
+import os
+import re
+from itertools import islice, product
+
+from hypothesis import given, strategies as st
+
+import hunterlib.steps
+from hunterlib.bias import BiasMatcher, ordered_biases
+from hunterlib.filters import FilterPlan
+from hunterlib.models import Bias
+from hunterlib.steps import DomainCursor
+from hunterlib.steps.chains import score_word_list
+from hunterlib.steps.scores import ScoreTable
+from hunterlib.watch import FileWatcher
+from test.test_cursor import key, mk_config
+
+words_st = st.sets(st.text('abcd', min_size=1, max_size=5), min_size=1, max_size=40)
+biases_st = st.sets(st.builds(Bias, pattern=st.text('abcd', min_size=1, max_size=2),
+                              adjust=st.sampled_from([-2, -0.5, 0.1, 0.3, 1.7])), max_size=6)
+filters_st = st.sets(st.sampled_from([r'\w{1,4}$', r'[abc]', r'.*d']), max_size=2)
+NO_FILTERS = FilterPlan(())
+
+
+def from_scratch(words, biases, filters=NO_FILTERS):
+    return score_word_list(sorted(w for w in words if filters.accepts(w)), BiasMatcher(ordered_biases(biases)))
+
+
+class TestScoreTable:
+    @given(st.lists(st.tuples(words_st, filters_st, biases_st), min_size=1, max_size=4))
+    def test_matches_scoring_from_scratch(self, steps):
+        scores = ScoreTable()
+        for (words, patterns, biases) in steps:
+            filters = FilterPlan(map(re.compile, patterns))
+            table = scores.table(words, filters, biases)
+            expected = from_scratch(words, biases, filters)
+            assert (table.words, list(table.scores)) == (expected.words, list(expected.scores))
+
+    @given(biases_st, biases_st)
+    def test_updates_large_tables_in_place(self, before, after):
+        words = {''.join(letters) for n in (1, 2, 3, 4, 5) for letters in product('abcd', repeat=n)}
+        scores = ScoreTable()
+        scores.table(words, NO_FILTERS, before)
+        table = scores.table(words - {'abc', 'dd'} | {'e', 'ee'}, NO_FILTERS, after)
+        expected = from_scratch(words - {'abc', 'dd'} | {'e', 'ee'}, after)
+        assert (table.words, list(table.scores)) == (expected.words, list(expected.scores))
+
+    def test_rescores_only_affected_words(self):
+        words = {'sky', 'nova', 'pixel', 'forge', 'hive', 'byte', 'zen', 'loop'}
+        biases = {Bias(pattern='y', adjust=1), Bias(pattern='o', adjust=-0.5)}
+        scores = ScoreTable()
+        scores.table(words, NO_FILTERS, biases)
+        assert scores.rescored == len(words)
+        scores.table(words, NO_FILTERS, biases)
+        assert scores.rescored == 0
+        # Changing an adjustment touches the words with that pattern in them, and adding a word scores just it.
+        changed = {Bias(pattern='y', adjust=2), Bias(pattern='o', adjust=-0.5)}
+        table = scores.table(words | {'mint'}, NO_FILTERS, changed)
+        assert scores.rescored == 3
+        assert table.words == from_scratch(words | {'mint'}, changed).words
+
+    def test_splices_ties_in_word_order(self):
+        # Every word scores the same, so only the word order places the ones spliced in and out.
+        words = {'ab', 'ba', 'cd', 'dc', 'ef'}
+        scores = ScoreTable()
+        scores.table(words, NO_FILTERS, set())
+        table = scores.table(words - {'cd'} | {'bb', 'zz'}, NO_FILTERS, set())
+        assert table.words == ['ab', 'ba', 'bb', 'dc', 'ef', 'zz']
+        assert scores.rescored == 2
+
+    def test_round_trips(self, tmp_path):
+        words = {'sky', 'nova', 'pixel'}
+        biases = {Bias(pattern='x', adjust=1)}
+        scores = ScoreTable()
+        scores.table(words, NO_FILTERS, biases)
+        scores.save(str(tmp_path / 'scores.pickle'))
+        loaded = ScoreTable.load(str(tmp_path / 'scores.pickle'))
+        table = loaded.table(words, NO_FILTERS, biases)
+        assert list(table.scores) == list(scores.table(words, NO_FILTERS, biases).scores)
+        assert loaded.rescored == 0
+        (tmp_path / 'bad.pickle').write_bytes(b'not a table')
+        assert ScoreTable.load(str(tmp_path / 'bad.pickle')).order == []
+
+    def test_cursor_output_unchanged(self):
+        config = mk_config()
+        scores = ScoreTable()
+        scores.table(config.word_list, FilterPlan(config.word_filters), {Bias(pattern='e', adjust=2)})
+        expected = key(islice(DomainCursor(config, 300), 100))
+        assert key(islice(DomainCursor(config, 300, scores=scores), 100)) == expected
+        assert key(islice(hunterlib.steps.generate_domains(
+            config, hunterlib.steps.generate_word_chain(config, 300, scores=scores),
+            hunterlib.steps.generate_tld_chain(config)), 100)) == expected
+
+
+class TestFileWatcher:
+    def test_notices_changes(self, tmp_path):
+        (tmp_path / 'a.txt').write_text('one')
+        watcher = FileWatcher([str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')], interval=0.01)
+        assert watcher.changed() == []
+        os.utime(tmp_path / 'a.txt', ns=(0, 0))
+        (tmp_path / 'b.txt').write_text('new')
+        assert watcher.wait() == [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
@@ -0,0 +1,99 @@
+import os
+from itertools import islice
+
+from hypothesis import given, strategies as st
+
+import hunterlib.steps
+from hunterlib.conf import ScorerConfig
+from hunterlib.models import ScoreWeight
+from hunterlib.scoring import query_value, rerank, score_domains, weight_adjustment
+from hunterlib.steps.config import mk_score_weight
+from test.test_cursor import mk_config
+
+
+class VowelScorer:
+    """Fraction of vowels in the name, and the process that worked it out."""
+    name = 'vowels'
+
+    def score_batch(self, domains):
+        results = []
+        for d in domains:
+            name = d.partition('.')[0]
+            results.append({'ratio': sum(c in 'aeiou' for c in name) / len(name), 'pid': os.getpid()})
+        return results
+
+
+class ShortScorer:
+    name = 'short'
+    in_process = True
+
+    def score_batch(self, domains):
+        return [{'yes': len(d) <= 8} for d in domains]
+
+
+SCORERS = ['test.test_scoring:VowelScorer', 'test.test_scoring:ShortScorer']
+WEIGHTS = {ScoreWeight(query='vowels.ratio', adjust=0.5), ScoreWeight(query='short.yes', adjust=0.25)}
+
+
+class Scored:
+    def __init__(self, score):
+        self.score = score
+
+
+class TestRerank:
+    @given(st.lists(st.floats(-10, 10, allow_nan=False)), st.integers(1, 20))
+    def test_holds_back_at_most_window(self, scores, window):
+        domains = [Scored(s) for s in scores]
+        result = list(rerank(domains, window))
+        assert sorted(result, key=id) == sorted(domains, key=id)
+        for (position, d) in enumerate(result):
+            # Nothing comes out before a better domain that was already within the window.
+            seen = domains[:position + window + 1]
+            assert all(other.score <= d.score for other in seen if other not in result[:position])
+
+    @given(st.lists(st.floats(-10, 10, allow_nan=False)))
+    def test_large_window_sorts(self, scores):
+        result = [d.score for d in rerank([Scored(s) for s in scores], len(scores) + 1)]
+        assert result == sorted(scores, reverse=True)
+
+
+class TestWeights:
+    def test_query_value(self):
+        data = {'a': {'b': {'c': 2}}, 'x': 1}
+        assert query_value(data, ('a', 'b', 'c')) == 2
+        assert query_value(data, ('a', 'z')) is None
+        assert query_value(data, ('x', 'y')) is None
+
+    def test_weight_adjustment(self):
+        data = {'vowels': {'ratio': 0.5}, 'short': {'yes': True}, 'other': {'text': 'no'}}
+        weights = [(('vowels', 'ratio'), 2.0), (('short', 'yes'), -1.0), (('other', 'text'), 5.0), (('gone',), 1.0)]
+        assert weight_adjustment(data, weights) == 0.0
+
+    def test_mk_score_weight(self):
+        assert mk_score_weight('vowels.ratio,0.5') == ScoreWeight(query='vowels.ratio', adjust=0.5)
+        assert mk_score_weight({'query': 'short.yes', 'adjust': -1}) == ScoreWeight(query='short.yes', adjust=-1)
+
+
+class TestScoreDomains:
+    def unscored(self, limit=200):
+        config = mk_config()
+        return list(hunterlib.steps.generate_domains(config, hunterlib.steps.generate_word_chain(config, limit),
+                                                     hunterlib.steps.generate_tld_chain(config)))
+
+    def test_adjusts_and_reranks(self):
+        config = mk_config(scorer_conf=ScorerConfig(names=SCORERS, window=10_000), score_weights=WEIGHTS)
+        expected = sorted(self.unscored(), key=lambda d: -(d.score + weight_adjustment(
+            {'vowels': VowelScorer().score_batch([d.domain])[0], 'short': {'yes': len(d.domain) <= 8}},
+            [(('short', 'yes'), 0.25), (('vowels', 'ratio'), 0.5)])))
+        result = list(hunterlib.steps.generate_domains(
+            config, hunterlib.steps.generate_word_chain(config, 200), hunterlib.steps.generate_tld_chain(config)))
+        assert [d.domain for d in result] == [d.domain for d in expected]
+        assert all(set(d.plugin_data) == {'vowels', 'short'} for d in result)
+
+    def test_process_pool_matches_in_process(self):
+        config = mk_config(scorer_conf=ScorerConfig(names=SCORERS, batch_size=16), score_weights=WEIGHTS)
+        pooled = mk_config(scorer_conf=ScorerConfig(names=SCORERS, batch_size=16, workers=2), score_weights=WEIGHTS)
+        expected = list(score_domains(self.unscored(), config))
+        result = list(islice(score_domains(self.unscored(), pooled), len(expected)))
+        assert [(d.domain, d.score) for d in result] == [(d.domain, d.score) for d in expected]
+        assert {d.plugin_data['vowels']['pid'] for d in result}.isdisjoint({os.getpid()})
@@ -0,0 +1,95 @@
+import asyncio
+import http.client
+import json
+import threading
+from concurrent.futures import Future
+from itertools import islice
+
+import pytest
+
+from hunterlib.server import DomainServer
+from hunterlib.steps import DomainCursor
+from test.test_cursor import mk_config
+
+
+@pytest.fixture
+def server():
+    domain_server = DomainServer(['test_config'], idle_timeout=60)
+    domain_server.configs['test_config'] = mk_config()
+    loop = asyncio.new_event_loop()
+    ready = Future()
+    loop.create_task(domain_server.serve('127.0.0.1', 0, ready=ready))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    host, port = ready.result(5)[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    yield domain_server, conn
+    conn.close()
+
+    async def shutdown():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def get(conn: http.client.HTTPConnection, path: str):
+    conn.request('GET', path)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+class TestDomainServer:
+    def test_pages_match_cursor(self, server):
+        domain_server, conn = server
+        expected = [d.domain for d in islice(DomainCursor(mk_config()), 0, 120)]
+        pages = []
+        offset = 0
+        while offset < 120:
+            status, body = get(conn, f'/page?config=test_config&offset={offset}&count=40')
+            assert status == 200
+            page = json.loads(body)
+            pages += [d['domain'] for d in page['domains']]
+            offset = page['next_offset']
+        assert pages == expected
+        # Each page continued the cursor the previous one left off.
+        assert len(domain_server.cursors) == 1
+
+    def test_earlier_offset_starts_new_cursor(self, server):
+        domain_server, conn = server
+        get(conn, '/page?config=test_config&offset=50&count=10')
+        status, body = get(conn, '/page?config=test_config&offset=5&count=3')
+        expected = [d.domain for d in islice(DomainCursor(mk_config()), 5, 8)]
+        assert [d['domain'] for d in json.loads(body)['domains']] == expected
+        assert len(domain_server.cursors) == 2
+
+    def test_stream(self, server):
+        _, conn = server
+        status, body = get(conn, '/stream?config=test_config&offset=10&count=600')
+        assert status == 200
+        expected = [d.domain for d in islice(DomainCursor(mk_config()), 10, 610)]
+        assert [json.loads(line)['domain'] for line in body.decode().splitlines()] == expected
+        # The connection is still usable afterwards.
+        assert get(conn, '/stats')[0] == 200
+
+    def test_errors(self, server):
+        _, conn = server
+        assert get(conn, '/page?config=other')[0] == 404
+        assert get(conn, '/page?config=test_config&count=x')[0] == 400
+        assert get(conn, '/page')[0] == 400
+        assert get(conn, '/nothing')[0] == 404
+
+    def test_eviction(self, server):
+        domain_server, conn = server
+        get(conn, '/page?config=test_config&offset=0&count=5')
+        get(conn, '/page?config=test_config&offset=0&count=5')
+        assert len(domain_server.cursors) == 2
+        domain_server.memory_budget = domain_server.cursors[0].estimated_bytes()
+        domain_server.evict()
+        assert len(domain_server.cursors) == 1
+        domain_server.evict(now=domain_server.cursors[0].last_used + 61)
+        assert domain_server.cursors == []
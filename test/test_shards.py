@@ -0,0 +1,101 @@
+import json
+import multiprocessing
+from itertools import islice
+
+import pytest
+
+import hunterlib.steps
+from hunterlib.conf import NamecheapConfig
+from hunterlib.models import Bias
+from hunterlib.shards import ShardMerge, main, write_shard
+from hunterlib.zones import RegisteredIndex, build_registered_index
+from test.test_cursor import mk_config
+
+LIMIT = 300
+
+
+def serial(config, count=None):
+    domains = hunterlib.steps.generate_domains(config, hunterlib.steps.generate_word_chain(config, LIMIT),
+                                               hunterlib.steps.generate_tld_chain(config))
+    return [(d.domain, d.score) for d in islice(domains, count)]
+
+
+def write(config, path, shard, shards, count=0, registered=None):
+    with open(path, 'wb') as f:
+        return write_shard(config, f, shard, shards, count, LIMIT, registered=registered)
+
+
+def merged(paths, count=None):
+    with ShardMerge(paths) as shards:
+        return [(r.domain, r.score) for r in islice(shards, count)], shards.stopped_at
+
+
+class TestShards:
+    @pytest.mark.parametrize('shards', [1, 2, 4, 7])
+    def test_merge_matches_serial(self, tmp_path, shards):
+        # Biases that lift later domains above earlier ones, so keys alone would merge out of order.
+        config = mk_config(domain_biases={Bias(pattern='o.i', adjust=2), Bias(pattern='e.d', adjust=1.5),
+                                          Bias(pattern='x', adjust=-1)})
+        paths = [str(tmp_path / f'{i}.shard') for i in range(shards)]
+        for (i, path) in enumerate(paths):
+            assert write(config, path, i, shards)['complete']
+        assert merged(reversed(paths)) == (serial(config), None)
+
+    def test_merge_stops_where_a_shard_was_cut_off(self, tmp_path):
+        config = mk_config()
+        paths = [str(tmp_path / f'{i}.shard') for i in range(3)]
+        metas = [write(config, path, i, 3, count=20) for (i, path) in enumerate(paths)]
+        (result, stopped_at) = merged(paths)
+        assert not all(m['complete'] for m in metas)
+        assert metas[stopped_at]['domains'] == 20
+        assert 20 <= len(result) < 60
+        assert result == serial(config, len(result))
+
+    def test_refuses_mismatched_shards(self, tmp_path):
+        config = mk_config()
+        write(config, tmp_path / '0.shard', 0, 2)
+        write(config, tmp_path / '1.shard', 1, 2)
+        write(config.copy(update={'namecheap_conf': NamecheapConfig(enable=False)}), tmp_path / 'same.shard', 1, 2)
+        write(mk_config(word_biases=set()), tmp_path / 'other.shard', 1, 2)
+        merged([tmp_path / '0.shard', tmp_path / 'same.shard'])
+        with pytest.raises(ValueError, match='different configs'):
+            merged([tmp_path / '0.shard', tmp_path / 'other.shard'])
+        with pytest.raises(ValueError, match='Missing shards'):
+            merged([tmp_path / '0.shard'])
+        with pytest.raises(ValueError, match='more than once'):
+            merged([tmp_path / '0.shard', tmp_path / '1.shard', tmp_path / '1.shard'])
+        data = (tmp_path / '1.shard').read_bytes()
+        (tmp_path / '1.shard').write_bytes(data[:len(data) // 2])
+        with pytest.raises(ValueError, match='Not a complete shard file'):
+            merged([tmp_path / '0.shard', tmp_path / '1.shard'])
+
+    def test_refuses_shards_with_other_registered_indexes(self, tmp_path):
+        config = mk_config()
+        (tmp_path / 'list.txt').write_text('sky.com\n')
+        (tmp_path / 'other.txt').write_text('sky.com\nzen.io\n')
+        for (source, index) in (('list.txt', 'a'), ('list.txt', 'b'), ('other.txt', 'c')):
+            build_registered_index([str(tmp_path / source)], str(tmp_path / index))
+        for (name, shard) in (('a', 0), ('b', 1), ('c', 1)):
+            registered = RegisteredIndex(str(tmp_path / name))
+            write(config, tmp_path / f'{name}.shard', shard, 2, registered=registered)
+            registered.close()
+        write(config, tmp_path / 'none.shard', 1, 2)
+        # The same index in another directory is fine.
+        merged([tmp_path / 'a.shard', tmp_path / 'b.shard'])
+        for other in ('c.shard', 'none.shard'):
+            with pytest.raises(ValueError, match='different configs'):
+                merged([tmp_path / 'a.shard', tmp_path / other])
+
+    def test_shards_from_separate_processes(self, tmp_path):
+        config = mk_config()
+        ctx = multiprocessing.get_context('spawn')
+        paths = [str(tmp_path / f'{i}.shard') for i in range(3)]
+        processes = [ctx.Process(target=write, args=(config, path, i, 3)) for (i, path) in enumerate(paths)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            assert p.exitcode == 0
+        main(paths + ['--format', 'jsonl', '--count', '50', '--output', str(tmp_path / 'out.jsonl')])
+        lines = (tmp_path / 'out.jsonl').read_text().splitlines()
+        assert [json.loads(line)['domain'] for line in lines] == [domain for (domain, _) in serial(config, 50)]
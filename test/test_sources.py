@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+import hunterlib.sources
+import hunterlib.utils
+from hunterlib.models import Bias, FileSource
+from hunterlib.sources import compile_source, compiled_lines
+from hunterlib.steps.config import mk_bias
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(hunterlib.utils, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+class TestCompiledSources:
+    def test_normalizes(self, tmp_path, cache_dir):
+        source = tmp_path / 'words.txt'
+        source.write_text('sky\n  nova \n\nsky\npixel\r\nété\n')
+        assert list(compiled_lines(str(source))) == ['sky', 'nova', 'pixel', 'été']
+        assert list(FileSource(str, str(source), compiled=False)) == ['sky', 'nova', '', 'sky', 'pixel', 'été']
+
+    def test_reused_until_changed(self, tmp_path, monkeypatch):
+        source = tmp_path / 'words.txt'
+        target = str(tmp_path / 'words.pack')
+        source.write_text('sky\nnova\n')
+        compile_source(str(source), target)
+        compiled_at = os.stat(target).st_mtime_ns
+
+        compile_source(str(source), target)
+        assert os.stat(target).st_mtime_ns == compiled_at
+
+        # Same contents with a new modification time still counts as unchanged, and is only hashed once.
+        (hashed, digest) = ([], hunterlib.sources.file_digest)
+        monkeypatch.setattr(hunterlib.sources, 'file_digest', lambda path: hashed.append(path) or digest(path))
+        os.utime(source, ns=(0, 0))
+        compile_source(str(source), target)
+        compile_source(str(source), target)
+        assert hashed == [str(source)]
+        compiled_at = os.stat(target).st_mtime_ns
+
+        source.write_text('sky\nzen\n')
+        os.utime(source, ns=(10 ** 9, 10 ** 9))
+        compile_source(str(source), target)
+        assert os.stat(target).st_mtime_ns != compiled_at
+
+    def test_many_chunks(self, tmp_path, cache_dir):
+        source = tmp_path / 'words.txt'
+        words = [f'word{i}' for i in range(20000)]
+        source.write_text('\n'.join(words))
+        assert list(FileSource(str, str(source))) == words
+
+    def test_file_source_kind(self, tmp_path, cache_dir):
+        source = tmp_path / 'biases.txt'
+        source.write_text('sky,1\nsky,1\nzen,-0.5\n')
+        expected = [Bias(pattern='sky', adjust=1), Bias(pattern='zen', adjust=-0.5)]
+        assert list(FileSource(mk_bias, str(source))) == expected
@@ -1,18 +1,23 @@
+import logging
 import re
-from itertools import islice
+from heapq import heapify, heappop, heappush
+from itertools import combinations, islice, takewhile
 
-from hypothesis import given, strategies as st, assume
+from hypothesis import given, settings, strategies as st, assume
 from hypothesis.strategies import composite
 
 import env.env_config
 import hunterlib.steps
 import hunterlib.steps.chains
 import hunterlib.steps.config
+import hunterlib.steps.data
 import hunterlib.steps.domains
-from hunterlib.conf import RunConfig, NameGuppyConfig, NamecheapConfig
+from hunterlib.bias import BiasMatcher, ordered_biases
+from hunterlib.conf import RunConfig, NameGuppyConfig, NamecheapConfig, DedupeConfig
+from hunterlib.filters import FilterPlan
 from hunterlib.models import Bias, FileSource
 from hunterlib.steps.config import get_flattened_lists_and_files, mk_bias
-from hunterlib.steps.data import ScoredWord, WordCombo
+from hunterlib.steps.data import ScoredWord, WordCombo, WordTable
 from hunterlib.wordlist import flatten
 
 letters = 'abcdefghijklmnopqrstuvwxyz'
@@ -121,6 +126,30 @@ class TestChains:
         assert sorted(result, key=lambda wc: wc.score, reverse=True) == result
 
 
+class TestScoreWordList:
+    @given(st.sets(st.text(letters, min_size=1), min_size=1), st.sets(st.from_type(Bias), max_size=3))
+    def test_matches_process_word(self, words, biases):
+        matcher = BiasMatcher(biases)
+        expected = [hunterlib.steps.chains.process_word(matcher, w) for w in words]
+        expected.sort(key=lambda sw: sw.score, reverse=True)
+        table = hunterlib.steps.chains.score_word_list(words, matcher)
+        assert [table.scored_word(i) for i in range(len(table))] == expected
+
+    def test_process_word_traces_its_biases(self, caplog):
+        matcher = BiasMatcher(ordered_biases({Bias(pattern='sk', adjust=1), Bias(pattern='y', adjust=0.5),
+                                              Bias(pattern='z', adjust=2)}))
+        with caplog.at_level(logging.DEBUG, logger='domain-hunter.chains'):
+            sw = hunterlib.steps.chains.process_word(matcher, 'sky')
+        assert sw.score == 3 + 1.5 - 0.03
+        assert [r.biases for r in caplog.records] == [[Bias(pattern='sk', adjust=1), Bias(pattern='y', adjust=0.5)]]
+
+    def test_clamps_scores(self):
+        biases = BiasMatcher({Bias(pattern='a', adjust=2), Bias(pattern='aa', adjust=2), Bias(pattern='aaa', adjust=2),
+                              Bias(pattern='aaaa', adjust=2), Bias(pattern='z', adjust=-2)})
+        table = hunterlib.steps.chains.score_word_list(['aaaa', 'z' * 1500], biases)
+        assert list(table.scores) == [10, -10]
+
+
 class TestSearchCombos:
     @given(st.lists(st.from_type(ScoredWord)), st.integers(1))
     def test_does_not_explode(self, words: list[ScoredWord], depth: int):
@@ -142,6 +171,145 @@ class TestSearchCombos:
         result = list(islice(hunterlib.steps.chains.search_combos(words, 1), 0, 500))
         assert len(words) == len(result)
 
+    @given(st.lists(st.from_type(ScoredWord), min_size=1, max_size=7), st.integers(1, 4))
+    def test_matches_exhaustive_ordering(self, words: list[ScoredWord], depth: int):
+        words.sort(key=lambda sw: sw.score, reverse=True)
+        words = tuple(words)
+        everything = [c for n in range(1, depth + 1) for c in combinations(range(len(words)), n)]
+        everything.sort(key=lambda c: (-WordCombo.score_words(tuple(words[i] for i in c)), c))
+        result = list(hunterlib.steps.chains.search_combos(words, depth))
+        assert [wc.source for wc in result] == [tuple(words[i] for i in c) for c in everything]
+        assert [wc.score for wc in result] == [WordCombo.score_words(wc.source) for wc in result]
+
+    @given(st.lists(st.from_type(ScoredWord), min_size=1, max_size=50), st.integers(1, 10), st.integers(0, 300))
+    def test_limit_matches_unbounded_prefix(self, words: list[ScoredWord], depth: int, limit: int):
+        words.sort(key=lambda sw: sw.score, reverse=True)
+        words = tuple(words)
+        expected = list(islice(hunterlib.steps.chains.search_combos(words, depth), 0, limit))
+        result = list(hunterlib.steps.chains.search_combos(words, depth, limit=limit))
+        assert [wc.source for wc in result] == [wc.source for wc in expected]
+
+    @given(st.lists(st.from_type(ScoredWord), min_size=1, max_size=50), st.integers(1, 3),
+           st.floats(0, 0.3, allow_nan=False))
+    def test_min_score_matches_unbounded_prefix(self, words: list[ScoredWord], depth: int, min_score: float):
+        words.sort(key=lambda sw: sw.score, reverse=True)
+        words = tuple(words)
+        unbounded = hunterlib.steps.chains.search_combos(words, depth)
+        expected = list(takewhile(lambda wc: wc.score >= min_score, islice(unbounded, 0, 2000)))
+        result = list(islice(hunterlib.steps.chains.search_combos(words, depth, min_score=min_score), 0, 2000))
+        assert [wc.source for wc in result] == [wc.source for wc in expected]
+
+    # Few enough words that searching every combination stays quick.
+    @settings(deadline=None)
+    @given(st.lists(st.text('abcdefghij', min_size=1, max_size=6), min_size=1, max_size=15, unique=True),
+           st.integers(2, 16), st.sampled_from(['abcdefghij', 'abcdefg']))
+    def test_bounds_only_prune_what_filters_reject(self, words, max_length, allowed):
+        config = RunConfig(
+            word_list=set(words), tld_list={'io', 'com'},
+            domain_filters={re.compile(f'[{allowed}.moc]{{1,{max_length}}}$')},
+            name_guppy_conf=NameGuppyConfig(), namecheap_conf=NamecheapConfig(),
+        )
+        (table, filters) = hunterlib.steps.chains.build_word_table(config)
+        bounds = hunterlib.steps.chains.search_bounds(config, table, filters)
+        accepts = FilterPlan(config.domain_filters).accepts
+        unpruned = [wc.concatenated for wc in hunterlib.steps.chains.search_combos(table, 3)
+                    if accepts(wc.concatenated + '.io')]
+        pruned = hunterlib.steps.chains.search_combos(table, 3, bounds=bounds)
+        assert [wc.concatenated for wc in pruned if accepts(wc.concatenated + '.io')] == unpruned
+        assert bounds.max_length == max_length - 3
+
+    @settings(deadline=None)
+    @given(st.lists(st.text('abcdefghij', min_size=1, max_size=6), min_size=1, max_size=15, unique=True),
+           st.integers(4, 16), st.sampled_from(['abcdefghij', 'abcdefg']), st.integers(0, 100))
+    def test_bounds_prune_with_limit(self, words, max_length, allowed, limit):
+        config = RunConfig(
+            word_list=set(words), tld_list={'io'}, domain_filters={re.compile(f'[{allowed}.io]{{1,{max_length}}}$')},
+            name_guppy_conf=NameGuppyConfig(), namecheap_conf=NamecheapConfig(),
+        )
+        (table, filters) = hunterlib.steps.chains.build_word_table(config)
+        bounds = hunterlib.steps.chains.search_bounds(config, table, filters)
+        accepts = FilterPlan(config.domain_filters).accepts
+        unpruned = [wc.concatenated for wc in hunterlib.steps.chains.search_combos(table, 3)
+                    if accepts(wc.concatenated + '.io')]
+        pruned = hunterlib.steps.chains.search_combos(table, 3, limit, bounds=bounds)
+        assert [wc.concatenated for wc in pruned if accepts(wc.concatenated + '.io')] == unpruned[:limit]
+
+    def test_limit_keeps_pruning(self):
+        table = WordTable(['toolong', 'a', 'b'], [3, 2, 1])
+        bounds = hunterlib.steps.chains.SearchBounds([7, 1, 1], 2)
+        result = [wc.concatenated for wc in hunterlib.steps.chains.search_combos(table, 2, 3, bounds=bounds)]
+        assert result == ['toolong', 'a', 'b', 'ab']
+
+    # Short words from few letters, so plenty of combinations spell alike.
+    @settings(deadline=None)
+    @given(st.lists(st.text('abc', min_size=1, max_size=3), min_size=1, max_size=12, unique=True),
+           st.integers(0, 200), st.sampled_from([0, 1_000_000]), st.booleans())
+    def test_limit_counts_what_gets_through_filters_and_dedupe(self, words, limit, exact_limit, enable):
+        config = RunConfig(
+            word_list=set(words), tld_list={'io'}, word_filters={re.compile(r'(?!.*cc)')},
+            dedupe_conf=DedupeConfig(enable=enable, exact_limit=exact_limit, capacity=1000),
+            name_guppy_conf=NameGuppyConfig(), namecheap_conf=NamecheapConfig(),
+        )
+        expected = list(islice(hunterlib.steps.chains.generate_word_chain(config), 0, limit))
+        result = list(hunterlib.steps.chains.generate_word_chain(config, limit))
+        assert [wc.source for wc in result] == [wc.source for wc in expected]
+
+    def test_accepts_word_table(self):
+        table = WordTable(['b', 'a'], [2, 1])
+        result = [wc.concatenated for wc in hunterlib.steps.chains.search_combos(table, 2)]
+        assert result == ['b', 'a', 'ba']
+
+
+def eager_domain_order(words: tuple[WordCombo], tlds: tuple[WordCombo], biases: set[Bias]) -> list[str]:
+    """Every TLD started up front, and every word kept: the search `DomainSearch` has to match."""
+    matcher = BiasMatcher(ordered_biases(biases))
+
+    def node(w, t):
+        d = hunterlib.steps.data.Domain(words[w].concatenated + '.' + tlds[t].concatenated, words[w].source, tlds[t])
+        return (-matcher.adjustment(d.domain, d.score), t, w, d.domain)
+
+    queue = [node(0, t) for t in range(len(tlds))]
+    heapify(queue)
+    order = []
+    while queue:
+        (_, t, w, domain) = heappop(queue)
+        if w + 1 < len(words):
+            heappush(queue, node(w + 1, t))
+        order.append(domain)
+    return order
+
+
+class TestDomainSearch:
+    @given(st.lists(st.from_type(ScoredWord), min_size=1, max_size=30),
+           st.lists(st.from_type(ScoredWord), min_size=1, max_size=30),
+           st.sets(st.builds(Bias, pattern=st.text('abc.', min_size=1, max_size=3),
+                             adjust=st.floats(-2, 2, allow_nan=False)), max_size=5))
+    def test_matches_eager_search(self, words, tlds, biases):
+        words.sort(key=lambda sw: sw.score, reverse=True)
+        tlds.sort(key=lambda sw: sw.score, reverse=True)
+        words = tuple(hunterlib.steps.chains.search_combos(tuple(words), 2, limit=100))
+        tlds = tuple(hunterlib.steps.chains.search_combos(tuple(tlds), 1))
+        result = [n.domain.domain for n in hunterlib.steps.domains.DomainSearch(words, tlds, biases)]
+        assert result == eager_domain_order(words, tlds, biases)
+
+    def test_starts_tlds_lazily(self):
+        words = tuple(hunterlib.steps.chains.search_combos(WordTable(['sky', 'zen'], [3, 2]), 1))
+        tld_table = WordTable([f't{i}' for i in range(1000)], [5 - i / 100 for i in range(1000)])
+        tlds = tuple(hunterlib.steps.chains.search_combos(tld_table, 1))
+        search = hunterlib.steps.domains.DomainSearch(words, tlds, set())
+        assert next(search).domain.domain == 'sky.t0'
+        assert len(search.queue) <= 3
+
+    def test_drops_words_no_node_needs(self):
+        table = WordTable([f'w{i}' for i in range(20_000)], [5 - i / 10_000 for i in range(20_000)])
+        tlds = tuple(hunterlib.steps.chains.search_combos(WordTable(['com', 'io'], [1, 0]), 1))
+        search = hunterlib.steps.domains.DomainSearch(hunterlib.steps.chains.search_combos(table, 1), tlds, set())
+        longest = 0
+        for _ in search:
+            longest = max(longest, len(search.word_buffer))
+        assert longest <= 2 * hunterlib.steps.domains._MIN_COMPACT
+        assert search.word_base > 0
+
 
 class TestDataClasses:
     @given(st.from_type(ScoredWord), st.integers(min_value=1, max_value=100), st.integers(min_value=1, max_value=100))
@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+
+import hunterlib.trace
+from hunterlib.conf import WordFilter
+from hunterlib.trace import TracePoint
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('domain-hunter.test-trace')
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    yield logger
+    logger.removeHandler(handler)
+    logger.filters.clear()
+
+
+def records(logger):
+    return logger.handlers[0].records
+
+
+class TestTracePoint:
+    def test_disabled_below_debug(self, logger):
+        logger.setLevel(logging.INFO)
+        assert not TracePoint(logger, 'msg').enabled()
+
+    def test_lazy_extras(self, logger):
+        trace = TracePoint(logger, 'msg')
+        trace('a', score=1, biases=lambda: ['b'])
+        assert records(logger)[0].word == 'a'
+        assert records(logger)[0].biases == ['b']
+
+    def test_sampling(self, logger):
+        trace = TracePoint(logger, 'msg', sample_every=3)
+        for i in range(9):
+            trace(str(i))
+        assert [r.word for r in records(logger)] == ['2', '5', '8']
+        with pytest.raises(ValueError):
+            TracePoint(logger, 'msg', sample_every=0)
+
+    def test_default_sampling(self, logger, monkeypatch):
+        monkeypatch.setattr(hunterlib.trace, 'SAMPLE_EVERY', 2)
+        trace = TracePoint(logger, 'msg')
+        for i in range(4):
+            trace(str(i))
+        assert [r.word for r in records(logger)] == ['1', '3']
+
+    def test_word_filter_skips_before_building(self, logger):
+        logger.addFilter(WordFilter(words={'keep'}))
+        trace = TracePoint(logger, 'msg')
+        trace('drop', expensive=lambda: pytest.fail('Extras were built for a filtered event'))
+        trace(words=('x', 'keep'))
+        assert len(records(logger)) == 1
+        assert records(logger)[0].words == ('x', 'keep')
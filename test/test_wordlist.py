@@ -1,17 +1,54 @@
 import pytest
 
+import hunterlib.utils
 import hunterlib.wordlist as wl
 
 
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(hunterlib.utils, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
 class TestWords:
 
     @pytest.mark.parametrize("lemma", {
         'animal.n.01',
         'color.n.01'
     })
-    def test_handles_happy_path(self, lemma):
+    def test_handles_happy_path(self, lemma, cache_dir):
         res = tuple(wl.words(lemma))
         assert len(res) > 0
 
-    def test_part_of_speech_produces_results(self):
+    def test_part_of_speech_produces_results(self, cache_dir):
         assert len(wl.PartOfSpeech.ADJECTIVE) > 0
+
+    def test_part_of_speech_cache_matches_wordnet(self, cache_dir):
+        cold = wl.pos_lemmas('r')
+        warm = wl.pos_lemmas('r')
+        assert cold == warm
+        assert cold == {wl.synset_to_str(s) for s in wl.wn.all_synsets('r')}
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    return wl.HyponymIndex(wl.build_hyponym_index(str(tmp_path_factory.mktemp('wordnet') / 'hyponyms.idx')))
+
+
+class TestHyponymIndex:
+
+    @pytest.mark.parametrize("lemma", {
+        'animal.n.01',
+        'color.n.01'
+    })
+    def test_matches_wordnet_tree(self, index, lemma):
+        tree = wl.wn.synset(lemma).tree(lambda s: s.hyponyms())
+        expected = {wl.synset_to_str(s) for s in wl.flatten(tree)}
+        assert set(index.words(lemma)) == expected
+        assert set(wl._walk_wordnet(lemma, None)) == expected
+
+    def test_depth_limit(self, index):
+        assert list(index.words('color.n.01', 0)) == ['color']
+        direct = {wl.synset_to_str(s) for s in wl.wn.synset('color.n.01').hyponyms()}
+        assert set(index.words('color.n.01', 1)) == direct | {'color'}
+        assert list(index.words('color.n.01', 1)) == list(wl._walk_wordnet('color.n.01', 1))
@@ -0,0 +1,56 @@
+import gzip
+import pickle
+
+from hypothesis import given, settings, strategies as st
+
+from hunterlib.zones import RegisteredIndex, build_registered_index, registered_names
+
+ZONE = """\
+$ORIGIN com.
+$TTL 172800
+; registered names
+@ IN SOA a.gtld-servers.net. nstld.verisign-grs.com. 1 1800 900 604800 86400
+SKYNOVA 172800 IN NS ns1.skynova.com.
+        172800 IN NS ns2.skynova.com.
+ns1.skynova 172800 IN A 192.0.2.1
+pixelforge.com. 172800 IN NS ns1.example.net.
+"""
+
+
+class TestRegisteredNames:
+    def test_zone_file(self):
+        assert list(registered_names(ZONE.splitlines(True))) == [
+            ('com', 'skynova'), ('com', 'skynova'), ('com', 'pixelforge')]
+
+    def test_plain_list(self):
+        assert list(registered_names(['zen.io\n', 'Mint.COM.\n', '\n', 'com\n'])) == [('io', 'zen'), ('com', 'mint')]
+
+
+class TestRegisteredIndex:
+    def test_build_and_lookup(self, tmp_path):
+        (tmp_path / 'com.zone').write_text(ZONE)
+        with gzip.open(tmp_path / 'list.txt.gz', 'wt') as f:
+            f.write('zen.io\nhive.io\nzen.io\n')
+        counts = build_registered_index([str(tmp_path / 'com.zone'), str(tmp_path / 'list.txt.gz')],
+                                        str(tmp_path / 'index'), bloom_error_rate=0.01, run_size=2)
+        assert counts == {'com': 2, 'io': 2}
+
+        index = RegisteredIndex(str(tmp_path / 'index'))
+        assert 'skynova.com' in index and 'pixelforge.com' in index and 'zen.io' in index
+        assert 'skynova.io' not in index and 'grid.com' not in index and 'zen.dev' not in index
+        assert 'hive.io' in pickle.loads(pickle.dumps(index))
+        index.close()
+
+    @settings(max_examples=20, deadline=None)
+    @given(st.sets(st.text('abcdefxyz-', min_size=1, max_size=6), max_size=600),
+           st.sets(st.text('abcdefxyz-', min_size=1, max_size=6), max_size=50),
+           st.booleans())
+    def test_matches_set(self, tmp_path_factory, registered, queries, bloom):
+        directory = tmp_path_factory.mktemp('zones')
+        (directory / 'list.txt').write_text(''.join(f'{name}.com\n' for name in registered))
+        build_registered_index([str(directory / 'list.txt')], str(directory / 'index'),
+                               bloom_error_rate=0.01 if bloom else None, run_size=97)
+        index = RegisteredIndex(str(directory / 'index'))
+        for name in registered | queries:
+            assert (f'{name}.com' in index) == (name in registered)
+        index.close()